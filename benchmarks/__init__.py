@@ -0,0 +1,6 @@
+"""
+Бенчмарки Budget Bot
+
+Запуск из корня проекта, например:
+    python -m benchmarks.sheets_http_calls
+"""
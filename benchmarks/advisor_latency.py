@@ -0,0 +1,264 @@
+"""
+Задержка и пропускная способность AI советника
+
+Запросы идут в локальную замену DeepSeek (benchmarks.mock_deepseek),
+поэтому бенчмарк не требует сети и ключа API. Для каждого сценария
+и уровня параллельности выводятся запросов в секунду и перцентили
+p50/p95/p99 времени ответа:
+- get_advice без потока и потоком (для потока - ещё время до первого текста);
+- одинаковый вопрос от всех сразу (объединение запросов и кэш ответов);
+- обработчик вопроса advisor_question с поддельными объектами Telegram:
+  время до первого видимого текста и до ответа модели;
+- тот же обработчик при 500/429 от API (показывается совет по правилам).
+
+Лимиты планировщика (LLM_MAX_CONCURRENT, LLM_MAX_QUEUE) берутся из config:
+запросы сверх очереди отклоняются сразу и считаются в колонке "отказов",
+перцентили считаются только по успешным ответам.
+
+Запуск: python -m benchmarks.advisor_latency
+"""
+import asyncio
+import itertools
+import time
+from typing import Dict, List, Any, Callable, Awaitable, Optional
+import config
+import services.ai_advisor as ai_advisor
+from benchmarks.fake_sheets import FakeSpreadsheet
+from benchmarks.mock_deepseek import MockDeepSeek
+from bot.handlers.advisor import advisor_question
+from services.advice_cache import AdviceCache
+from services.ai_advisor import AIAdvisor, is_error_reply
+from services.sheets import GoogleSheetsService, SheetSnapshotCache
+
+CONCURRENCY = (1, 4, 16, 32)
+REQUESTS = 64
+LATENCY = 0.3        # До первого токена
+TOKEN_DELAY = 0.005  # Между токенами
+TOKENS = 80
+
+
+def percentile(values: List[float], p: float) -> float:
+    """Перцентиль методом ближайшего ранга"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(int(round(p / 100 * len(ordered) + 0.5)) - 1, 0)
+    return ordered[min(rank, len(ordered) - 1)]
+
+
+def budget_summary() -> Dict[str, Any]:
+    """Сводка бюджета, посчитанная по поддельной таблице"""
+    service = GoogleSheetsService(spreadsheet=FakeSpreadsheet(300), cache=SheetSnapshotCache())
+    return service.get_monthly_summary()
+
+
+def make_advisor(url: str) -> AIAdvisor:
+    """Советник без дискового кэша, направленный на mock-сервер"""
+    advisor = AIAdvisor()
+    advisor.api_url = url
+    advisor.cache = AdviceCache(path=None)
+    ai_advisor._advisor = advisor  # Его же используют обработчики
+    return advisor
+
+
+class Sample:
+    """Результат одного запроса"""
+
+    __slots__ = ("total", "first_text", "failed")
+
+    def __init__(self, total: float, first_text: Optional[float] = None, failed: bool = False):
+        self.total = total
+        self.first_text = first_text
+        self.failed = failed
+
+
+async def run_load(
+    call: Callable[[int], Awaitable[Sample]],
+    requests: int,
+    concurrency: int
+) -> Dict[str, Any]:
+    """Выполнить requests вызовов, не больше concurrency одновременно"""
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(index: int) -> Sample:
+        async with semaphore:
+            return await call(index)
+
+    started = time.monotonic()
+    samples = await asyncio.gather(*(one(i) for i in range(requests)))
+    elapsed = time.monotonic() - started
+
+    # Перцентили - по успешным ответам: мгновенные отказы занижают задержку
+    served = [s for s in samples if not s.failed]
+    totals = [s.total for s in served]
+    first = [s.first_text for s in served if s.first_text is not None]
+    return {
+        "rps": requests / elapsed,
+        "p50": percentile(totals, 50),
+        "p95": percentile(totals, 95),
+        "p99": percentile(totals, 99),
+        "first_p50": percentile(first, 50) if first else None,
+        "first_p95": percentile(first, 95) if first else None,
+        "failed": sum(s.failed for s in samples)
+    }
+
+
+# === Сценарии get_advice ===
+
+def advice_call(advisor: AIAdvisor, data: Dict[str, Any], stream: bool, same_question: bool):
+    """Вызов get_advice с замером времени до первого текста"""
+    async def call(index: int) -> Sample:
+        started = time.monotonic()
+        first_text = None
+
+        async def on_text(text: str):
+            nonlocal first_text
+            if first_text is None:
+                first_text = time.monotonic() - started
+
+        question = "Как сократить расходы?" if same_question else f"Вопрос {index}: как сократить расходы?"
+        advice = await advisor.get_advice(data, question, on_text=on_text if stream else None)
+        return Sample(time.monotonic() - started, first_text, is_error_reply(advice))
+
+    return call
+
+
+# === Сценарии обработчика ===
+
+class FakeMessage:
+    """Сообщение Telegram: запоминает момент первой и последней правки"""
+
+    ids = itertools.count(1)
+
+    def __init__(self, text: str = "", started: float = 0.0):
+        self.chat_id = 1
+        self.message_id = next(self.ids)
+        self.text = text
+        self.started = started
+        self.first_edit: Optional[float] = None
+        self.last_edit: Optional[float] = None
+        self.replies: List["FakeMessage"] = []
+
+    async def reply_text(self, text: str, **kwargs) -> "FakeMessage":
+        reply = FakeMessage(text, self.started)
+        self.replies.append(reply)
+        return reply
+
+    async def edit_text(self, text: str, parse_mode=None, reply_markup=None) -> "FakeMessage":
+        now = time.monotonic() - self.started
+        if self.first_edit is None:
+            self.first_edit = now
+        self.last_edit = now
+        self.text = text
+        return self
+
+
+class FakeUser:
+    def __init__(self, user_id: int):
+        self.id = user_id
+
+
+class FakeUpdate:
+    def __init__(self, message: FakeMessage, user_id: int):
+        self.message = message
+        self.effective_user = FakeUser(user_id)
+
+
+class FakeApplication:
+    """create_task как у telegram.ext.Application: задачи дожидаются в конце замера"""
+
+    def __init__(self):
+        self.tasks: List[asyncio.Task] = []
+
+    def create_task(self, coroutine) -> asyncio.Task:
+        task = asyncio.ensure_future(coroutine)
+        self.tasks.append(task)
+        return task
+
+
+class FakeContext:
+    def __init__(self, data: Dict[str, Any]):
+        self.user_data = {"budget_data": data}
+        self.application = FakeApplication()
+
+
+def handler_call(data: Dict[str, Any]):
+    """Вопрос через advisor_question: первый видимый текст и ответ модели"""
+    user_ids = itertools.count(1)
+
+    async def call(index: int) -> Sample:
+        started = time.monotonic()
+        message = FakeMessage(f"Вопрос {index}: стоит ли покупать телефон?", started)
+        context = FakeContext(data)
+        await advisor_question(FakeUpdate(message, next(user_ids)), context)
+        # Ответ модели после совета по правилам приходит отдельной задачей
+        await asyncio.gather(*context.application.tasks)
+
+        status = message.replies[0]
+        failed = status.text.startswith(("🧮", "❌"))
+        total = status.last_edit if status.last_edit is not None else time.monotonic() - started
+        return Sample(total, status.first_edit, failed)
+
+    return call
+
+
+# === Запуск ===
+
+def print_table(title: str, rows: List[Dict[str, Any]]):
+    """Таблица результатов сценария"""
+    print(f"\n{title}")
+    print(f"{'параллельно':>12}{'запр/с':>9}{'p50, с':>9}{'p95, с':>9}{'p99, с':>9}"
+          f"{'1-й текст p50':>15}{'p95':>8}{'отказов':>10}")
+    print("-" * 81)
+    for row in rows:
+        first = f"{row['first_p50']:>15.2f}{row['first_p95']:>8.2f}" if row["first_p50"] is not None \
+            else f"{'-':>15}{'-':>8}"
+        print(f"{row['concurrency']:>12}{row['rps']:>9.1f}{row['p50']:>9.2f}{row['p95']:>9.2f}"
+              f"{row['p99']:>9.2f}{first}{row['failed']:>10}")
+
+
+async def run_scenario(
+    title: str,
+    mock: MockDeepSeek,
+    make_call: Callable[[AIAdvisor], Callable[[int], Awaitable[Sample]]]
+):
+    """Сценарий на всех уровнях параллельности (на каждом - новый советник)"""
+    rows = []
+    for concurrency in CONCURRENCY:
+        advisor = make_advisor(mock.url)
+        result = await run_load(make_call(advisor), REQUESTS, concurrency)
+        result["concurrency"] = concurrency
+        rows.append(result)
+        await advisor.aclose()
+    print_table(title, rows)
+
+
+async def run():
+    data = budget_summary()
+    print(f"Советник против mock DeepSeek: {REQUESTS} запросов на уровень, "
+          f"задержка {LATENCY} с + {TOKENS} токенов по {TOKEN_DELAY * 1000:.0f} мс")
+    print(f"Планировщик: не больше {config.LLM_MAX_CONCURRENT} запросов одновременно, "
+          f"очередь {config.LLM_MAX_QUEUE}; совет по правилам через {config.LLM_FALLBACK_DEADLINE:g} с")
+
+    with MockDeepSeek(latency=LATENCY, token_delay=TOKEN_DELAY, tokens=TOKENS, seed=1) as mock:
+        await run_scenario("get_advice, без потока", mock,
+                           lambda a: advice_call(a, data, stream=False, same_question=False))
+        await run_scenario("get_advice, поток", mock,
+                           lambda a: advice_call(a, data, stream=True, same_question=False))
+        await run_scenario("get_advice, одинаковый вопрос", mock,
+                           lambda a: advice_call(a, data, stream=True, same_question=True))
+        await run_scenario("advisor_question (обработчик)", mock, lambda a: handler_call(data))
+        print(f"\nmock: {mock.get_stats()}")
+
+    with MockDeepSeek(latency=LATENCY, token_delay=TOKEN_DELAY, tokens=TOKENS,
+                      error_rate=0.1, rate_limit_rate=0.1, seed=1) as mock:
+        await run_scenario("advisor_question, 10% ответов 500 и 10% 429", mock, lambda a: handler_call(data))
+        print(f"\nmock: {mock.get_stats()}")
+
+
+def main():
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,204 @@
+"""
+Поддельная таблица Google Sheets для бенчмарков
+
+Повторяет ту часть API gspread, которой пользуется GoogleSheetsService,
+и считает HTTP-запросы, которые сделал бы настоящий gspread.
+"""
+import random
+from collections import Counter
+from typing import Dict, List
+import gspread
+from gspread.utils import a1_range_to_grid_range
+
+ACCOUNTS = ["Наличные", "Карта", "Карта Сбер", "Копилка", "Долг Маме"]
+EXPENSE_CATEGORIES = [
+    "Продукты", "Кафе", "Транспорт", "Такси", "Досуг", "Покупки",
+    "Здоровье и красота", "Аптека", "Ништяки", "Аренда", "Коммуналка",
+    "Интернет и связь", "Кошки", "Долги", "Одежда", "Подарки"
+]
+INCOME_CATEGORIES = ["Зарплата/Чаевые", "Подработка", "Другое"]
+
+
+def make_transactions(count: int, seed: int = 42) -> List[List[str]]:
+    """Сгенерировать строки листа Транзакции (без шапки)"""
+    rnd = random.Random(seed)
+    rows = []
+    for _ in range(count):
+        if rnd.random() < 0.3:
+            trans_type = "Доход"
+            category = rnd.choice(INCOME_CATEGORIES)
+            hours = str(rnd.randint(4, 12)) if category == "Зарплата/Чаевые" else ""
+        else:
+            trans_type = "Расход"
+            category = rnd.choice(EXPENSE_CATEGORIES)
+            hours = ""
+        amount = f"{rnd.uniform(1, 200):.2f}".replace(".", ",")
+        day = str(rnd.randint(1, 28))
+        rows.append([
+            day, trans_type, rnd.choice(ACCOUNTS), category, amount,
+            "", rnd.choice(["", "магазин", "смена", "обед"]), f"{day}.10.2026", hours, ""
+        ])
+    return rows
+
+
+def make_sheets(transactions: int = 300) -> Dict[str, List[List[str]]]:
+    """Содержимое всех листов таблицы бюджета"""
+    categories = [["Тип", "Категория", "Бюджет", "Потрачено", "Осталось", "Прогресс"]]
+    for name in INCOME_CATEGORIES:
+        categories.append(["Доход", name, "0", "500", "0", "0"])
+    for name in EXPENSE_CATEGORIES:
+        categories.append(["Расход", name, "150", "120,50", "29,50", "0,80"])
+
+    return {
+        "Транзакции": [
+            ["Месяц:", "", "10", "Год:", "2026"],
+            [""] * 10,
+            ["Дата", "Тип", "Счёт", "Категория", "Сумма", "Счёт Куда",
+             "Комментарий", "Полная дата", "Часы", "Часы×6.5"],
+        ] + make_transactions(transactions),
+        "Счета": [["Счета"], [""], ["Счёт", "Начальный", "Текущий", "Валюта"]] + [
+            [name, "100", "250,75", "BYN"] for name in ACCOUNTS
+        ],
+        "Категории": categories,
+        "Справочники": [["Справочники"], [""], ["Тип", "Счёт", "Категория"]] + [
+            [
+                (["Доход", "Расход", "Перевод"] + [""] * 20)[i],
+                (ACCOUNTS + [""] * 20)[i],
+                (INCOME_CATEGORIES + EXPENSE_CATEGORIES)[i]
+            ]
+            for i in range(len(INCOME_CATEGORIES + EXPENSE_CATEGORIES))
+        ],
+        "Дашборд": [[""]],
+    }
+
+
+class FakeWorksheet:
+    """Лист поддельной таблицы"""
+
+    def __init__(self, spreadsheet: "FakeSpreadsheet", sheet_id: int, title: str):
+        self.spreadsheet = spreadsheet
+        self.id = sheet_id
+        self.title = title
+
+    @property
+    def _rows(self) -> List[List[str]]:
+        return self.spreadsheet.data[self.title]
+
+    def get_all_values(self, **kwargs) -> List[List[str]]:
+        self.spreadsheet.count("values.get")
+        width = max((len(row) for row in self._rows), default=0)
+        values = [list(row) + [""] * (width - len(row)) for row in self._rows]
+        self.spreadsheet.cells_read += sum(len(row) for row in values)
+        return values
+
+    def append_row(self, values, **kwargs):
+        return self.append_rows([values], **kwargs)
+
+    def append_rows(self, values, **kwargs):
+        self.spreadsheet.count("values.append")
+        start = len(self._rows) + 1
+        for row in values:
+            self._rows.append(["" if v is None else str(v) for v in row])
+        end = len(self._rows)
+        self.spreadsheet.recalculate()
+        return {"updates": {"updatedRange": f"'{self.title}'!A{start}:J{end}"}}
+
+    def delete_rows(self, start_index, end_index=None):
+        self.spreadsheet.count("batchUpdate")
+        end_index = end_index or start_index
+        del self._rows[start_index - 1:end_index]
+        self.spreadsheet.recalculate()
+        return {}
+
+
+class FakeSpreadsheet:
+    """Поддельная таблица со счётчиком HTTP-запросов"""
+
+    def __init__(self, transactions: int = 300):
+        self.data = make_sheets(transactions)
+        self.calls = Counter()
+        self.cells_read = 0
+        self._worksheets = [
+            FakeWorksheet(self, sheet_id, title)
+            for sheet_id, title in enumerate(self.data)
+        ]
+        self.recalculate()
+
+    def recalculate(self):
+        """Пересчитать "формулы" листов Категории и Счета по транзакциям"""
+        spent: Dict[tuple, float] = {}
+        balance: Dict[str, float] = {}
+        for row in self.data["Транзакции"][3:]:
+            if not row or not row[0].strip():
+                continue
+            row = list(row) + [""] * 10
+            trans_type, account, category, to_account = row[1], row[2], row[3], row[5]
+            amount = float(row[4].replace(",", ".") or 0)
+            spent[(trans_type, category)] = spent.get((trans_type, category), 0.0) + amount
+            sign = 1.0 if trans_type == "Доход" else -1.0
+            balance[account] = balance.get(account, 0.0) + sign * amount
+            if trans_type == "Перевод" and to_account:
+                balance[to_account] = balance.get(to_account, 0.0) + amount
+
+        number = lambda value: f"{value:.2f}".replace(".", ",")
+        for row in self.data["Категории"][1:]:
+            budget = float(row[2].replace(",", "."))
+            total = spent.get((row[0], row[1]), 0.0)
+            row[3:6] = [number(total), number(budget - total), number(total / budget if budget else 0)]
+        for row in self.data["Счета"][3:]:
+            row[2] = number(float(row[1]) + balance.get(row[0], 0.0))
+
+    def count(self, endpoint: str):
+        self.calls[endpoint] += 1
+
+    @property
+    def total_calls(self) -> int:
+        return sum(self.calls.values())
+
+    def _read_range(self, label: str) -> List[List[str]]:
+        """Значения диапазона "'Лист'!A1:E1" или "'Лист'" без пустого хвоста"""
+        title, _, cell_range = label.partition("!")
+        title = title.strip("'")
+        if title not in self.data:
+            raise gspread.exceptions.WorksheetNotFound(title)
+        rows = self.data[title]
+        if cell_range:
+            grid = a1_range_to_grid_range(cell_range)
+            rows = [
+                row[grid.get("startColumnIndex", 0):grid.get("endColumnIndex")]
+                for row in rows[grid.get("startRowIndex", 0):grid.get("endRowIndex")]
+            ]
+        # Как и API, обрезаем пустые ячейки в конце строк и пустые строки в конце
+        trimmed = []
+        for row in rows:
+            row = list(row)
+            while row and row[-1] == "":
+                row.pop()
+            trimmed.append(row)
+        while trimmed and not trimmed[-1]:
+            trimmed.pop()
+        self.cells_read += sum(len(row) for row in trimmed)
+        return trimmed
+
+    def values_get(self, label: str, params=None) -> dict:
+        self.count("values.get")
+        return {"range": label, "values": self._read_range(label)}
+
+    def values_batch_get(self, ranges: List[str], params=None) -> dict:
+        self.count("values.batchGet")
+        return {
+            "valueRanges": [
+                {"range": label, "values": self._read_range(label)} for label in ranges
+            ]
+        }
+
+    def worksheets(self) -> List[FakeWorksheet]:
+        self.count("metadata")
+        return list(self._worksheets)
+
+    def worksheet(self, title: str) -> FakeWorksheet:
+        self.count("metadata")
+        for ws in self._worksheets:
+            if ws.title == title:
+                return ws
+        raise gspread.exceptions.WorksheetNotFound(title)
@@ -0,0 +1,256 @@
+"""
+Локальная замена DeepSeek API (формат OpenAI chat completions)
+
+Отвечает на POST /v1/chat/completions без сети и без оплаты:
+- задержка до первого токена и между токенами настраивается;
+- "stream": true - ответ потоком SSE (data: {...}, data: [DONE]),
+  с usage в последнем событии, если передан stream_options.include_usage;
+- доля ответов 500 и 429 (с заголовком Retry-After) задаётся вероятностью.
+
+Для бота и бенчмарков достаточно указать DEEPSEEK_API_URL на адрес сервера.
+
+Запуск отдельно:
+    python -m benchmarks.mock_deepseek --port 8099 --latency 0.8 --token-delay 0.02
+    DEEPSEEK_API_URL=http://127.0.0.1:8099/v1/chat/completions python main.py
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Any, Optional
+
+# Текст ответа: эмодзи-структура, как у настоящего советника
+ANSWER = (
+    "📊 Расходы идут ровно, но кафе близко к лимиту. "
+    "💡 Перенеси две встречи в кафе на домашние ужины и отложи разницу. "
+    "🎯 Каждый сохранённый рубль - шаг к свободе."
+)
+
+
+class MockDeepSeek:
+    """HTTP-сервер с поведением DeepSeek API"""
+
+    def __init__(
+        self,
+        latency: float = 0.5,
+        token_delay: float = 0.01,
+        tokens: int = 60,
+        error_rate: float = 0.0,
+        rate_limit_rate: float = 0.0,
+        retry_after: int = 1,
+        seed: Optional[int] = None,
+        port: int = 0
+    ):
+        """
+        Args:
+            latency: Секунд до первого токена (или до полного ответа без потока)
+            token_delay: Секунд между токенами в потоке
+            tokens: Число токенов (слов) в ответе
+            error_rate: Доля ответов 500
+            rate_limit_rate: Доля ответов 429
+            retry_after: Значение Retry-After для 429
+            port: Порт (0 - любой свободный)
+        """
+        self.latency = latency
+        self.token_delay = token_delay
+        self.tokens = tokens
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.retry_after = retry_after
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+        self.requests = 0
+        self.errors = 0
+        self.rate_limited = 0
+        self.active = 0
+        self.peak_active = 0
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", port), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        """Адрес для DEEPSEEK_API_URL"""
+        return f"http://127.0.0.1:{self._server.server_port}/v1/chat/completions"
+
+    def start(self) -> "MockDeepSeek":
+        """Запустить сервер в фоновом потоке"""
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Остановить сервер"""
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self) -> "MockDeepSeek":
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def answer_words(self):
+        """Слова ответа нужной длины"""
+        words = ANSWER.split(" ")
+        return [words[i % len(words)] for i in range(self.tokens)]
+
+    def _outcome(self) -> int:
+        """Код ответа для очередного запроса"""
+        with self._lock:
+            self.requests += 1
+            self.active += 1
+            self.peak_active = max(self.peak_active, self.active)
+            roll = self._random.random()
+        if roll < self.rate_limit_rate:
+            return 429
+        if roll < self.rate_limit_rate + self.error_rate:
+            return 500
+        return 200
+
+    def _done(self, status: int):
+        """Учесть завершённый запрос"""
+        with self._lock:
+            self.active -= 1
+            if status == 429:
+                self.rate_limited += 1
+            elif status != 200:
+                self.errors += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Счётчики сервера"""
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "errors": self.errors,
+                "rate_limited": self.rate_limited,
+                "peak_active": self.peak_active
+            }
+
+    def _handler_class(self):
+        """Класс обработчика, привязанный к этому серверу"""
+        mock = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                status = mock._outcome()
+                try:
+                    if status != 200:
+                        self._send_error(status)
+                    elif body.get("stream"):
+                        self._send_stream(body)
+                    else:
+                        self._send_completion(body)
+                finally:
+                    mock._done(status)
+
+            def _usage(self, body: Dict[str, Any]) -> Dict[str, int]:
+                """usage как у DeepSeek (prompt_cache_hit_tokens - общий системный промпт)"""
+                messages = body.get("messages", [])
+                prompt = sum(len(m.get("content", "").encode("utf-8")) // 4 for m in messages)
+                system = sum(
+                    len(m.get("content", "").encode("utf-8")) // 4
+                    for m in messages[:1] if m.get("role") == "system"
+                )
+                return {
+                    "prompt_tokens": prompt,
+                    "prompt_cache_hit_tokens": system,
+                    "completion_tokens": mock.tokens,
+                    "total_tokens": prompt + mock.tokens
+                }
+
+            def _send_error(self, status: int):
+                time.sleep(mock.latency / 4)
+                payload = json.dumps({"error": {"message": "mock error", "code": status}}).encode()
+                self.send_response(status)
+                if status == 429:
+                    self.send_header("Retry-After", str(mock.retry_after))
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def _send_completion(self, body: Dict[str, Any]):
+                time.sleep(mock.latency + mock.token_delay * mock.tokens)
+                payload = json.dumps({
+                    "id": "mock",
+                    "object": "chat.completion",
+                    "model": body.get("model", "deepseek-chat"),
+                    "choices": [{
+                        "index": 0,
+                        "message": {"role": "assistant", "content": " ".join(mock.answer_words())},
+                        "finish_reason": "stop"
+                    }],
+                    "usage": self._usage(body)
+                }, ensure_ascii=False).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def _send_stream(self, body: Dict[str, Any]):
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+
+                time.sleep(mock.latency)
+                for index, word in enumerate(mock.answer_words()):
+                    delta = word if index == 0 else " " + word
+                    self._event({"choices": [{"index": 0, "delta": {"content": delta}}]})
+                    time.sleep(mock.token_delay)
+                if (body.get("stream_options") or {}).get("include_usage"):
+                    self._event({"choices": [], "usage": self._usage(body)})
+                self._chunk(b"data: [DONE]\n\n")
+                self._chunk(b"")
+
+            def _event(self, data: Dict[str, Any]):
+                self._chunk(b"data: " + json.dumps(data, ensure_ascii=False).encode("utf-8") + b"\n\n")
+
+            def _chunk(self, data: bytes):
+                self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+                self.wfile.flush()
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Локальная замена DeepSeek API")
+    parser.add_argument("--port", type=int, default=8099)
+    parser.add_argument("--latency", type=float, default=0.5, help="секунд до первого токена")
+    parser.add_argument("--token-delay", type=float, default=0.01, help="секунд между токенами")
+    parser.add_argument("--tokens", type=int, default=60)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="доля ответов 500")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="доля ответов 429")
+    args = parser.parse_args()
+
+    mock = MockDeepSeek(
+        latency=args.latency,
+        token_delay=args.token_delay,
+        tokens=args.tokens,
+        error_rate=args.error_rate,
+        rate_limit_rate=args.rate_limit_rate,
+        port=args.port
+    )
+    print(f"DEEPSEEK_API_URL={mock.url}")
+    try:
+        mock._server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        mock._server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""
+Сколько HTTP-запросов к Google Sheets делает каждая команда бота
+
+Сравниваются:
+- "до": каждый метод заново запрашивает метаданные листа и весь лист
+  (поведение без кэшей);
+- "после, 1-й": первый вызов команды на свежем сервисе;
+- "после, повтор": повторный вызов той же команды (навигация по меню).
+
+Дополнительно для каждой команды показано число прочитанных ячеек
+(объём ответа) на листе из TRANSACTIONS строк.
+
+Запуск: python -m benchmarks.sheets_http_calls
+"""
+from typing import Callable, List, Tuple
+import config
+from benchmarks.fake_sheets import FakeSpreadsheet
+from services.sheets import GoogleSheetsService, SheetSnapshotCache
+from services.transaction_table import TransactionTable
+
+
+class UncachedSheetsService(GoogleSheetsService):
+    """Сервис без кэшей - исходное поведение"""
+
+    def _worksheet(self, sheet_name: str):
+        return self.spreadsheet.worksheet(sheet_name)
+
+    def get_ranges(self, ranges, fresh=False):
+        return [self.spreadsheet.worksheet(sheet_name).get_all_values() for sheet_name, _ in ranges]
+
+    def get_transactions_page(self, limit=10, before_row=None):
+        # Исходная схема: весь лист Транзакции и срез последних строк
+        data = self.spreadsheet.worksheet(config.SHEET_TRANSACTIONS).get_all_values()
+        transactions = [
+            parsed for idx, row in enumerate(data[3:], start=4)
+            if (parsed := self._parse_transaction_row(idx, row))
+        ]
+        return {"transactions": transactions[-limit:][::-1], "next_cursor": None}
+
+    def delete_transaction(self, row_index, fingerprint):
+        # Исходная схема: удаление по номеру строки без проверки
+        self.spreadsheet.worksheet(config.SHEET_TRANSACTIONS).delete_rows(row_index)
+        return True
+
+    def get_income_by_days(self):
+        # Исходная схема: весь лист Транзакции на каждый запрос, без итогов
+        data = self.spreadsheet.worksheet(config.SHEET_TRANSACTIONS).get_all_values()
+        return TransactionTable.from_rows(data[3:]).income_by_days()
+
+
+def add_dialog(service: GoogleSheetsService):
+    """Диалог /add для расхода: все категории -> категория -> счёт -> запись"""
+    service.get_references()
+    service.get_references()
+    service.add_transaction(5, "Расход", "Карта", "Кафе", 12.5, comment="обед")
+
+
+def delete_from_history(service: GoogleSheetsService):
+    """Удаление последней транзакции и показ обновлённой истории"""
+    last = service.get_recent_transactions(1)[0]
+    service.delete_transaction(last["row_index"], last["fingerprint"])
+    service.get_recent_transactions(10)
+
+
+COMMANDS: List[Tuple[str, Callable[[GoogleSheetsService], object]]] = [
+    ("/balance", lambda s: s.get_accounts_balance()),
+    ("/stats", lambda s: s.get_monthly_summary()),
+    ("/history", lambda s: s.get_recent_transactions(10)),
+    ("/income", lambda s: s.get_income_by_days()),
+    ("быстрый ввод", lambda s: s.add_transaction(5, "Расход", "Наличные", "Продукты", 50)),
+    ("диалог /add", add_dialog),
+    ("удаление", delete_from_history),
+]
+
+
+TRANSACTIONS = 2000
+
+
+def count_calls(service_cls, command, repeat: int = 1) -> Tuple[List[int], int]:
+    """Число запросов на каждом из repeat вызовов команды и ячеек за первый вызов"""
+    spreadsheet = FakeSpreadsheet(TRANSACTIONS)
+    service = service_cls(spreadsheet=spreadsheet, cache=SheetSnapshotCache())
+    if service_cls is UncachedSheetsService:
+        service.cache.ttl = 0
+
+    result = []
+    cells = 0
+    for attempt in range(repeat):
+        before = spreadsheet.total_calls
+        command(service)
+        result.append(spreadsheet.total_calls - before)
+        if attempt == 0:
+            cells = spreadsheet.cells_read
+    return result, cells
+
+
+def main():
+    print(f"Запросы к Google Sheets (лист Транзакции: {TRANSACTIONS} строк)\n")
+    print(f"{'Команда':<16}{'до':>6}{'после, 1-й':>13}{'после, повтор':>16}"
+          f"{'ячеек до':>12}{'ячеек после':>14}")
+    print("-" * 77)
+    for name, command in COMMANDS:
+        (baseline,), baseline_cells = count_calls(UncachedSheetsService, command)
+        (first, repeat), cells = count_calls(GoogleSheetsService, command, repeat=2)
+        print(f"{name:<16}{baseline:>6}{first:>13}{repeat:>16}"
+              f"{baseline_cells:>12}{cells:>14}")
+
+
+if __name__ == "__main__":
+    main()
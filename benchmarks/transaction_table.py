@@ -0,0 +1,137 @@
+"""
+Колоночная TransactionTable против разбора строк-словарей
+
+Сравниваются память и время агрегаций на ROWS строках листа Транзакции:
+- "словари": исходный подход - строки get_all_values, safe_float на каждую
+  ячейку и вложенные словари по дням/категориям/счетам;
+- "колонки": TransactionTable, построенная один раз из тех же строк.
+
+Запуск: python -m benchmarks.transaction_table
+"""
+import time
+import tracemalloc
+from typing import Dict, List, Any, Callable, Tuple
+from benchmarks.fake_sheets import make_transactions
+from utils.formatters import safe_float
+from services.transaction_table import TransactionTable
+
+ROWS = 100_000
+REPEAT = 5
+
+
+def dict_income_by_days(rows: List[List[str]]) -> Dict[str, Any]:
+    """Исходная реализация get_income_by_days"""
+    income_by_day = {}
+
+    for row in rows:
+        if row[0] and row[0].strip() and len(row) > 1:
+            if row[1] == "Доход":
+                day = row[0]
+                amount = safe_float(row[4])
+                category = row[3] if len(row) > 3 else ""
+                comment = row[6] if len(row) > 6 else ""
+                hours = safe_float(row[8]) if len(row) > 8 else 0
+
+                if day not in income_by_day:
+                    income_by_day[day] = {"total": 0, "tips": 0, "hours": 0, "other": 0, "entries": []}
+
+                income_by_day[day]["total"] += amount
+                if category == "Зарплата/Чаевые":
+                    income_by_day[day]["tips"] += amount
+                    income_by_day[day]["hours"] += hours
+                else:
+                    income_by_day[day]["other"] += amount
+
+                income_by_day[day]["entries"].append({
+                    "amount": amount, "category": category, "comment": comment, "hours": hours
+                })
+
+    sorted_days = sorted(income_by_day.keys(), key=lambda x: int(x) if x.isdigit() else 0)
+    return {
+        "by_day": income_by_day,
+        "sorted_days": sorted_days,
+        "total_income": sum(d["total"] for d in income_by_day.values()),
+        "total_tips": sum(d["tips"] for d in income_by_day.values()),
+        "total_hours": sum(d["hours"] for d in income_by_day.values())
+    }
+
+
+def dict_sum_by(rows: List[List[str]], column: int, trans_type: str) -> Dict[str, float]:
+    """Сумма по колонке (день/категория/счёт) с разбором строк"""
+    totals: Dict[str, float] = {}
+    for row in rows:
+        if row[0].strip() and row[1] == trans_type:
+            totals[row[column]] = totals.get(row[column], 0.0) + safe_float(row[4])
+    return totals
+
+
+def dict_account_totals(rows: List[List[str]]) -> Dict[str, float]:
+    """Изменение баланса счетов с разбором строк"""
+    totals: Dict[str, float] = {}
+    for row in rows:
+        if not row[0].strip():
+            continue
+        amount = safe_float(row[4])
+        sign = 1.0 if row[1] == "Доход" else -1.0
+        totals[row[2]] = totals.get(row[2], 0.0) + sign * amount
+        if row[1] == "Перевод" and row[5]:
+            totals[row[5]] = totals.get(row[5], 0.0) + amount
+    return totals
+
+
+def measure(func: Callable[[], Any]) -> Tuple[float, Any]:
+    """Лучшее время из REPEAT запусков (мс) и результат"""
+    best = float("inf")
+    for _ in range(REPEAT):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000, result
+
+
+def allocated(func: Callable[[], Any]) -> Tuple[int, Any]:
+    """Память, удерживаемая результатом func (байт)"""
+    tracemalloc.start()
+    result = func()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return size, result
+
+
+def main():
+    rows_bytes, rows = allocated(lambda: make_transactions(ROWS))
+    table_bytes, table = allocated(lambda: TransactionTable.from_rows(rows))
+    build_ms, _ = measure(lambda: TransactionTable.from_rows(rows))
+
+    print(f"Транзакций: {ROWS}\n")
+    print(f"Память: строки get_all_values {rows_bytes / 2**20:.1f} МБ, "
+          f"TransactionTable {table_bytes / 2**20:.1f} МБ "
+          f"(колонки {table.nbytes() / 2**20:.1f} МБ, строк в пуле {len(table.strings)})")
+    print(f"Построение TransactionTable: {build_ms:.0f} мс (один раз на чтение листа)\n")
+
+    cases = [
+        ("доходы по дням", lambda: dict_income_by_days(rows), table.income_by_days),
+        ("расходы по дням", lambda: dict_sum_by(rows, 0, "Расход"),
+         lambda: table.sum_by_day("Расход")),
+        ("расходы по категориям", lambda: dict_sum_by(rows, 3, "Расход"),
+         lambda: table.sum_by_category("Расход")),
+        ("обороты по счетам", lambda: dict_account_totals(rows), table.account_totals),
+    ]
+
+    print(f"{'Агрегация':<24}{'словари, мс':>14}{'колонки, мс':>14}{'ускорение':>12}")
+    print("-" * 64)
+    for name, baseline, columnar in cases:
+        baseline_ms, expected = measure(baseline)
+        columnar_ms, result = measure(columnar)
+        print(f"{name:<24}{baseline_ms:>14.1f}{columnar_ms:>14.1f}{baseline_ms / columnar_ms:>11.1f}x")
+
+    # Результаты должны совпадать с исходной реализацией
+    expected = dict_income_by_days(rows)
+    result = table.income_by_days()
+    assert result["sorted_days"] == expected["sorted_days"]
+    assert result["by_day"] == expected["by_day"]
+    assert abs(result["total_income"] - expected["total_income"]) < 1e-6
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""
+Пропускная способность приёма обновлений в режиме webhook
+
+Поддельный Telegram держит N keep-alive соединений (как max_connections
+в setWebhook) и отправляет POST с обновлениями-сообщениями на webhook-сервер
+python-telegram-bot - тот же, что запускает Updater.start_webhook, но без
+вызова setWebhook. Отдельная задача забирает обновления из update_queue.
+Выводятся обновлений в секунду, перцентили времени ответа 200 и сколько
+обновлений дошло до очереди.
+
+Запуск: python -m benchmarks.webhook_ingestion
+"""
+import asyncio
+import json
+import socket
+import time
+from typing import List, Dict, Any
+from telegram.ext import Application
+from benchmarks.advisor_latency import percentile
+# Внутренние классы python-telegram-bot: start_webhook без обращения к Telegram
+from telegram.ext._utils.webhookhandler import WebhookAppClass, WebhookServer
+
+CONNECTIONS = (1, 10, 40, 100)
+UPDATES = 5000
+SECRET = "benchmark-secret"
+PATH = "/telegram"
+
+
+def make_update(update_id: int) -> bytes:
+    """Обновление с текстовым сообщением, как присылает Telegram"""
+    return json.dumps({
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": 1700000000,
+            "chat": {"id": 1000 + update_id % 50, "type": "private"},
+            "from": {"id": 1000 + update_id % 50, "is_bot": False, "first_name": "Тест"},
+            "text": f"{update_id % 100 + 5} кафе обед"
+        }
+    }, ensure_ascii=False).encode("utf-8")
+
+
+def free_port() -> int:
+    """Свободный локальный порт"""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def sender(port: int, update_ids: List[int], latencies: List[float]):
+    """Одно соединение поддельного Telegram: обновления по очереди"""
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    try:
+        for update_id in update_ids:
+            body = make_update(update_id)
+            started = time.monotonic()
+            writer.write(
+                (
+                    f"POST {PATH} HTTP/1.1\r\n"
+                    f"Host: 127.0.0.1\r\n"
+                    f"Content-Type: application/json\r\n"
+                    f"X-Telegram-Bot-Api-Secret-Token: {SECRET}\r\n"
+                    f"Content-Length: {len(body)}\r\n\r\n"
+                ).encode("latin-1") + body
+            )
+            await writer.drain()
+
+            head = await reader.readuntil(b"\r\n\r\n")
+            length = 0
+            for line in head.decode("latin-1").split("\r\n"):
+                if line.lower().startswith("content-length:"):
+                    length = int(line.split(":", 1)[1])
+            await reader.readexactly(length)
+            if not head.startswith(b"HTTP/1.1 200"):
+                raise RuntimeError(head.split(b"\r\n", 1)[0].decode())
+            latencies.append(time.monotonic() - started)
+    finally:
+        writer.close()
+
+
+async def consume(application: Application, delivered: List[int], total: int):
+    """Забрать обновления из очереди (вместо обработчиков бота)"""
+    while len(delivered) < total:
+        update = await application.update_queue.get()
+        delivered.append(update.update_id)
+
+
+async def measure(connections: int) -> Dict[str, Any]:
+    """Отправить UPDATES обновлений через connections соединений"""
+    application = Application.builder().token("123456:BENCHMARK").build()
+    app = WebhookAppClass(PATH, application.bot, application.update_queue, SECRET)
+    server = WebhookServer("127.0.0.1", free_port(), app, None)
+    await server.serve_forever()
+
+    latencies: List[float] = []
+    delivered: List[int] = []
+    consumer = asyncio.create_task(consume(application, delivered, UPDATES))
+    started = time.monotonic()
+    await asyncio.gather(*(
+        sender(server.port, list(range(i, UPDATES, connections)), latencies)
+        for i in range(connections)
+    ))
+    await asyncio.wait_for(consumer, 10)
+    elapsed = time.monotonic() - started
+    await server.shutdown()
+
+    return {
+        "connections": connections,
+        "rps": UPDATES / elapsed,
+        "p50": percentile(latencies, 50) * 1000,
+        "p95": percentile(latencies, 95) * 1000,
+        "p99": percentile(latencies, 99) * 1000,
+        "delivered": len(delivered)
+    }
+
+
+async def run():
+    print(f"Приём {UPDATES} обновлений через webhook (127.0.0.1, keep-alive)")
+    print(f"{'соединений':>11}{'обновл/с':>11}{'p50, мс':>10}{'p95, мс':>10}{'p99, мс':>10}{'в очереди':>11}")
+    print("-" * 63)
+    for connections in CONNECTIONS:
+        row = await measure(connections)
+        print(f"{row['connections']:>11}{row['rps']:>11.0f}{row['p50']:>10.2f}{row['p95']:>10.2f}"
+              f"{row['p99']:>10.2f}{row['delivered']:>11}")
+
+
+def main():
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    main()
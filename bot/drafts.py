@@ -0,0 +1,102 @@
+"""
+Черновики транзакций, которые пользователи заполняют в диалоге /add
+
+Черновик создаётся при первом шаге диалога и удаляется при
+подтверждении или отмене. Брошенные черновики живут не дольше
+TRANSACTION_CONVERSATION_TIMEOUT - после этого ConversationHandler
+всё равно закрывает диалог. Число черновиков ограничено
+TRANSACTION_DRAFTS_MAX (вытесняются давно неактивные), так что память
+не растёт с числом пользователей.
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Any, Optional
+import config
+from bot.states import TransactionData
+
+
+class DraftStore:
+    """Черновики по user_id с вытеснением неактивных"""
+
+    def __init__(
+        self,
+        ttl: float = config.TRANSACTION_CONVERSATION_TIMEOUT,
+        max_entries: int = config.TRANSACTION_DRAFTS_MAX
+    ):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._drafts: "OrderedDict[int, TransactionData]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.created = 0
+        self.evicted_idle = 0
+        self.evicted_lru = 0
+
+    def get(self, user_id: int) -> TransactionData:
+        """Черновик пользователя (новый, если его нет или он истёк)"""
+        with self._lock:
+            self._evict_idle()
+            draft = self._drafts.get(user_id)
+            if draft is None:
+                return self._create(user_id)
+            draft.last_active = time.monotonic()
+            self._drafts.move_to_end(user_id)
+            return draft
+
+    def new(self, user_id: int) -> TransactionData:
+        """Начать черновик заново"""
+        with self._lock:
+            self._evict_idle()
+            self._drafts.pop(user_id, None)
+            return self._create(user_id)
+
+    def discard(self, user_id: int):
+        """Удалить черновик (транзакция записана или отменена)"""
+        with self._lock:
+            self._drafts.pop(user_id, None)
+
+    def _create(self, user_id: int) -> TransactionData:
+        """Создать черновик (вызывать под блокировкой)"""
+        draft = self._drafts[user_id] = TransactionData()
+        draft.last_active = time.monotonic()
+        self.created += 1
+        while len(self._drafts) > self.max_entries:
+            self._drafts.popitem(last=False)
+            self.evicted_lru += 1
+        return draft
+
+    def _evict_idle(self):
+        """Удалить истёкшие черновики (вызывать под блокировкой; старые - в начале)"""
+        deadline = time.monotonic() - self.ttl
+        while self._drafts:
+            user_id, draft = next(iter(self._drafts.items()))
+            if draft.last_active > deadline:
+                break
+            del self._drafts[user_id]
+            self.evicted_idle += 1
+
+    def __len__(self) -> int:
+        return len(self._drafts)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Число черновиков и вытеснений"""
+        with self._lock:
+            self._evict_idle()
+            return {
+                "drafts": len(self._drafts),
+                "created": self.created,
+                "evicted_idle": self.evicted_idle,
+                "evicted_lru": self.evicted_lru
+            }
+
+
+# Создаем глобальный экземпляр
+_drafts: Optional[DraftStore] = None
+
+def get_drafts() -> DraftStore:
+    """Получить хранилище черновиков (singleton)"""
+    global _drafts
+    if _drafts is None:
+        _drafts = DraftStore()
+    return _drafts
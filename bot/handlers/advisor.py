@@ -1,12 +1,23 @@
 """
 Обработчик AI советника
 """
-from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
-from telegram.ext import ContextTypes, ConversationHandler
+import asyncio
+import logging
+from typing import Optional, Dict, Any, Callable, Awaitable, Tuple
+from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup, Message
+from telegram.ext import ContextTypes, ConversationHandler, filters
+import config
 from bot.keyboards.menus import get_main_menu
 from bot.states import AdvisorStates
-from services.sheets import get_sheets_service
-from services.ai_advisor import get_advisor
+from bot.streaming import StreamingReply
+from services.async_sheets import get_async_sheets_service
+from services.ai_advisor import get_advisor, is_error_reply
+from services.daily_advice import get_daily_advice
+from services.local_advisor import local_advice
+from services.conversation import get_conversations
+from utils.formatters import parse_quick_input
+
+logger = logging.getLogger(__name__)
 
 
 def get_advisor_keyboard() -> InlineKeyboardMarkup:
@@ -19,10 +30,170 @@ def get_advisor_keyboard() -> InlineKeyboardMarkup:
     return InlineKeyboardMarkup(keyboard)
 
 
+# Кнопки постоянной клавиатуры (и те же слова, набранные вручную)
+REPLY_KEYBOARD_TEXTS = {
+    "➕ расход", "расход", "💰 доход", "доход", "💳 баланс", "баланс",
+    "📊 статистика", "статистика", "🤖 советник", "советник"
+}
+
+
+class LeaveAdvisorFilter(filters.MessageFilter):
+    """Текст, который не вопрос советнику: кнопка клавиатуры или быстрый ввод транзакции"""
+
+    def filter(self, message: Message) -> bool:
+        text = (message.text or "").strip().lower()
+        return text in REPLY_KEYBOARD_TEXTS or parse_quick_input(text) is not None
+
+
+LEAVE_ADVISOR = LeaveAdvisorFilter(name="LeaveAdvisor")
+
+
+# Заголовок совета по правилам (когда модель не успела или недоступна)
+LOCAL_HEADER = "🧮 **Быстрый совет (без AI):**\n\n"
+PENDING_NOTE = "\n\n⏳ _Ответ AI появится здесь, как только будет готов._"
+
+# Сообщения с советом по правилам, ждущие ответа AI: (chat_id, message_id) -> метка ожидания
+_late_answers: Dict[Tuple[int, int], object] = {}
+
+
+async def release_fallback_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """
+    Нажатие кнопки под сообщением (группа -1, до остальных обработчиков)
+
+    Кнопка уводит сообщение на другой экран - поздний ответ AI
+    его уже не заменяет.
+    """
+    message = update.callback_query.message if update.callback_query else None
+    if message is not None:
+        _late_answers.pop((message.chat_id, message.message_id), None)
+
+
+async def answer_with_fallback(
+    context: ContextTypes.DEFAULT_TYPE,
+    reply: StreamingReply,
+    budget_data: Dict[str, Any],
+    generate: Callable[[Optional[Callable[[str], Awaitable[None]]]], Awaitable[str]]
+):
+    """
+    Показать ответ модели, а если она не успевает - сначала совет по правилам
+
+    Если за LLM_FALLBACK_DEADLINE не пришёл ни ответ, ни первый фрагмент
+    потока, в сообщении сразу появляется локальный совет. Ответ модели
+    заменит его, когда придёт, если сообщение всё ещё показывает этот совет
+    (под ним не нажимали кнопок): запрос дорабатывает в фоне, не задерживая
+    обработку других сообщений.
+
+    Args:
+        generate: Запрос к модели, принимает колбэк on_text (или None)
+    """
+    fallback_shown = False
+
+    async def on_text(text: str):
+        # После локального совета промежуточный текст модели не показываем
+        if not fallback_shown:
+            await reply.update(text)
+
+    task = asyncio.ensure_future(generate(on_text if config.ADVISOR_STREAMING else None))
+    await asyncio.wait({task}, timeout=config.LLM_FALLBACK_DEADLINE)
+    if task.done() or reply.shown:
+        await finish_advice(reply, await task, budget_data)
+        return
+
+    fallback_shown = True
+    ai_header = reply.header
+    reply.header = LOCAL_HEADER
+    await reply.finish(local_advice(budget_data) + PENDING_NOTE, reply_markup=get_advisor_keyboard())
+
+    key = (reply.message.chat_id, reply.message.message_id)
+    token = _late_answers[key] = object()
+
+    async def deliver_late():
+        try:
+            advice = await task
+            # Сообщение уже показывает другой экран (или ждёт другого ответа)
+            if _late_answers.get(key) is not token:
+                logger.info("Ответ AI пришёл после ухода с экрана совета - не показываем")
+                return
+            reply.header = ai_header
+            await finish_advice(reply, advice, budget_data)
+        finally:
+            if _late_answers.get(key) is token:
+                del _late_answers[key]
+
+    context.application.create_task(deliver_late())
+
+
+async def finish_advice(reply: StreamingReply, advice: str, budget_data: Dict[str, Any]):
+    """Показать ответ модели; вместо ошибки API - совет по правилам"""
+    if is_error_reply(advice):
+        reply.header = LOCAL_HEADER
+        advice = f"{local_advice(budget_data)}\n\n{advice}"
+    await reply.finish(advice, reply_markup=get_advisor_keyboard())
+
+
+async def reply_with_advice(
+    context: ContextTypes.DEFAULT_TYPE,
+    message: Message,
+    header: str,
+    budget_data: Dict[str, Any],
+    question: str,
+    user_id: int
+):
+    """
+    Ответить на вопрос в сообщении message с учётом истории диалога
+
+    При ADVISOR_STREAMING текст появляется по мере генерации,
+    иначе сообщение заменяется готовым ответом. Ответ (даже пришедший
+    после локального совета) добавляется в память диалога.
+    """
+    advisor = get_advisor()
+    conversations = get_conversations()
+    history = conversations.history(user_id)
+
+    async def generate(on_text):
+        advice = await advisor.get_advice(
+            budget_data, user_question=question, on_text=on_text, history=history
+        )
+        if not is_error_reply(advice):
+            conversations.record(user_id, question, advice)
+        return advice
+
+    await answer_with_fallback(context, StreamingReply(message, header), budget_data, generate)
+
+
+async def show_daily_advice(
+    context: ContextTypes.DEFAULT_TYPE,
+    message: Message,
+    budget_data: Dict[str, Any],
+    force: bool = False
+):
+    """
+    Показать совет дня в сообщении message
+
+    Актуальный совет, подготовленный заранее, показывается сразу;
+    иначе (или при force) он составляется заново и сохраняется.
+    """
+    daily = get_daily_advice()
+    version = get_async_sheets_service().get_data_version()
+    reply = StreamingReply(message, "🤖 **AI Советник:**\n\n")
+
+    advice = None if force else daily.get(budget_data, version)
+    if advice is not None:
+        await reply.finish(advice, reply_markup=get_advisor_keyboard())
+        return
+
+    await answer_with_fallback(
+        context,
+        reply,
+        budget_data,
+        lambda on_text: daily.generate(budget_data, version, on_text=on_text)
+    )
+
+
 async def advisor_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Команда /advisor - запуск AI советника"""
     
-    await update.message.reply_text(
+    status = await update.message.reply_text(
         "🤖 **AI Советник**\n\n"
         "Анализирую твой бюджет...",
         parse_mode="Markdown"
@@ -30,21 +201,14 @@ async def advisor_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     
     try:
         # Получаем данные бюджета
-        sheets = get_sheets_service()
-        budget_data = sheets.get_monthly_summary()
+        sheets = get_async_sheets_service()
+        budget_data = await sheets.get_monthly_summary()
         
         # Сохраняем данные для последующих вопросов
         context.user_data['budget_data'] = budget_data
         
-        # Получаем совет от AI
-        advisor = get_advisor()
-        advice = await advisor.get_advice(budget_data)
-        
-        await update.message.reply_text(
-            f"🤖 **AI Советник:**\n\n{advice}",
-            parse_mode="Markdown",
-            reply_markup=get_advisor_keyboard()
-        )
+        # Совет от AI появляется в том же сообщении
+        await show_daily_advice(context, status, budget_data)
         
     except Exception as e:
         await update.message.reply_text(
@@ -54,33 +218,25 @@ async def advisor_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         )
 
 
-async def advisor_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """Callback для кнопки AI советника"""
+async def advisor_callback(update: Update, context: ContextTypes.DEFAULT_TYPE, force: bool = False):
+    """Callback для кнопки AI советника (force - составить совет заново)"""
     query = update.callback_query
     await query.answer()
     
-    await query.edit_message_text(
+    status = await query.edit_message_text(
         "🤖 **AI Советник**\n\n"
         "Анализирую твой бюджет...",
         parse_mode="Markdown"
     )
     
     try:
-        sheets = get_sheets_service()
-        budget_data = sheets.get_monthly_summary()
+        sheets = get_async_sheets_service()
+        budget_data = await sheets.get_monthly_summary()
         
         # Сохраняем данные для последующих вопросов
         context.user_data['budget_data'] = budget_data
         
-        advisor = get_advisor()
-        advice = await advisor.get_advice(budget_data)
-        
-        await context.bot.send_message(
-            chat_id=query.message.chat_id,
-            text=f"🤖 **AI Советник:**\n\n{advice}",
-            parse_mode="Markdown",
-            reply_markup=get_advisor_keyboard()
-        )
+        await show_daily_advice(context, status, budget_data, force=force)
         
     except Exception as e:
         await context.bot.send_message(
@@ -104,7 +260,9 @@ async def advisor_ask_callback(update: Update, context: ContextTypes.DEFAULT_TYP
         "• Как оптимизировать расходы?\n"
         "• Стоит ли делать крупную покупку?\n"
         "• Что делать с долгом?\n\n"
-        "Напиши вопрос или /cancel для отмены",
+        "Можно задавать уточняющие вопросы подряд - я помню разговор.\n"
+        "Кнопки внизу экрана и быстрый ввод транзакции завершают разговор.\n"
+        "Напиши вопрос или /cancel, чтобы закончить",
         parse_mode="Markdown"
     )
     return AdvisorStates.WAITING_QUESTION
@@ -115,18 +273,15 @@ async def advisor_refresh_callback(update: Update, context: ContextTypes.DEFAULT
     query = update.callback_query
     await query.answer("Обновляю данные...")
     
-    await advisor_callback(update, context)
+    await advisor_callback(update, context, force=True)
 
 
 async def advisor_question(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """Обработка вопроса к AI советнику"""
+    """Обработка вопроса к AI советнику (диалог продолжается до /cancel или паузы)"""
     
     question = update.message.text
     
-    # Убираем флаг ожидания
-    context.user_data['waiting_advisor_question'] = False
-    
-    await update.message.reply_text(
+    status = await update.message.reply_text(
         "🤖 Думаю над ответом...",
         parse_mode="Markdown"
     )
@@ -135,17 +290,12 @@ async def advisor_question(update: Update, context: ContextTypes.DEFAULT_TYPE):
         # Получаем сохранённые данные или загружаем новые
         budget_data = context.user_data.get('budget_data')
         if not budget_data:
-            sheets = get_sheets_service()
-            budget_data = sheets.get_monthly_summary()
+            sheets = get_async_sheets_service()
+            budget_data = await sheets.get_monthly_summary()
             context.user_data['budget_data'] = budget_data
         
-        advisor = get_advisor()
-        advice = await advisor.get_advice(budget_data, user_question=question)
-        
-        await update.message.reply_text(
-            f"🤖 **Ответ:**\n\n{advice}",
-            parse_mode="Markdown",
-            reply_markup=get_advisor_keyboard()
+        await reply_with_advice(
+            context, status, "🤖 **Ответ:**\n\n", budget_data, question, update.effective_user.id
         )
         
     except Exception as e:
@@ -154,9 +304,44 @@ async def advisor_question(update: Update, context: ContextTypes.DEFAULT_TYPE):
             reply_markup=get_main_menu()
         )
     
+    # Следующее сообщение - уточняющий вопрос в том же диалоге
+    return AdvisorStates.WAITING_QUESTION
+
+
+def end_advisor_conversation(user_id: int, context: ContextTypes.DEFAULT_TYPE):
+    """Забыть диалог пользователя с советником"""
+    context.user_data['waiting_advisor_question'] = False
+    get_conversations().end(user_id)
+
+
+async def advisor_leave(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """
+    Кнопка клавиатуры или быстрый ввод во время диалога с советником
+
+    Диалог закрывается без ответа; само сообщение обрабатывает
+    handle_text (группа 1) - флаг ожидания вопроса уже снят.
+    """
+    end_advisor_conversation(update.effective_user.id, context)
+    return ConversationHandler.END
+
+
+async def advisor_cancel(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Команда /cancel в диалоге с советником"""
+    end_advisor_conversation(update.effective_user.id, context)
+    
+    await update.message.reply_text(
+        "🤖 Разговор с советником завершён",
+        reply_markup=get_main_menu()
+    )
     return ConversationHandler.END
 
 
+async def advisor_timeout(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Диалог с советником закрыт по таймауту"""
+    if update.effective_user:
+        end_advisor_conversation(update.effective_user.id, context)
+
+
 async def handle_advisor_text(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Обработка текста когда ожидается вопрос AI"""
     
@@ -179,7 +364,9 @@ async def ask_advisor_command(update: Update, context: ContextTypes.DEFAULT_TYPE
         "• _Как мне оптимизировать расходы?_\n"
         "• _Стоит ли мне делать крупную покупку?_\n"
         "• _Что посоветуешь с учётом моего Human Design?_\n\n"
-        "Напиши свой вопрос или /cancel для отмены:",
+        "Можно задавать уточняющие вопросы подряд - я помню разговор.\n"
+        "Кнопки внизу экрана и быстрый ввод транзакции завершают разговор.\n"
+        "Напиши свой вопрос или /cancel, чтобы закончить:",
         parse_mode="Markdown"
     )
     
@@ -3,20 +3,55 @@
 """
 from telegram import Update
 from telegram.ext import ContextTypes
-from telegram.error import BadRequest
 from bot.keyboards.menus import get_main_menu, get_history_keyboard
-from services.sheets import get_sheets_service
+from bot.render_cache import get_render_cache
+from services.async_sheets import get_async_sheets_service
+from services.sheets import TransactionChangedError
 from utils.formatters import format_balance_message, format_stats_message, format_history, format_income_by_days
 
 
+async def render_balance() -> str:
+    """Экран балансов (из кэша экранов, пока данные не менялись)"""
+    sheets = get_async_sheets_service()
+    return await get_render_cache().render(("balance",), sheets.get_accounts_balance, format_balance_message)
+
+
+async def render_stats() -> str:
+    """Экран статистики за месяц"""
+    sheets = get_async_sheets_service()
+    return await get_render_cache().render(("stats",), sheets.get_monthly_summary, format_stats_message)
+
+
+async def render_income() -> str:
+    """Экран доходов по дням"""
+    sheets = get_async_sheets_service()
+    return await get_render_cache().render(("income",), sheets.get_income_by_days, format_income_by_days)
+
+
+async def render_history(before_row: int = None):
+    """Страница истории: текст и клавиатура (before_row=None - последние транзакции)"""
+    sheets = get_async_sheets_service()
+
+    def build(page):
+        transactions = page["transactions"]
+        first_page = before_row is None
+        return (
+            format_history(transactions, older=not first_page),
+            get_history_keyboard(transactions, page["next_cursor"], first_page=first_page)
+        )
+
+    return await get_render_cache().render(
+        ("history", before_row),
+        lambda: sheets.get_transactions_page(10, before_row=before_row),
+        build
+    )
+
+
 async def balance_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Команда /balance - показать балансы счетов"""
     
     try:
-        sheets = get_sheets_service()
-        accounts = sheets.get_accounts_balance()
-        
-        message = format_balance_message(accounts)
+        message = await render_balance()
         
         await update.message.reply_text(
             message,
@@ -38,20 +73,8 @@ async def balance_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
     await query.answer()
 
     try:
-        sheets = get_sheets_service()
-        accounts = sheets.get_accounts_balance()
-
-        message = format_balance_message(accounts)
-
-        try:
-            await query.edit_message_text(
-                message,
-                parse_mode="Markdown",
-                reply_markup=get_main_menu()
-            )
-        except BadRequest as e:
-            if "message is not modified" not in str(e).lower():
-                raise
+        message = await render_balance()
+        await get_render_cache().edit(query, message, reply_markup=get_main_menu())
 
     except Exception as e:
         await query.edit_message_text(
@@ -64,10 +87,7 @@ async def stats_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Команда /stats - статистика за месяц"""
     
     try:
-        sheets = get_sheets_service()
-        data = sheets.get_monthly_summary()
-        
-        message = format_stats_message(data)
+        message = await render_stats()
         
         await update.message.reply_text(
             message,
@@ -88,20 +108,8 @@ async def stats_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
     await query.answer()
 
     try:
-        sheets = get_sheets_service()
-        data = sheets.get_monthly_summary()
-
-        message = format_stats_message(data)
-
-        try:
-            await query.edit_message_text(
-                message,
-                parse_mode="Markdown",
-                reply_markup=get_main_menu()
-            )
-        except BadRequest as e:
-            if "message is not modified" not in str(e).lower():
-                raise
+        message = await render_stats()
+        await get_render_cache().edit(query, message, reply_markup=get_main_menu())
 
     except Exception as e:
         await query.edit_message_text(
@@ -114,15 +122,12 @@ async def history_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Команда /history - последние транзакции"""
     
     try:
-        sheets = get_sheets_service()
-        transactions = sheets.get_recent_transactions(10)
-        
-        message = format_history(transactions)
+        message, keyboard = await render_history()
         
         await update.message.reply_text(
             message,
             parse_mode="Markdown",
-            reply_markup=get_main_menu()
+            reply_markup=keyboard
         )
         
     except Exception as e:
@@ -138,20 +143,27 @@ async def history_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
     await query.answer()
 
     try:
-        sheets = get_sheets_service()
-        transactions = sheets.get_recent_transactions(10)
+        message, keyboard = await render_history()
+        await get_render_cache().edit(query, message, reply_markup=keyboard)
 
-        message = format_history(transactions)
+    except Exception as e:
+        await query.edit_message_text(
+            f"❌ Ошибка: {str(e)}",
+            reply_markup=get_main_menu()
+        )
 
-        try:
-            await query.edit_message_text(
-                message,
-                parse_mode="Markdown",
-                reply_markup=get_history_keyboard(transactions)
-            )
-        except BadRequest as e:
-            if "message is not modified" not in str(e).lower():
-                raise
+
+async def history_page_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Callback для кнопки 'Ранее' - более старые транзакции"""
+    query = update.callback_query
+    await query.answer()
+
+    try:
+        # Извлекаем курсор из callback_data (формат: history_<row_index>)
+        before_row = int(query.data.replace("history_", ""))
+
+        message, keyboard = await render_history(before_row)
+        await get_render_cache().edit(query, message, reply_markup=keyboard)
 
     except Exception as e:
         await query.edit_message_text(
@@ -164,10 +176,7 @@ async def income_stats_command(update: Update, context: ContextTypes.DEFAULT_TYP
     """Команда /income - статистика доходов по дням"""
 
     try:
-        sheets = get_sheets_service()
-        data = sheets.get_income_by_days()
-
-        message = format_income_by_days(data)
+        message = await render_income()
 
         await update.message.reply_text(
             message,
@@ -188,20 +197,8 @@ async def income_stats_callback(update: Update, context: ContextTypes.DEFAULT_TY
     await query.answer()
 
     try:
-        sheets = get_sheets_service()
-        data = sheets.get_income_by_days()
-
-        message = format_income_by_days(data)
-
-        try:
-            await query.edit_message_text(
-                message,
-                parse_mode="Markdown",
-                reply_markup=get_main_menu()
-            )
-        except BadRequest as e:
-            if "message is not modified" not in str(e).lower():
-                raise
+        message = await render_income()
+        await get_render_cache().edit(query, message, reply_markup=get_main_menu())
 
     except Exception as e:
         await query.edit_message_text(
@@ -216,21 +213,27 @@ async def delete_transaction_callback(update: Update, context: ContextTypes.DEFA
     await query.answer()
 
     try:
-        # Извлекаем row_index из callback_data (формат: delete_<row_index>)
-        row_index = int(query.data.replace("delete_", ""))
+        # Извлекаем row_index и отпечаток строки из callback_data (формат: delete_<row_index>_<отпечаток>);
+        # у старых кнопок без отпечатка удаление не пройдёт проверку
+        _, row, *rest = query.data.split("_")
+        row_index = int(row)
+        fingerprint = rest[0] if rest else ""
 
-        sheets = get_sheets_service()
-        success = sheets.delete_transaction(row_index)
+        sheets = get_async_sheets_service()
+        try:
+            success = await sheets.delete_transaction(row_index, fingerprint)
+        except TransactionChangedError as e:
+            message, keyboard = await render_history()
+            await get_render_cache().edit(
+                query, f"⚠️ {e}. Проверь историю и удали ещё раз.\n\n{message}", reply_markup=keyboard
+            )
+            return
 
         if success:
             # После удаления показываем обновлённую историю
-            transactions = sheets.get_recent_transactions(10)
-            message = format_history(transactions)
-
-            await query.edit_message_text(
-                f"✅ Последняя транзакция удалена\n\n{message}",
-                parse_mode="Markdown",
-                reply_markup=get_history_keyboard(transactions)
+            message, keyboard = await render_history()
+            await get_render_cache().edit(
+                query, f"✅ Последняя транзакция удалена\n\n{message}", reply_markup=keyboard
             )
         else:
             await query.answer("❌ Ошибка удаления", show_alert=True)
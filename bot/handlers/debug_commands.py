@@ -6,6 +6,16 @@ from telegram import Update
 from telegram.ext import ContextTypes
 from utils.debug_logger import bug_tracker
 from bot.keyboards.menus import get_main_menu
+from services.async_sheets import get_async_sheets_service
+from services.write_queue import get_write_queue
+from services.mirror import get_mirror
+from services.startup import get_startup_tracker
+from services.ai_advisor import get_advisor
+from services.daily_advice import get_daily_advice
+from services.conversation import get_conversations
+from bot.drafts import get_drafts
+from bot.references import get_reference_cache
+from bot.render_cache import get_render_cache
 
 logger = logging.getLogger(__name__)
 
@@ -52,3 +62,143 @@ async def clear_bugs_command(update: Update, context: ContextTypes.DEFAULT_TYPE)
         f"Осталось нерешенных: {unresolved_count}",
         reply_markup=get_main_menu()
     )
+
+
+async def perf_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Команда /perf - счётчики производительности"""
+
+    sheets = get_async_sheets_service()
+    cache = sheets.get_cache_stats()
+
+    response = "⚡ **Производительность**\n\n"
+    response += "📦 *Кэш Google Sheets:*\n"
+    response += f"• Попадания: {cache['hits']}, промахи: {cache['misses']} ({cache['hit_rate']:.0%})\n"
+    response += f"• Сбросов после записи: {cache['invalidations']}, вытеснений: {cache['evictions']}\n"
+    response += f"• Листов в кэше: {cache['entries']} ({cache['cells']} ячеек)\n"
+    response += f"• Версия данных: {sheets.get_data_version()}\n"
+
+    render = get_render_cache().get_stats()
+    response += "\n🖼 *Экраны (балансы, статистика, история):*\n"
+    response += (
+        f"• Из кэша: {render['hits']}, построено: {render['misses']} ({render['hit_rate']:.0%})\n"
+        f"• Правок отправлено: {render['edits']}, пропущено без изменений: {render['edits_skipped']}, "
+        f"\"not modified\" от Telegram: {render['not_modified']}\n"
+    )
+
+    limits = sheets.get_rate_limit_stats()
+    response += "\n🚦 *Квоты Google Sheets:*\n"
+    for kind, title in (("read", "Чтение"), ("write", "Запись")):
+        bucket = limits[kind]
+        response += (
+            f"• {title}: запросов {bucket['acquired']}, ожидали квоту {bucket['throttled']} "
+            f"({bucket['wait_time']:.1f} с), в очереди {bucket['queued']}, "
+            f"не дождались до срока {bucket['expired']}\n"
+        )
+    response += f"• Повторов после 429/5xx: {limits['retries']}, неудач: {limits['failures']}\n"
+
+    writes = get_write_queue().get_stats()
+    response += "\n✍️ *Пакетная запись:*\n"
+    response += f"• Записано строк: {writes['rows_written']}, ошибок: {writes['rows_failed']}, "
+    response += f"без ответа таблицы: {writes['rows_unknown']}\n"
+    response += f"• Запросов append: {writes['api_calls']} ({writes['rows_per_call']:.1f} строк/запрос)\n"
+    response += f"• В очереди: {writes['pending']}\n"
+    drafts = get_drafts().get_stats()
+    response += (
+        f"• Черновиков /add: {drafts['drafts']} (создано {drafts['created']}, "
+        f"истекло {drafts['evicted_idle']}, вытеснено {drafts['evicted_lru']})\n"
+    )
+    refs = get_reference_cache().get_stats()
+    if refs["version"] is not None:
+        response += (
+            f"• Справочники: версия {refs['version']}, возраст {refs['age'] / 60:.0f} мин, "
+            f"шагов без чтения таблицы {refs['hits']}, обновлений {refs['refreshes']} "
+            f"(изменились {refs['rebuilds']}, ошибок {refs['failures']})\n"
+        )
+
+    aggregates = sheets.get_aggregate_stats()
+    if aggregates is not None:
+        checked = "сверены с формулами" if aggregates["categories_consistent"] and aggregates["accounts_consistent"] \
+            else "расходятся с формулами - читаются из таблицы"
+        response += "\n🧮 *Итоги по транзакциям:*\n"
+        response += f"• {'актуальны' if aggregates['ready'] else 'требуют пересчёта'}, {checked}\n"
+        response += f"• Строк: {aggregates['rows']}, пересчётов: {aggregates['seeds']}, обновлений при записи: {aggregates['updates']}\n"
+
+    llm = get_advisor().get_stats()
+    response += "\n🤖 *DeepSeek:*\n"
+    response += f"• Запросов: {llm['requests']}, новых соединений: {llm['new_connections']} ({'HTTP/2' if llm['http2'] else 'HTTP/1.1'})\n"
+    response += f"• Рукопожатие: {llm['avg_handshake']:.2f} с, ожидание ответа: {llm['avg_waiting']:.2f} с (в среднем)\n"
+    response += (
+        f"• Токенов промпта: {llm['avg_prompt_tokens']:.0f} в среднем, из кэша DeepSeek "
+        f"{llm['prompt_cache_rate']:.0%}; сводка бюджета ~{llm['context_tokens']}\n"
+    )
+    response += f"• Время запроса: {llm['avg_total']:.2f} с (в среднем)\n"
+    if llm["avg_first_text"] is not None:
+        response += f"• Первый текст в потоковом режиме: {llm['avg_first_text']:.2f} с (в среднем)\n"
+    response += (
+        f"• Кэш ответов: попаданий {llm['cache']['hits']}, промахов {llm['cache']['misses']} "
+        f"({llm['cache']['hit_rate']:.0%}), записей {llm['cache']['entries']}\n"
+    )
+    sched = llm["scheduler"]
+    response += (
+        f"• Одновременно: {sched['active']}/{sched['limit']}, в очереди {sched['queued']} "
+        f"(фоновых {sched['queued_by_priority']['background']}, максимум {sched['max_depth']}), "
+        f"ожидание {sched['avg_wait']:.2f} с\n"
+        f"• Отклонено при заполненной очереди: {sched['rejected']}, не дождались срока: {sched['expired']}\n"
+    )
+    dialogs = get_conversations().get_stats()
+    response += (
+        f"• Диалоги: {dialogs['sessions']}, история до {dialogs['max_tokens']} токенов "
+        f"(в среднем {dialogs['avg_tokens']:.0f}), закрыто по паузе {dialogs['evicted_idle']}, "
+        f"вытеснено {dialogs['evicted_lru']}\n"
+    )
+    daily = get_daily_advice().get_stats()
+    age = f", возраст {daily['age'] / 60:.0f} мин" if daily["age"] is not None else ", ещё не составлен"
+    response += (
+        f"• Совет дня: показан готовым {daily['served']}, составлен {daily['generated']}, "
+        f"пересчёт не понадобился {daily['skipped']}{age}\n"
+    )
+    if llm["last"]:
+        last = llm["last"]
+        response += (
+            f"• Последний: {last['total']:.2f} с, соединение "
+            f"{'из пула' if last['reused'] else 'новое'}, ожидание {last['waiting']:.2f} с\n"
+        )
+
+    response += "\n🔀 *Объединение одновременных запросов:*\n"
+    for title, flight in (("Сводка", sheets.get_coalescing_stats()), ("DeepSeek", llm["coalescing"])):
+        response += (
+            f"• {title}: вызовов {flight['calls']}, выполнено {flight['executions']}, "
+            f"объединено {flight['coalesced']} ({flight['coalesced_rate']:.0%})\n"
+        )
+
+    startup = get_startup_tracker().get_stats()
+    phases = startup["phases"]
+    response += "\n🚀 *Запуск:*\n"
+    response += f"• {'готов' if startup['ready'] else 'прогрев...'}, аптайм {startup['uptime']:.0f} с\n"
+    for phase, title in (
+        ("bot_initialized", "бот инициализирован"),
+        ("sheets_connected", "таблица подключена"),
+        ("references_loaded", "справочники загружены"),
+        ("aggregates_seeded", "итоги посчитаны"),
+        ("summary_loaded", "сводка загружена"),
+        ("ready", "готов")
+    ):
+        if phase in phases:
+            response += f"• {title}: {phases[phase]:.2f} с\n"
+    if startup["error"]:
+        response += f"• ошибка прогрева: {startup['error']}\n"
+
+    mirror = get_mirror()
+    if mirror is not None:
+        stats = mirror.get_stats()
+        age = f"{stats['last_sync_age']:.0f} с назад" if stats["last_sync_age"] is not None else "ещё не было"
+        response += "\n🗄 *Локальное зеркало:*\n"
+        response += f"• {'готово' if stats['ready'] else 'синхронизируется'}, строк: {stats['rows']}\n"
+        response += f"• Синхронизаций: {stats['syncs']} (полных: {stats['full_syncs']}), последняя: {age}\n"
+        response += f"• Чтений из зеркала: {stats['reads']}\n"
+
+    await update.message.reply_text(
+        response,
+        parse_mode="Markdown",
+        reply_markup=get_main_menu()
+    )
@@ -8,28 +8,23 @@ from datetime import datetime
 from utils.debug_logger import bug_tracker, log_conversation_state
 from bot.keyboards.menus import (
     get_add_menu, 
-    get_accounts_keyboard, 
-    get_categories_keyboard,
     get_quick_expense_keyboard,
     get_confirm_keyboard,
     get_main_menu,
     get_date_keyboard
 )
 from bot.states import TransactionStates, TransactionData
-from services.sheets import get_sheets_service
+from bot.drafts import get_drafts
+from bot.references import get_reference_cache
+from services.write_queue import get_write_queue
 from utils.formatters import format_transaction_success, parse_quick_input
 import config
 
 logger = logging.getLogger(__name__)
 
-# Хранилище данных транзакций по user_id
-user_transactions = {}
-
 def get_user_transaction(user_id: int) -> TransactionData:
-    """Получить или создать данные транзакции для пользователя"""
-    if user_id not in user_transactions:
-        user_transactions[user_id] = TransactionData()
-    return user_transactions[user_id]
+    """Получить или создать черновик транзакции пользователя"""
+    return get_drafts().get(user_id)
 
 
 async def add_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -49,7 +44,7 @@ async def menu_add_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
     # Сбрасываем данные предыдущей незавершённой транзакции
     user_id = update.effective_user.id
-    user_transactions[user_id] = TransactionData()
+    get_drafts().new(user_id)
 
     await query.edit_message_text(
         "➕ **Добавить транзакцию**\n\nВыбери тип:",
@@ -74,10 +69,12 @@ async def handle_quick_input(update: Update, context: ContextTypes.DEFAULT_TYPE)
         return
     
     try:
-        sheets = get_sheets_service()
         day = datetime.now().day
         
-        success = sheets.add_transaction(
+        # Запись в таблицу идёт в фоне пакетом; об ошибке бот сообщит отдельно
+        await get_write_queue().submit(
+            context.bot,
+            update.effective_chat.id,
             day=day,
             trans_type=parsed["type"],
             account="Наличные",
@@ -88,17 +85,14 @@ async def handle_quick_input(update: Update, context: ContextTypes.DEFAULT_TYPE)
             hours=parsed.get("hours")
         )
         
-        if success:
-            response = format_transaction_success(
-                trans_type=parsed["type"],
-                amount=parsed["amount"],
-                category=parsed["category"],
-                comment=parsed.get("comment"),
-                hours=parsed.get("hours")
-            )
-            await update.message.reply_text(response, parse_mode="Markdown")
-        else:
-            await update.message.reply_text("❌ Ошибка записи в таблицу.")
+        response = format_transaction_success(
+            trans_type=parsed["type"],
+            amount=parsed["amount"],
+            category=parsed["category"],
+            comment=parsed.get("comment"),
+            hours=parsed.get("hours")
+        )
+        await update.message.reply_text(response, parse_mode="Markdown")
             
     except Exception as e:
         logger.error(f"Ошибка quick_input: {e}")
@@ -114,8 +108,7 @@ async def select_type_callback(update: Update, context: ContextTypes.DEFAULT_TYP
         await query.answer()
 
         data = query.data
-        trans = get_user_transaction(user_id)
-        trans.reset()
+        trans = get_drafts().new(user_id)
 
         log_conversation_state(user_id, "SELECT_TYPE", "select_type_callback", {"data": data})
 
@@ -207,32 +200,22 @@ async def proceed_after_date(query, trans, day):
 
     elif trans.trans_type == "Доход":
         # Для дохода сначала выбираем счет
-        try:
-            sheets = get_sheets_service()
-            refs = sheets.get_references()
-            accounts = refs["accounts"]
-        except:
-            accounts = ["Наличные", "Карта", "Карта Сбер"]
+        refs = await get_reference_cache().get()
 
         await query.edit_message_text(
             f"💰 **Доход** (📅 {day} число)\n\n💳 На какой счет зачислить?",
             parse_mode="Markdown",
-            reply_markup=get_accounts_keyboard(accounts, "income")
+            reply_markup=refs.accounts_keyboard("income")
         )
         return TransactionStates.SELECT_ACCOUNT
 
     elif trans.trans_type == "Перевод":
-        try:
-            sheets = get_sheets_service()
-            refs = sheets.get_references()
-            accounts = refs["accounts"]
-        except:
-            accounts = ["Наличные", "Карта", "Карта Сбер"]
+        refs = await get_reference_cache().get()
         
         await query.edit_message_text(
             f"🔄 **Перевод** (📅 {day} число)\n\n💳 С какого счета списать?",
             parse_mode="Markdown",
-            reply_markup=get_accounts_keyboard(accounts, "from")
+            reply_markup=refs.accounts_keyboard("from")
         )
         return TransactionStates.SELECT_ACCOUNT
 
@@ -260,32 +243,22 @@ async def enter_custom_date(update: Update, context: ContextTypes.DEFAULT_TYPE):
             
         elif trans.trans_type == "Доход":
             # Для дохода сначала выбираем счет
-            try:
-                sheets = get_sheets_service()
-                refs = sheets.get_references()
-                accounts = refs["accounts"]
-            except:
-                accounts = ["Наличные", "Карта", "Карта Сбер"]
+            refs = await get_reference_cache().get()
 
             await update.message.reply_text(
                 f"💰 **Доход** (📅 {day} число)\n\n💳 На какой счет зачислить?",
                 parse_mode="Markdown",
-                reply_markup=get_accounts_keyboard(accounts, "income")
+                reply_markup=refs.accounts_keyboard("income")
             )
             return TransactionStates.SELECT_ACCOUNT
             
         elif trans.trans_type == "Перевод":
-            try:
-                sheets = get_sheets_service()
-                refs = sheets.get_references()
-                accounts = refs["accounts"]
-            except:
-                accounts = ["Наличные", "Карта", "Карта Сбер"]
+            refs = await get_reference_cache().get()
             
             await update.message.reply_text(
                 f"🔄 **Перевод** (📅 {day} число)\n\n💳 С какого счета списать?",
                 parse_mode="Markdown",
-                reply_markup=get_accounts_keyboard(accounts, "from")
+                reply_markup=refs.accounts_keyboard("from")
             )
             return TransactionStates.SELECT_ACCOUNT
         
@@ -338,20 +311,14 @@ async def select_account_callback(update: Update, context: ContextTypes.DEFAULT_
         account = data.replace("from_", "")
         trans.account = account
 
-        try:
-            sheets = get_sheets_service()
-            refs = sheets.get_references()
-            accounts = [a for a in refs["accounts"] if a != account]
-        except:
-            accounts = ["Наличные", "Карта", "Карта Сбер"]
-            accounts = [a for a in accounts if a != account]
+        refs = await get_reference_cache().get()
 
         await query.edit_message_text(
             f"🔄 **Перевод**\n"
             f"📤 С: {account}\n\n"
             f"💳 На какой счет зачислить?",
             parse_mode="Markdown",
-            reply_markup=get_accounts_keyboard(accounts, "to")
+            reply_markup=refs.to_accounts_keyboard(account)
         )
         return TransactionStates.SELECT_TO_ACCOUNT
 
@@ -403,19 +370,13 @@ async def select_category_callback(update: Update, context: ContextTypes.DEFAULT
 
     # Кнопка "Все категории"
     if data == "show_all_categories":
-        try:
-            sheets = get_sheets_service()
-            refs = sheets.get_references()
-            categories = refs["categories"]
-        except:
-            categories = ["Продукты", "Кафе", "Транспорт", "Такси", "Досуг", "Покупки",
-                         "Здоровье", "Связь", "ЖКХ", "Одежда"]
+        refs = await get_reference_cache().get()
 
         day_str = f" (📅 {trans.day} число)" if trans.day else ""
         await query.edit_message_text(
             f"💸 **Расход**{day_str}\n\nВыбери категорию:",
             parse_mode="Markdown",
-            reply_markup=get_categories_keyboard(categories, "Расход")
+            reply_markup=refs.categories_keyboard
         )
         return TransactionStates.SELECT_CATEGORY
 
@@ -424,12 +385,7 @@ async def select_category_callback(update: Update, context: ContextTypes.DEFAULT
         trans.category = category
 
         # Показываем выбор счёта для расхода
-        try:
-            sheets = get_sheets_service()
-            refs = sheets.get_references()
-            accounts = refs["accounts"]
-        except:
-            accounts = ["Наличные", "Карта", "Карта Сбер"]
+        refs = await get_reference_cache().get()
 
         day_str = f" (📅 {trans.day} число)" if trans.day else ""
         await query.edit_message_text(
@@ -437,7 +393,7 @@ async def select_category_callback(update: Update, context: ContextTypes.DEFAULT
             f"📁 Категория: {category}\n\n"
             f"💳 С какого счёта списать?",
             parse_mode="Markdown",
-            reply_markup=get_accounts_keyboard(accounts, "expense")
+            reply_markup=refs.accounts_keyboard("expense")
         )
         return TransactionStates.SELECT_ACCOUNT
 
@@ -457,12 +413,7 @@ async def select_category_callback(update: Update, context: ContextTypes.DEFAULT
 
         # Для расхода показываем выбор счёта
         if trans.trans_type == "Расход":
-            try:
-                sheets = get_sheets_service()
-                refs = sheets.get_references()
-                accounts = refs["accounts"]
-            except:
-                accounts = ["Наличные", "Карта", "Карта Сбер"]
+            refs = await get_reference_cache().get()
 
             day_str = f" (📅 {trans.day} число)" if trans.day else ""
             await query.edit_message_text(
@@ -470,7 +421,7 @@ async def select_category_callback(update: Update, context: ContextTypes.DEFAULT
                 f"📁 Категория: {category}\n\n"
                 f"💳 С какого счёта списать?",
                 parse_mode="Markdown",
-                reply_markup=get_accounts_keyboard(accounts, "expense")
+                reply_markup=refs.accounts_keyboard("expense")
             )
             return TransactionStates.SELECT_ACCOUNT
 
@@ -506,24 +457,13 @@ async def enter_amount(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
         # Для дохода спрашиваем категорию
         if trans.trans_type == "Доход":
-            # Загружаем категории доходов из Google Sheets
-            try:
-                sheets = get_sheets_service()
-                all_categories = sheets.get_categories_budget()
-                income_categories = [c["name"] for c in all_categories if c["type"] == "Доход"]
-                if not income_categories:
-                    income_categories = ["Зарплата/Чаевые", "Подработка", "Другое"]
-            except Exception as e:
-                logger.error(f"Ошибка загрузки категорий: {e}")
-                income_categories = ["Зарплата/Чаевые", "Подработка", "Другое"]
+            # Категории доходов - из кэша справочников
+            refs = await get_reference_cache().get()
 
             await update.message.reply_text(
                 f"💰 Сумма: **{amount}** BYN\n\n📁 Выбери категорию дохода:",
                 parse_mode="Markdown",
-                reply_markup=get_categories_keyboard(
-                    income_categories,
-                    "Доход"
-                )
+                reply_markup=refs.income_categories_keyboard
             )
             return TransactionStates.SELECT_CATEGORY
 
@@ -640,17 +580,18 @@ async def confirm_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
                 "❌ Ошибка: данные не заполнены. Начни с /add",
                 reply_markup=get_main_menu()
             )
-            trans.reset()
+            get_drafts().discard(user_id)
             return ConversationHandler.END
         
         try:
-            sheets = get_sheets_service()
             day = trans.day or datetime.now().day
             account = trans.account or "Наличные"
             
             logger.info(f"Записываю: {trans.trans_type}, {account}, {trans.amount}")
             
-            success = sheets.add_transaction(
+            await get_write_queue().submit(
+                context.bot,
+                query.message.chat_id,
                 day=day,
                 trans_type=trans.trans_type,
                 account=account,
@@ -661,24 +602,18 @@ async def confirm_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
                 hours=trans.hours
             )
             
-            if success:
-                response = format_transaction_success(
-                    trans_type=trans.trans_type,
-                    amount=trans.amount,
-                    category=trans.category,
-                    comment=trans.comment,
-                    hours=trans.hours
-                )
-                await query.edit_message_text(
-                    response,
-                    parse_mode="Markdown",
-                    reply_markup=get_main_menu()
-                )
-            else:
-                await query.edit_message_text(
-                    "❌ Ошибка записи в таблицу.",
-                    reply_markup=get_main_menu()
-                )
+            response = format_transaction_success(
+                trans_type=trans.trans_type,
+                amount=trans.amount,
+                category=trans.category,
+                comment=trans.comment,
+                hours=trans.hours
+            )
+            await query.edit_message_text(
+                response,
+                parse_mode="Markdown",
+                reply_markup=get_main_menu()
+            )
                 
         except Exception as e:
             logger.error(f"Ошибка записи: {e}")
@@ -687,11 +622,11 @@ async def confirm_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
                 reply_markup=get_main_menu()
             )
         
-        trans.reset()
+        get_drafts().discard(user_id)
         return ConversationHandler.END
         
     elif data == "confirm_no":
-        trans.reset()
+        get_drafts().discard(user_id)
         await query.edit_message_text(
             "❌ Отменено",
             reply_markup=get_main_menu()
@@ -711,9 +646,7 @@ async def confirm_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
 async def cancel(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Отмена операции"""
-    user_id = update.effective_user.id
-    if user_id in user_transactions:
-        user_transactions[user_id].reset()
+    get_drafts().discard(update.effective_user.id)
     
     await update.message.reply_text(
         "❌ Операция отменена",
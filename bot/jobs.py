@@ -0,0 +1,79 @@
+"""
+Фоновые задачи (JobQueue)
+"""
+import logging
+from telegram.ext import ContextTypes
+import config
+from services.async_sheets import get_async_sheets_service
+from services.daily_advice import get_daily_advice, today
+from services.ai_advisor import get_advisor
+from services.rate_limit import background_priority
+from bot.references import get_reference_cache
+
+logger = logging.getLogger(__name__)
+
+
+async def mirror_sync_job(context: ContextTypes.DEFAULT_TYPE):
+    """Синхронизация локального зеркала таблицы"""
+    state = context.job.data
+    state["runs"] = state.get("runs", 0) + 1
+
+    # Периодически - полная перезагрузка, чтобы подхватить ручные правки в таблице
+    # (первый запуск и каждый N-й после него; N <= 1 - каждый раз)
+    full = (state["runs"] - 1) % max(config.MIRROR_FULL_SYNC_EVERY, 1) == 0
+
+    try:
+        # Фоновая синхронизация уступает квоту запросам пользователя
+        with background_priority():
+            result = await get_async_sheets_service().sync_mirror(full=full)
+        if result["rows"] or result["full"]:
+            logger.info(
+                f"Зеркало синхронизировано: строк {result['rows']}, "
+                f"{'полная' if result['full'] else 'инкрементальная'}"
+            )
+    except Exception as e:
+        logger.warning(f"Ошибка синхронизации зеркала: {e}")
+
+
+async def references_refresh_job(context: ContextTypes.DEFAULT_TYPE):
+    """Обновление справочников и клавиатур диалога /add"""
+    try:
+        with background_priority():
+            await get_reference_cache().refresh()
+    except Exception as e:
+        logger.warning(f"Ошибка обновления справочников: {e}")
+
+
+async def advice_cache_save_job(context: ContextTypes.DEFAULT_TYPE):
+    """Сохранение кэша ответов советника на диск"""
+    await get_advisor().cache.flush()
+
+
+async def daily_advice_job(context: ContextTypes.DEFAULT_TYPE):
+    """
+    Пересчёт совета дня
+
+    С data["scheduled"] - плановый запуск в DAILY_ADVICE_TIME, иначе
+    периодическая проверка: совет за сегодня пересчитывается только
+    после заметного изменения бюджета.
+    """
+    daily = get_daily_advice()
+    sheets = get_async_sheets_service()
+
+    if not context.job.data.get("scheduled"):
+        advice = daily.current
+        # Ещё нет совета за сегодня - его составит плановый запуск или /advisor
+        if advice is None or advice.day != today() or daily.is_fresh(sheets.get_data_version()):
+            return
+
+    try:
+        with background_priority():
+            budget_data = await sheets.get_monthly_summary()
+            version = sheets.get_data_version()
+            if daily.is_fresh(version, budget_data):
+                daily.skipped += 1
+                return
+            await daily.generate(budget_data, version)
+        logger.info(f"Совет дня обновлён (версия данных {version})")
+    except Exception as e:
+        logger.warning(f"Ошибка расчёта совета дня: {e}")
@@ -1,14 +1,22 @@
 """
 Клавиатуры и меню для Telegram бота
+
+InlineKeyboardMarkup неизменяем, поэтому постоянные клавиатуры строятся
+один раз и общие для всех сообщений (lru_cache).
 """
+from datetime import date, timedelta
+from functools import lru_cache
 from telegram import InlineKeyboardButton, InlineKeyboardMarkup, ReplyKeyboardMarkup
 
 # === ВЫБОР ДАТЫ ===
 def get_date_keyboard() -> InlineKeyboardMarkup:
     """Клавиатура выбора даты"""
-    from datetime import datetime, timedelta
-    
-    today = datetime.now()
+    return _date_keyboard(date.today())
+
+
+@lru_cache(maxsize=2)
+def _date_keyboard(today: date) -> InlineKeyboardMarkup:
+    """Клавиатура выбора даты на день today"""
     yesterday = today - timedelta(days=1)
     day_before = today - timedelta(days=2)
     
@@ -23,6 +31,7 @@ def get_date_keyboard() -> InlineKeyboardMarkup:
 
 
 # === ГЛАВНОЕ МЕНЮ ===
+@lru_cache(maxsize=None)
 def get_main_menu() -> InlineKeyboardMarkup:
     """Главное меню бота"""
     keyboard = [
@@ -46,6 +55,7 @@ def get_main_menu() -> InlineKeyboardMarkup:
 
 
 # === МЕНЮ ДОБАВЛЕНИЯ ТРАНЗАКЦИИ ===
+@lru_cache(maxsize=None)
 def get_add_menu() -> InlineKeyboardMarkup:
     """Меню выбора типа транзакции"""
     keyboard = [
@@ -130,6 +140,7 @@ def get_categories_keyboard(categories: list, trans_type: str) -> InlineKeyboard
 
 
 # === БЫСТРЫЕ КАТЕГОРИИ РАСХОДОВ ===
+@lru_cache(maxsize=None)
 def get_quick_expense_keyboard() -> InlineKeyboardMarkup:
     """Быстрые кнопки для частых расходов"""
     keyboard = [
@@ -151,6 +162,7 @@ def get_quick_expense_keyboard() -> InlineKeyboardMarkup:
 
 
 # === ПОДТВЕРЖДЕНИЕ ===
+@lru_cache(maxsize=None)
 def get_confirm_keyboard() -> InlineKeyboardMarkup:
     """Клавиатура подтверждения"""
     keyboard = [
@@ -179,17 +191,32 @@ def get_reply_keyboard() -> ReplyKeyboardMarkup:
 
 
 # === ИСТОРИЯ С КНОПКАМИ УДАЛЕНИЯ ===
-def get_history_keyboard(transactions: list) -> InlineKeyboardMarkup:
+def get_history_keyboard(
+    transactions: list,
+    next_cursor: int = None,
+    first_page: bool = True
+) -> InlineKeyboardMarkup:
     """Клавиатура для истории транзакций с кнопкой удаления последней операции"""
     keyboard = []
 
     # Добавляем кнопку удаления только для первой (последней по времени) транзакции
-    if transactions and transactions[0].get("row_index"):
+    if first_page and transactions and transactions[0].get("row_index"):
         row_index = transactions[0].get("row_index")
+        # Отпечаток строки: удаление проверит, что в ней всё ещё эта транзакция
+        fingerprint = transactions[0].get("fingerprint", "")
         keyboard.append([
-            InlineKeyboardButton("🗑️ Удалить последнюю", callback_data=f"delete_{row_index}")
+            InlineKeyboardButton("🗑️ Удалить последнюю", callback_data=f"delete_{row_index}_{fingerprint}")
         ])
 
+    # Постраничный просмотр более старых транзакций
+    pages = []
+    if not first_page:
+        pages.append(InlineKeyboardButton("🔝 Последние", callback_data="menu_history"))
+    if next_cursor:
+        pages.append(InlineKeyboardButton("⬅️ Ранее", callback_data=f"history_{next_cursor}"))
+    if pages:
+        keyboard.append(pages)
+
     # Кнопка "Назад в главное меню"
     keyboard.append([InlineKeyboardButton("◀️ Главное меню", callback_data="menu_main")])
 
@@ -205,5 +232,6 @@ CALLBACK_PATTERNS = {
     "select_category": r"^cat_",
     "quick_category": r"^quick_",
     "confirm": r"^confirm_",
-    "delete": r"^delete_"
+    "delete": r"^delete_",
+    "history_page": r"^history_\d+$"
 }
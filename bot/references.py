@@ -0,0 +1,196 @@
+"""
+Кэш справочников и готовых клавиатур для диалога /add
+
+Счета и категории меняются редко, а нужны на каждом шаге добавления
+транзакции. Справочники загружаются одним снимком с номером версии;
+клавиатуры выбора счёта и категории строятся один раз на версию
+и общие для всех пользователей (InlineKeyboardMarkup неизменяем).
+Шаги диалога берут готовый снимок без обращения к таблице.
+
+Снимок обновляется в фоне (references_refresh_job) и при обращении,
+если он старше REFERENCES_MAX_AGE: пользователь получает текущий снимок,
+а новый загружается параллельно. Версия растёт, только если
+справочники действительно изменились.
+"""
+import asyncio
+import logging
+import time
+from typing import Dict, Any, List, Optional
+from telegram import InlineKeyboardMarkup
+import config
+from bot.keyboards.menus import get_accounts_keyboard, get_categories_keyboard
+from services.async_sheets import get_async_sheets_service
+from services.single_flight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+# Справочники, если таблица недоступна
+DEFAULT_ACCOUNTS = ["Наличные", "Карта", "Карта Сбер"]
+DEFAULT_CATEGORIES = [
+    "Продукты", "Кафе", "Транспорт", "Такси", "Досуг", "Покупки",
+    "Здоровье", "Связь", "ЖКХ", "Одежда"
+]
+DEFAULT_INCOME_CATEGORIES = ["Зарплата/Чаевые", "Подработка", "Другое"]
+
+# Префиксы callback_data клавиатур выбора счёта
+ACCOUNT_PREFIXES = ("income", "expense", "from")
+
+
+class ReferenceSnapshot:
+    """Справочники одной версии и клавиатуры, построенные по ним"""
+
+    __slots__ = (
+        "version", "accounts", "categories", "income_categories", "loaded_at",
+        "_account_keyboards", "_to_keyboards", "categories_keyboard", "income_categories_keyboard"
+    )
+
+    def __init__(
+        self,
+        version: int,
+        accounts: List[str],
+        categories: List[str],
+        income_categories: List[str]
+    ):
+        self.version = version
+        self.accounts = tuple(accounts)
+        self.categories = tuple(categories)
+        self.income_categories = tuple(income_categories)
+        self.loaded_at = time.monotonic()
+
+        self._account_keyboards = {
+            prefix: get_accounts_keyboard(self.accounts, prefix) for prefix in ACCOUNT_PREFIXES
+        }
+        # Счёт зачисления перевода - все, кроме счёта списания
+        self._to_keyboards = {
+            account: get_accounts_keyboard([a for a in self.accounts if a != account], "to")
+            for account in self.accounts
+        }
+        self.categories_keyboard = get_categories_keyboard(self.categories, "Расход")
+        self.income_categories_keyboard = get_categories_keyboard(self.income_categories, "Доход")
+
+    def accounts_keyboard(self, prefix: str) -> InlineKeyboardMarkup:
+        """Клавиатура выбора счёта (prefix: income, expense, from)"""
+        return self._account_keyboards[prefix]
+
+    def to_accounts_keyboard(self, from_account: str) -> InlineKeyboardMarkup:
+        """Клавиатура счёта зачисления перевода"""
+        keyboard = self._to_keyboards.get(from_account)
+        if keyboard is None:
+            # Счёт не из справочника (старая кнопка) - строим разово
+            keyboard = get_accounts_keyboard([a for a in self.accounts if a != from_account], "to")
+        return keyboard
+
+    def same_data(self, accounts: List[str], categories: List[str], income_categories: List[str]) -> bool:
+        """Те же справочники, что в этом снимке"""
+        return (
+            self.accounts == tuple(accounts)
+            and self.categories == tuple(categories)
+            and self.income_categories == tuple(income_categories)
+        )
+
+    @property
+    def age(self) -> float:
+        return time.monotonic() - self.loaded_at
+
+
+class ReferenceCache:
+    """Текущий снимок справочников с фоновым обновлением"""
+
+    def __init__(self, max_age: float = config.REFERENCES_MAX_AGE):
+        self.max_age = max_age
+        self._snapshot: Optional[ReferenceSnapshot] = None
+        self._flight = SingleFlight("Справочники")
+        self._background: Optional[asyncio.Task] = None
+
+        self.hits = 0
+        self.refreshes = 0
+        self.rebuilds = 0
+        self.failures = 0
+
+    @property
+    def current(self) -> Optional[ReferenceSnapshot]:
+        return self._snapshot
+
+    async def get(self) -> ReferenceSnapshot:
+        """
+        Снимок справочников для шага диалога
+
+        Первый вызов ждёт загрузки; дальше снимок отдаётся сразу,
+        а устаревший обновляется в фоне.
+        """
+        snapshot = self._snapshot
+        if snapshot is None:
+            return await self.refresh()
+
+        self.hits += 1
+        if snapshot.age > self.max_age and not self._flight.in_flight("refresh"):
+            self._background = asyncio.ensure_future(self._refresh_quietly())
+        return snapshot
+
+    async def refresh(self) -> ReferenceSnapshot:
+        """Загрузить справочники (одновременные вызовы объединяются)"""
+        return await self._flight.run("refresh", self._load)
+
+    async def _refresh_quietly(self):
+        """Фоновое обновление: ошибка уже учтена в _load"""
+        try:
+            await self.refresh()
+        except Exception:
+            pass
+
+    async def _load(self) -> ReferenceSnapshot:
+        """Прочитать справочники и при изменениях построить новую версию"""
+        self.refreshes += 1
+        sheets = get_async_sheets_service()
+        try:
+            refs, budget = await asyncio.gather(sheets.get_references(), sheets.get_categories_budget())
+            accounts = refs["accounts"] or DEFAULT_ACCOUNTS
+            categories = refs["categories"] or DEFAULT_CATEGORIES
+            income_categories = [c["name"] for c in budget if c["type"] == "Доход"] or DEFAULT_INCOME_CATEGORIES
+        except Exception as e:
+            self.failures += 1
+            logger.warning(f"Справочники не загружены: {e}")
+            if self._snapshot is not None:
+                return self._snapshot
+            # Снимок по умолчанию устареет сразу: следующее обращение повторит загрузку
+            snapshot = ReferenceSnapshot(0, DEFAULT_ACCOUNTS, DEFAULT_CATEGORIES, DEFAULT_INCOME_CATEGORIES)
+            snapshot.loaded_at -= self.max_age + 1
+            self._snapshot = snapshot
+            return snapshot
+
+        current = self._snapshot
+        if current is not None and current.version > 0 and current.same_data(accounts, categories, income_categories):
+            current.loaded_at = time.monotonic()
+            return current
+
+        version = current.version + 1 if current is not None else 1
+        self._snapshot = ReferenceSnapshot(version, accounts, categories, income_categories)
+        self.rebuilds += 1
+        logger.info(
+            f"Справочники: версия {version}, счетов {len(accounts)}, "
+            f"категорий {len(categories)} + {len(income_categories)} доходных"
+        )
+        return self._snapshot
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Версия, возраст снимка и счётчики обновлений"""
+        snapshot = self._snapshot
+        return {
+            "version": snapshot.version if snapshot is not None else None,
+            "age": snapshot.age if snapshot is not None else None,
+            "hits": self.hits,
+            "refreshes": self.refreshes,
+            "rebuilds": self.rebuilds,
+            "failures": self.failures
+        }
+
+
+# Создаем глобальный экземпляр
+_reference_cache: Optional[ReferenceCache] = None
+
+def get_reference_cache() -> ReferenceCache:
+    """Получить кэш справочников (singleton)"""
+    global _reference_cache
+    if _reference_cache is None:
+        _reference_cache = ReferenceCache()
+    return _reference_cache
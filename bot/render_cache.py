@@ -0,0 +1,168 @@
+"""
+Кэш экранов (балансы, статистика, доходы, история) и пропуск пустых правок
+
+Готовый текст экрана хранится по версии данных таблицы
+(get_data_version меняется при любой записи и при изменении
+перечитанного листа). Пока версия та же и запись моложе
+RENDER_CACHE_TTL, экран отдаётся без чтения данных и форматирования.
+TTL ограничивает, как долго не видны ручные правки таблицы, которые
+бот ещё не перечитал, и смену дня.
+
+Для каждого сообщения запоминается, что в него выведено последним.
+Если повторное нажатие кнопки даёт тот же текст и клавиатуру, а
+сообщение (оно приходит вместе с callback) не менялось с нашей правки,
+edit_message_text не вызывается - вместо лишнего запроса к Telegram и
+ответа "message is not modified".
+"""
+import logging
+import time
+from collections import OrderedDict
+from typing import Dict, Any, Callable, Awaitable, Hashable, Optional, Tuple
+from telegram import CallbackQuery, InlineKeyboardMarkup, Message
+from telegram.error import BadRequest
+import config
+from services.async_sheets import get_async_sheets_service
+
+logger = logging.getLogger(__name__)
+
+
+class ShownMessage:
+    """Последняя правка сообщения: что отправили и что Telegram показал"""
+
+    __slots__ = ("source", "text", "reply_markup")
+
+    def __init__(self, source: Tuple, text: Optional[str], reply_markup: Optional[InlineKeyboardMarkup]):
+        self.source = source
+        self.text = text
+        self.reply_markup = reply_markup
+
+
+class RenderCache:
+    """Готовые экраны по версии данных и последнее содержимое сообщений"""
+
+    def __init__(
+        self,
+        ttl: float = config.RENDER_CACHE_TTL,
+        max_entries: int = config.RENDER_CACHE_MAX_ENTRIES,
+        max_messages: int = config.RENDER_CACHE_MAX_MESSAGES
+    ):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_messages = max_messages
+        # ключ экрана -> (версия данных, момент рендера, результат)
+        self._screens: "OrderedDict[Hashable, Tuple[int, float, Any]]" = OrderedDict()
+        # (chat_id, message_id) -> последняя правка
+        self._shown: "OrderedDict[Tuple[int, int], ShownMessage]" = OrderedDict()
+
+        self.hits = 0
+        self.misses = 0
+        self.edits = 0
+        self.edits_skipped = 0
+        self.not_modified = 0
+
+    async def render(self, key: Hashable, load: Callable[[], Awaitable[Any]], build: Callable[[Any], Any]) -> Any:
+        """
+        Экран key для текущей версии данных
+
+        Args:
+            key: Экран и его параметры, например ("history", before_row)
+            load: Загрузка данных (вызывается только при промахе)
+            build: Форматирование данных в текст (или текст и клавиатуру)
+        """
+        sheets = get_async_sheets_service()
+        version = sheets.get_data_version()
+
+        cached = self._screens.get(key)
+        if cached is not None and cached[0] == version and time.monotonic() - cached[1] < self.ttl:
+            self.hits += 1
+            self._screens.move_to_end(key)
+            return cached[2]
+
+        self.misses += 1
+        result = build(await load())
+        # Данные перечитаны или записаны во время загрузки - версия результата неизвестна
+        if sheets.get_data_version() == version and self.ttl > 0:
+            self._screens[key] = (version, time.monotonic(), result)
+            self._screens.move_to_end(key)
+            while len(self._screens) > self.max_entries:
+                self._screens.popitem(last=False)
+        return result
+
+    async def edit(
+        self,
+        query: CallbackQuery,
+        text: str,
+        reply_markup: Optional[InlineKeyboardMarkup] = None,
+        parse_mode: Optional[str] = "Markdown"
+    ) -> bool:
+        """
+        Вывести экран в сообщение кнопки, если он отличается от показанного
+
+        Returns:
+            bool: True, если сообщение отредактировано
+        """
+        message = query.message
+        if not isinstance(message, Message):
+            # Сообщение недоступно (слишком старое) - без запоминания
+            await query.edit_message_text(text, parse_mode=parse_mode, reply_markup=reply_markup)
+            self.edits += 1
+            return True
+
+        key = (message.chat_id, message.message_id)
+        source = (text, parse_mode, reply_markup)
+        shown = self._shown.get(key)
+        if (
+            shown is not None
+            and shown.source == source
+            # Сообщение не правили в обход кэша (главное меню, советник, ...)
+            and message.text == shown.text
+            and message.reply_markup == shown.reply_markup
+        ):
+            self.edits_skipped += 1
+            self._shown.move_to_end(key)
+            return False
+
+        edited = True
+        try:
+            result = await query.edit_message_text(text, parse_mode=parse_mode, reply_markup=reply_markup)
+            self.edits += 1
+        except BadRequest as e:
+            if "message is not modified" not in str(e).lower():
+                raise
+            # Показано ровно это - запоминаем, следующий раз запрос не понадобится
+            self.not_modified += 1
+            edited = False
+            result = message
+
+        if not isinstance(result, Message):
+            result = message
+        self._shown[key] = ShownMessage(source, result.text, result.reply_markup)
+        self._shown.move_to_end(key)
+        while len(self._shown) > self.max_messages:
+            self._shown.popitem(last=False)
+        return edited
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Попадания в кэш экранов и сэкономленные запросы к Telegram"""
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "screens": len(self._screens),
+            "messages": len(self._shown),
+            "edits": self.edits,
+            "edits_skipped": self.edits_skipped,
+            "not_modified": self.not_modified
+        }
+
+
+# Создаем глобальный экземпляр
+_render_cache: Optional[RenderCache] = None
+
+def get_render_cache() -> RenderCache:
+    """Получить кэш экранов (singleton)"""
+    global _render_cache
+    if _render_cache is None:
+        _render_cache = RenderCache()
+    return _render_cache
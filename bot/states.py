@@ -31,8 +31,14 @@ class SettingsStates(IntEnum):
 # Данные транзакции в процессе создания
 class TransactionData:
     """Хранение данных транзакции во время диалога"""
-    
+
+    __slots__ = (
+        "trans_type", "account", "category", "amount",
+        "to_account", "comment", "hours", "day", "last_active"
+    )
+
     def __init__(self):
+        self.last_active = 0.0  # monotonic, обновляет DraftStore
         self.reset()
     
     def reset(self):
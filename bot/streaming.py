@@ -0,0 +1,101 @@
+"""
+Сообщение, которое дописывается по мере генерации ответа
+
+Текст правится не чаще раза в STREAM_EDIT_INTERVAL секунд и только
+если прибавилось хотя бы STREAM_MIN_CHARS символов - так бот не упирается
+в лимиты Telegram на редактирование. Первая правка отправляется сразу,
+как только пришёл текст. Незакрытая разметка в недописанном ответе
+даёт ошибку разбора Markdown - тогда текст отправляется без разметки.
+"""
+import asyncio
+import logging
+import time
+from datetime import timedelta
+from typing import Optional
+from telegram import Message, InlineKeyboardMarkup
+from telegram.error import BadRequest, RetryAfter
+import config
+
+logger = logging.getLogger(__name__)
+
+# Ограничение Telegram на длину сообщения
+MAX_MESSAGE_LENGTH = 4096
+# Признак того, что ответ ещё пишется
+CURSOR = " ▌"
+
+
+def _retry_after_seconds(error: RetryAfter) -> float:
+    """Пауза из RetryAfter (число или timedelta в зависимости от версии библиотеки)"""
+    value = error.retry_after
+    if isinstance(value, timedelta):
+        return value.total_seconds()
+    return float(value)
+
+
+class StreamingReply:
+    """Ответ советника, появляющийся в сообщении по частям"""
+
+    def __init__(
+        self,
+        message: Message,
+        header: str = "",
+        parse_mode: Optional[str] = "Markdown",
+        interval: float = config.STREAM_EDIT_INTERVAL,
+        min_chars: int = config.STREAM_MIN_CHARS
+    ):
+        self.message = message
+        self.header = header
+        self.parse_mode = parse_mode
+        self.interval = interval
+        self.min_chars = min_chars
+
+        self.shown = ""             # Текст последней успешной правки
+        self.edits = 0
+        self._next_edit = 0.0       # Раньше этого момента не правим
+
+    async def update(self, text: str):
+        """Новый накопленный текст ответа (колбэк on_text советника)"""
+        if time.monotonic() < self._next_edit or len(text) - len(self.shown) < self.min_chars:
+            return
+        await self._edit(text, CURSOR)
+
+    async def finish(self, text: str, reply_markup: Optional[InlineKeyboardMarkup] = None):
+        """Показать полный ответ с клавиатурой (дожидается окончания паузы от Telegram)"""
+        delay = self._next_edit - time.monotonic()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        if not await self._edit(text, "", reply_markup):
+            # Telegram попросил подождать - повторяем после паузы
+            await asyncio.sleep(max(self._next_edit - time.monotonic(), 0))
+            await self._edit(text, "", reply_markup)
+
+    async def _edit(self, text: str, suffix: str, reply_markup: Optional[InlineKeyboardMarkup] = None) -> bool:
+        """
+        Заменить текст сообщения
+
+        Returns:
+            bool: False, если Telegram ответил RetryAfter
+        """
+        body = self.header + text
+        body = body[:MAX_MESSAGE_LENGTH - len(suffix)] + suffix
+        self._next_edit = time.monotonic() + self.interval
+
+        for parse_mode in dict.fromkeys((self.parse_mode, None)):
+            try:
+                await self.message.edit_text(body, parse_mode=parse_mode, reply_markup=reply_markup)
+                break
+            except RetryAfter as e:
+                self._next_edit = time.monotonic() + _retry_after_seconds(e)
+                logger.warning(f"Правка ответа отложена Telegram на {_retry_after_seconds(e):.0f} с")
+                return False
+            except BadRequest as e:
+                error = str(e).lower()
+                if "message is not modified" in error:
+                    break
+                if "can't parse entities" not in error or parse_mode is None:
+                    raise
+                # Незакрытая разметка - пробуем тот же текст без неё
+
+        self.shown = text
+        self.edits += 1
+        return True
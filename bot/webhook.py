@@ -0,0 +1,174 @@
+"""
+Служебный сервер режима webhook
+
+Обновления принимает Application.run_webhook (python-telegram-bot[webhooks],
+на tornado) - его запускает main.py, если задан WEBHOOK_URL. Служебные
+адреса - на отдельном сервере WEBHOOK_OPS_LISTEN:WEBHOOK_OPS_PORT
+(по умолчанию только 127.0.0.1), чтобы публичный порт принимал лишь
+обновления Telegram; сервер запускается в post_init (start_ops_server)
+и останавливается в post_stop (stop_ops_server):
+- GET /health - готовность (503, пока Application не запущено);
+- GET /metrics - счётчики в текстовом формате Prometheus.
+
+Состояние диалогов (ConversationHandler) хранится в памяти процесса,
+поэтому за балансировщиком обновления одного чата должны попадать
+в один экземпляр бота.
+"""
+import logging
+import time
+from typing import Dict, Any, Optional, Tuple, List
+import tornado.web
+from tornado.httpserver import HTTPServer
+from tornado.netutil import bind_sockets
+from telegram.ext import Application
+import config
+from services.async_sheets import get_async_sheets_service
+from services.write_queue import get_write_queue
+from services.startup import get_startup_tracker
+from services.ai_advisor import get_advisor
+from services.conversation import get_conversations
+from bot.drafts import get_drafts
+from bot.references import get_reference_cache
+from bot.render_cache import get_render_cache
+
+logger = logging.getLogger(__name__)
+
+_ops: Optional["OpsServer"] = None
+
+# Сколько держать простаивающее соединение служебного сервера (секунды)
+OPS_IDLE_TIMEOUT = 10.0
+
+
+class HealthHandler(tornado.web.RequestHandler):
+    """GET /health"""
+
+    def initialize(self, ops: "OpsServer"):
+        self.ops = ops
+
+    def get(self):
+        health = self.ops.get_health()
+        self.set_status(200 if health["status"] == "ok" else 503)
+        self.write(health)
+
+
+class MetricsHandler(tornado.web.RequestHandler):
+    """GET /metrics"""
+
+    def initialize(self, ops: "OpsServer"):
+        self.ops = ops
+
+    def get(self):
+        self.set_header("Content-Type", "text/plain; version=0.0.4")
+        self.write(render_metrics(self.ops))
+
+
+class OpsServer:
+    """Служебный HTTP-сервер: /health и /metrics"""
+
+    def __init__(
+        self,
+        application: Application,
+        listen: str = config.WEBHOOK_OPS_LISTEN,
+        port: int = config.WEBHOOK_OPS_PORT
+    ):
+        """
+        Args:
+            application: Приложение, состояние которого отдаётся
+            port: Порт (0 - любой свободный)
+        """
+        self.application = application
+        self.listen = listen
+        self.port = port
+        self._server: Optional[HTTPServer] = None
+        self._started = time.monotonic()
+
+    def start(self):
+        """Начать приём соединений"""
+        app = tornado.web.Application(
+            [
+                (r"/health", HealthHandler, {"ops": self}),
+                (r"/metrics", MetricsHandler, {"ops": self})
+            ],
+            log_function=lambda handler: None
+        )
+        sockets = bind_sockets(self.port, self.listen)
+        self.port = sockets[0].getsockname()[1]
+        self._server = HTTPServer(app, idle_connection_timeout=OPS_IDLE_TIMEOUT)
+        self._server.add_sockets(sockets)
+        self._started = time.monotonic()
+        logger.info(f"/health и /metrics: http://{self.listen}:{self.port}")
+
+    async def stop(self):
+        """Остановить сервер и закрыть соединения"""
+        if self._server is not None:
+            self._server.stop()
+            await self._server.close_all_connections()
+            self._server = None
+
+    def get_health(self) -> Dict[str, Any]:
+        """Готовность для /health"""
+        startup = get_startup_tracker().get_stats()
+        return {
+            "status": "ok" if self.application.running else "starting",
+            "warmed_up": startup["ready"],
+            "uptime": round(time.monotonic() - self._started, 1),
+            "update_queue": self.application.update_queue.qsize()
+        }
+
+
+def render_metrics(ops: OpsServer) -> str:
+    """Метрики в текстовом формате Prometheus"""
+    sheets = get_async_sheets_service()
+    cache = sheets.get_cache_stats()
+    writes = get_write_queue().get_stats()
+    llm = get_advisor().get_stats()
+    sched = llm["scheduler"]
+    dialogs = get_conversations().get_stats()
+    startup = get_startup_tracker().get_stats()
+    render = get_render_cache().get_stats()
+
+    metrics: List[Tuple[str, str, str, float]] = [
+        ("budget_bot_update_queue", "gauge", "Обновлений ждут обработки", ops.application.update_queue.qsize()),
+        ("budget_bot_ready", "gauge", "Прогрев завершён", int(startup["ready"])),
+        ("budget_bot_uptime_seconds", "gauge", "Секунд с запуска", startup["uptime"]),
+        ("budget_bot_sheets_cache_hits_total", "counter", "Попаданий в кэш листов", cache["hits"]),
+        ("budget_bot_sheets_cache_misses_total", "counter", "Промахов кэша листов", cache["misses"]),
+        ("budget_bot_write_queue_rows_written_total", "counter", "Записано строк", writes["rows_written"]),
+        ("budget_bot_write_queue_rows_failed_total", "counter", "Строк с ошибкой записи", writes["rows_failed"]),
+        ("budget_bot_write_queue_rows_unknown_total", "counter", "Строк без ответа таблицы", writes["rows_unknown"]),
+        ("budget_bot_write_queue_pending", "gauge", "Строк ждут записи", writes["pending"]),
+        ("budget_bot_transaction_drafts", "gauge", "Незавершённых черновиков /add", get_drafts().get_stats()["drafts"]),
+        ("budget_bot_render_cache_hits_total", "counter", "Экранов из кэша", render["hits"]),
+        ("budget_bot_telegram_edits_skipped_total", "counter", "Пропущено одинаковых правок", render["edits_skipped"]),
+        ("budget_bot_references_version", "gauge", "Версия справочников", get_reference_cache().get_stats()["version"] or 0),
+        ("budget_bot_llm_requests_total", "counter", "Запросов к DeepSeek", llm["requests"]),
+        ("budget_bot_llm_request_seconds_avg", "gauge", "Среднее время запроса к DeepSeek", llm["avg_total"]),
+        ("budget_bot_llm_active", "gauge", "Запросов к DeepSeek выполняется", sched["active"]),
+        ("budget_bot_llm_queued", "gauge", "Запросов к DeepSeek в очереди", sched["queued"]),
+        ("budget_bot_llm_rejected_total", "counter", "Отклонено при заполненной очереди", sched["rejected"]),
+        ("budget_bot_llm_expired_total", "counter", "Не дождались срока в очереди", sched["expired"]),
+        ("budget_bot_advice_cache_hits_total", "counter", "Попаданий в кэш ответов", llm["cache"]["hits"]),
+        ("budget_bot_conversations", "gauge", "Открытых диалогов с советником", dialogs["sessions"]),
+    ]
+
+    lines = []
+    for name, kind, description, value in metrics:
+        lines.append(f"# HELP {name} {description}")
+        lines.append(f"# TYPE {name} {kind}")
+        lines.append(f"{name} {value:g}" if isinstance(value, float) else f"{name} {value}")
+    return "\n".join(lines) + "\n"
+
+
+def start_ops_server(application: Application):
+    """Запустить /health и /metrics (post_init)"""
+    global _ops
+    _ops = OpsServer(application)
+    _ops.start()
+
+
+async def stop_ops_server():
+    """Остановить служебный сервер (post_stop)"""
+    global _ops
+    if _ops is not None:
+        await _ops.stop()
+        _ops = None
@@ -9,13 +9,90 @@ load_dotenv()
 # Telegram
 TELEGRAM_BOT_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN")
 
+# Режим webhook вместо polling: включается, если задан публичный адрес WEBHOOK_URL
+# (https://host[:порт]); Telegram присылает обновления на WEBHOOK_URL + WEBHOOK_PATH.
+# Без WEBHOOK_SECRET_TOKEN секрет генерируется заново при каждом запуске.
+# Нужен python-telegram-bot[webhooks]
+WEBHOOK_URL = os.getenv("WEBHOOK_URL")
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "/telegram")
+WEBHOOK_LISTEN = os.getenv("WEBHOOK_LISTEN", "0.0.0.0")
+WEBHOOK_PORT = int(os.getenv("WEBHOOK_PORT", "8080"))
+WEBHOOK_SECRET_TOKEN = os.getenv("WEBHOOK_SECRET_TOKEN")
+WEBHOOK_MAX_CONNECTIONS = int(os.getenv("WEBHOOK_MAX_CONNECTIONS", "40"))  # 1-100, лимит Telegram
+# /health и /metrics в режиме webhook - отдельный порт, по умолчанию только локально
+WEBHOOK_OPS_LISTEN = os.getenv("WEBHOOK_OPS_LISTEN", "127.0.0.1")
+WEBHOOK_OPS_PORT = int(os.getenv("WEBHOOK_OPS_PORT", "8081"))
+
+# Добавление транзакции: пауза до закрытия диалога (секунды) - столько же живёт
+# незавершённый черновик; черновиков хранится не больше TRANSACTION_DRAFTS_MAX
+TRANSACTION_CONVERSATION_TIMEOUT = float(os.getenv("TRANSACTION_CONVERSATION_TIMEOUT", "300"))
+TRANSACTION_DRAFTS_MAX = int(os.getenv("TRANSACTION_DRAFTS_MAX", "10000"))
+
+# Справочники (счета, категории) для диалога /add: фоновое обновление раз
+# в REFERENCES_REFRESH_INTERVAL секунд и при обращении к снимку старше REFERENCES_MAX_AGE
+REFERENCES_REFRESH_INTERVAL = float(os.getenv("REFERENCES_REFRESH_INTERVAL", "300"))
+REFERENCES_MAX_AGE = float(os.getenv("REFERENCES_MAX_AGE", "600"))
+
+# Готовые экраны балансов, статистики и истории: сколько секунд текст живёт при
+# неизменной версии данных, сколько экранов хранить и для скольких сообщений
+# помнить последнюю правку (одинаковые правки не отправляются)
+RENDER_CACHE_TTL = float(os.getenv("RENDER_CACHE_TTL", "60"))
+RENDER_CACHE_MAX_ENTRIES = int(os.getenv("RENDER_CACHE_MAX_ENTRIES", "64"))
+RENDER_CACHE_MAX_MESSAGES = int(os.getenv("RENDER_CACHE_MAX_MESSAGES", "5000"))
+
 # Google Sheets
 GOOGLE_SHEETS_ID = os.getenv("GOOGLE_SHEETS_ID")
 GOOGLE_CREDENTIALS_FILE = os.getenv("GOOGLE_CREDENTIALS_FILE", "google_credentials.json")
 
 # DeepSeek AI
 DEEPSEEK_API_KEY = os.getenv("DEEPSEEK_API_KEY")
-DEEPSEEK_API_URL = "https://api.deepseek.com/v1/chat/completions"
+DEEPSEEK_API_URL = os.getenv("DEEPSEEK_API_URL", "https://api.deepseek.com/v1/chat/completions")
+DEEPSEEK_MODEL = os.getenv("DEEPSEEK_MODEL", "deepseek-chat")
+
+# DeepSeek - общий HTTP-клиент (keep-alive; HTTP/2 при установленном h2)
+DEEPSEEK_HTTP2 = os.getenv("DEEPSEEK_HTTP2", "1") == "1"
+DEEPSEEK_MAX_CONNECTIONS = int(os.getenv("DEEPSEEK_MAX_CONNECTIONS", "10"))
+DEEPSEEK_MAX_KEEPALIVE = int(os.getenv("DEEPSEEK_MAX_KEEPALIVE", "5"))
+DEEPSEEK_KEEPALIVE_EXPIRY = float(os.getenv("DEEPSEEK_KEEPALIVE_EXPIRY", "120"))
+DEEPSEEK_CONNECT_TIMEOUT = float(os.getenv("DEEPSEEK_CONNECT_TIMEOUT", "10"))
+DEEPSEEK_READ_TIMEOUT = float(os.getenv("DEEPSEEK_READ_TIMEOUT", "30"))
+
+# Одновременные запросы к DeepSeek: лимит, длина очереди и срок ответа (секунды)
+LLM_MAX_CONCURRENT = int(os.getenv("LLM_MAX_CONCURRENT", "3"))
+LLM_MAX_QUEUE = int(os.getenv("LLM_MAX_QUEUE", "10"))
+LLM_INTERACTIVE_DEADLINE = float(os.getenv("LLM_INTERACTIVE_DEADLINE", "45"))
+LLM_BACKGROUND_DEADLINE = float(os.getenv("LLM_BACKGROUND_DEADLINE", "300"))
+# Через сколько секунд без ответа модели показать совет по правилам
+LLM_FALLBACK_DEADLINE = float(os.getenv("LLM_FALLBACK_DEADLINE", "8"))
+
+# Диалог с советником: обменов дословно, токенов истории (всего и на содержание
+# ранних обменов), пауза до закрытия диалога (секунды) и число хранимых диалогов
+CONVERSATION_WINDOW = int(os.getenv("CONVERSATION_WINDOW", "4"))
+CONVERSATION_MAX_TOKENS = int(os.getenv("CONVERSATION_MAX_TOKENS", "800"))
+CONVERSATION_SUMMARY_TOKENS = int(os.getenv("CONVERSATION_SUMMARY_TOKENS", "200"))
+CONVERSATION_IDLE_TIMEOUT = float(os.getenv("CONVERSATION_IDLE_TIMEOUT", "900"))
+CONVERSATION_MAX_USERS = int(os.getenv("CONVERSATION_MAX_USERS", "1000"))
+
+# Бюджет токенов на сводку бюджета в запросе к советнику
+ADVICE_CONTEXT_MAX_TOKENS = int(os.getenv("ADVICE_CONTEXT_MAX_TOKENS", "400"))
+
+# Потоковые ответы советника: правка сообщения не чаще раза в STREAM_EDIT_INTERVAL секунд
+ADVISOR_STREAMING = os.getenv("ADVISOR_STREAMING", "1") == "1"
+STREAM_EDIT_INTERVAL = float(os.getenv("STREAM_EDIT_INTERVAL", "1.0"))
+STREAM_MIN_CHARS = int(os.getenv("STREAM_MIN_CHARS", "20"))
+
+# Совет дня: расчёт по расписанию (ЧЧ:ММ по USER_TIMEZONE) и после заметных
+# изменений бюджета (проверка раз в DAILY_ADVICE_CHECK_INTERVAL секунд)
+DAILY_ADVICE_ENABLED = os.getenv("DAILY_ADVICE_ENABLED", "1") == "1"
+DAILY_ADVICE_TIME = os.getenv("DAILY_ADVICE_TIME", "08:00")
+DAILY_ADVICE_CHECK_INTERVAL = float(os.getenv("DAILY_ADVICE_CHECK_INTERVAL", "600"))
+DAILY_ADVICE_CHANGE_THRESHOLD = float(os.getenv("DAILY_ADVICE_CHANGE_THRESHOLD", "0.1"))  # доля
+
+# Кэш ответов советника (TTL в секундах, 0 - выключен)
+ADVICE_CACHE_PATH = os.getenv("ADVICE_CACHE_PATH", "data/advice_cache.json")
+ADVICE_CACHE_TTL = float(os.getenv("ADVICE_CACHE_TTL", "43200"))
+ADVICE_CACHE_MAX_ENTRIES = int(os.getenv("ADVICE_CACHE_MAX_ENTRIES", "200"))
+ADVICE_CACHE_SAVE_INTERVAL = float(os.getenv("ADVICE_CACHE_SAVE_INTERVAL", "60"))  # запись на диск в фоне
 
 # Настройки пользователя
 USER_TIMEZONE = os.getenv("USER_TIMEZONE", "Europe/Minsk")
@@ -28,6 +105,33 @@ SHEET_ACCOUNTS = "Счета"
 SHEET_REFERENCES = "Справочники"
 SHEET_DASHBOARD = "Дашборд"
 
+# Google Sheets - пул потоков для неблокирующих вызовов
+SHEETS_MAX_WORKERS = int(os.getenv("SHEETS_MAX_WORKERS", "4"))
+SHEETS_CALL_TIMEOUT = float(os.getenv("SHEETS_CALL_TIMEOUT", "20"))
+
+# Google Sheets - кэш снимков листов (TTL в секундах, 0 - выключен)
+SHEETS_CACHE_TTL = float(os.getenv("SHEETS_CACHE_TTL", "300"))
+SHEETS_CACHE_MAX_ENTRIES = int(os.getenv("SHEETS_CACHE_MAX_ENTRIES", "16"))
+SHEETS_CACHE_MAX_CELLS = int(os.getenv("SHEETS_CACHE_MAX_CELLS", "200000"))
+
+# Google Sheets - пакетная запись транзакций (окно в секундах)
+SHEETS_WRITE_BATCH_WINDOW = float(os.getenv("SHEETS_WRITE_BATCH_WINDOW", "1.5"))
+SHEETS_WRITE_BATCH_MAX = int(os.getenv("SHEETS_WRITE_BATCH_MAX", "50"))
+
+# Google Sheets - квоты запросов в минуту (0 - без ограничения) и повторы при 429/5xx
+SHEETS_READ_PER_MINUTE = float(os.getenv("SHEETS_READ_PER_MINUTE", "60"))
+SHEETS_WRITE_PER_MINUTE = float(os.getenv("SHEETS_WRITE_PER_MINUTE", "60"))
+SHEETS_MAX_RETRIES = int(os.getenv("SHEETS_MAX_RETRIES", "4"))
+SHEETS_RETRY_BASE_DELAY = float(os.getenv("SHEETS_RETRY_BASE_DELAY", "1"))
+SHEETS_RETRY_MAX_DELAY = float(os.getenv("SHEETS_RETRY_MAX_DELAY", "16"))
+
+# Локальное зеркало таблицы в SQLite (интервалы в секундах)
+MIRROR_ENABLED = os.getenv("MIRROR_ENABLED", "1") == "1"
+MIRROR_DB_PATH = os.getenv("MIRROR_DB_PATH", "data/mirror.sqlite3")
+MIRROR_SYNC_INTERVAL = float(os.getenv("MIRROR_SYNC_INTERVAL", "60"))
+MIRROR_FULL_SYNC_EVERY = int(os.getenv("MIRROR_FULL_SYNC_EVERY", "30"))  # каждая N-я синхронизация
+MIRROR_MAX_AGE = float(os.getenv("MIRROR_MAX_AGE", "300"))  # возраст снимков Счета/Категории
+
 # Типы транзакций
 TRANSACTION_TYPES = {
     "income": "Доход",
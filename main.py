@@ -5,6 +5,9 @@ Telegram бот для управления личными финансами
 Запуск: python main.py
 """
 import logging
+import secrets
+from datetime import time as dtime
+import pytz
 from telegram import Update
 from telegram.ext import (
     Application,
@@ -12,6 +15,7 @@ from telegram.ext import (
     CallbackQueryHandler,
     MessageHandler,
     ConversationHandler,
+    TypeHandler,
     filters
 )
 from telegram.error import BadRequest, NetworkError, TimedOut
@@ -42,6 +46,7 @@ from bot.handlers.balance import (
     stats_callback,
     history_command,
     history_callback,
+    history_page_callback,
     income_stats_command,
     income_stats_callback,
     delete_transaction_callback
@@ -52,11 +57,22 @@ from bot.handlers.advisor import (
     ask_advisor_command,
     advisor_question,
     advisor_ask_callback,
-    advisor_refresh_callback
+    advisor_refresh_callback,
+    advisor_cancel,
+    advisor_leave,
+    advisor_timeout,
+    release_fallback_message,
+    LEAVE_ADVISOR
 )
-from bot.handlers.debug_commands import bugs_command, clear_bugs_command
+from bot.jobs import mirror_sync_job, daily_advice_job, references_refresh_job, advice_cache_save_job
+from bot.render_cache import get_render_cache
+from bot.handlers.debug_commands import bugs_command, clear_bugs_command, perf_command
 from bot.states import TransactionStates, AdvisorStates
 from bot.keyboards.menus import get_main_menu
+from services.async_sheets import get_async_sheets_service
+from services.write_queue import get_write_queue
+from services.startup import get_startup_tracker
+from services.ai_advisor import get_advisor
 
 # Настройка логирования
 logging.basicConfig(
@@ -87,9 +103,9 @@ async def menu_callback(update: Update, context):
 
     try:
         if data == "menu_main":
-            await query.edit_message_text(
+            await get_render_cache().edit(
+                query,
                 "🏠 **Главное меню**\n\nВыбери действие:",
-                parse_mode="Markdown",
                 reply_markup=get_main_menu()
             )
         elif data == "menu_balance":
@@ -123,7 +139,7 @@ async def handle_text(update: Update, context):
     # Проверяем, есть ли активный диалог (ConversationHandler)
     # Если да - не обрабатываем кнопки клавиатуры
     user_data = context.user_data
-    if user_data.get('in_conversation'):
+    if user_data.get('in_conversation') or user_data.get('waiting_advisor_question'):
         return  # Пропускаем, ConversationHandler обработает
     
     # Проверяем на reply клавиатуру
@@ -203,6 +219,33 @@ async def error_handler(update: object, context):
         logger.error(f"Ошибка в error_handler: {e}")
 
 
+async def post_init(application: Application):
+    """Запустить фоновый прогрев, не задерживая начало polling (и /health в режиме webhook)"""
+    tracker = get_startup_tracker()
+    tracker.mark("bot_initialized")
+    tracker.start()
+    if config.WEBHOOK_URL:
+        # tornado (python-telegram-bot[webhooks]) нужен только в этом режиме
+        from bot.webhook import start_ops_server
+        start_ops_server(application)
+
+
+async def post_stop(application: Application):
+    """Дописать накопленные транзакции (пока бот ещё может отправлять сообщения) и кэш советов"""
+    if config.WEBHOOK_URL:
+        from bot.webhook import stop_ops_server
+        await stop_ops_server()
+    await get_startup_tracker().stop()
+    await get_write_queue().close()
+    await get_advisor().cache.flush()
+
+
+async def post_shutdown(application: Application):
+    """Освобождение ресурсов после остановки бота"""
+    get_async_sheets_service().shutdown()
+    await get_advisor().aclose()
+
+
 def main():
     """Запуск бота"""
     
@@ -215,7 +258,14 @@ def main():
         return
     
     # Создаем приложение
-    application = Application.builder().token(config.TELEGRAM_BOT_TOKEN).build()
+    application = (
+        Application.builder()
+        .token(config.TELEGRAM_BOT_TOKEN)
+        .post_init(post_init)
+        .post_stop(post_stop)
+        .post_shutdown(post_shutdown)
+        .build()
+    )
     
     # === HANDLERS ===
     
@@ -231,6 +281,7 @@ def main():
     # Команды отладки
     application.add_handler(CommandHandler("bugs", bugs_command))
     application.add_handler(CommandHandler("clear_bugs", clear_bugs_command))
+    application.add_handler(CommandHandler("perf", perf_command))
     
     # ConversationHandler для добавления транзакции
     add_conv_handler = ConversationHandler(
@@ -280,7 +331,7 @@ def main():
         per_message=False,
         per_user=True,
         per_chat=True,
-        conversation_timeout=300
+        conversation_timeout=config.TRANSACTION_CONVERSATION_TIMEOUT
     )
     # Группа 0 - высший приоритет
     application.add_handler(add_conv_handler, group=0)
@@ -293,18 +344,33 @@ def main():
         ],
         states={
             AdvisorStates.WAITING_QUESTION: [
-                MessageHandler(filters.TEXT & ~filters.COMMAND, advisor_question)
+                # Кнопки клавиатуры и быстрый ввод - не вопросы (см. fallbacks)
+                MessageHandler(filters.TEXT & ~filters.COMMAND & ~LEAVE_ADVISOR, advisor_question)
+            ],
+            ConversationHandler.TIMEOUT: [
+                TypeHandler(Update, advisor_timeout)
             ]
         },
-        fallbacks=[CommandHandler("cancel", cancel)],
+        fallbacks=[
+            CommandHandler("cancel", advisor_cancel),
+            MessageHandler(filters.TEXT & ~filters.COMMAND & LEAVE_ADVISOR, advisor_leave)
+        ],
         per_user=True,
-        per_chat=True
+        per_chat=True,
+        allow_reentry=True,
+        conversation_timeout=config.CONVERSATION_IDLE_TIMEOUT
     )
     application.add_handler(advisor_conv_handler, group=0)
     
+    # Любая кнопка под советом по правилам отменяет замену его поздним ответом AI
+    application.add_handler(CallbackQueryHandler(release_fallback_message), group=-1)
+
     # Callback для кнопок AI советника
     application.add_handler(CallbackQueryHandler(advisor_refresh_callback, pattern="^advisor_refresh$"))
 
+    # Callback для постраничной истории
+    application.add_handler(CallbackQueryHandler(history_page_callback, pattern=r"^history_\d+$"))
+
     # Callback для кнопок удаления транзакций
     application.add_handler(CallbackQueryHandler(delete_transaction_callback, pattern="^delete_"))
 
@@ -318,13 +384,69 @@ def main():
     )
 
 
+    # Фоновая синхронизация локального зеркала таблицы
+    if config.MIRROR_ENABLED:
+        if application.job_queue:
+            application.job_queue.run_repeating(
+                mirror_sync_job,
+                interval=config.MIRROR_SYNC_INTERVAL,
+                first=1,
+                data={}
+            )
+        else:
+            logger.warning("JobQueue недоступна (pip install python-telegram-bot[job-queue]) - зеркало не синхронизируется")
+
+    # Справочники и клавиатуры диалога /add - загрузка сразу после старта и обновление в фоне
+    if application.job_queue:
+        application.job_queue.run_repeating(
+            references_refresh_job,
+            interval=config.REFERENCES_REFRESH_INTERVAL,
+            first=1,
+            data={}
+        )
+
+    # Кэш ответов советника пишется на диск в фоне, а не при каждом ответе
+    if application.job_queue:
+        application.job_queue.run_repeating(
+            advice_cache_save_job,
+            interval=config.ADVICE_CACHE_SAVE_INTERVAL,
+            first=config.ADVICE_CACHE_SAVE_INTERVAL
+        )
+
+    # Совет дня по расписанию и после заметных изменений бюджета
+    if config.DAILY_ADVICE_ENABLED and application.job_queue:
+        hour, minute = map(int, config.DAILY_ADVICE_TIME.split(":"))
+        application.job_queue.run_daily(
+            daily_advice_job,
+            time=dtime(hour, minute, tzinfo=pytz.timezone(config.USER_TIMEZONE)),
+            data={"scheduled": True}
+        )
+        application.job_queue.run_repeating(
+            daily_advice_job,
+            interval=config.DAILY_ADVICE_CHECK_INTERVAL,
+            first=config.DAILY_ADVICE_CHECK_INTERVAL,
+            data={}
+        )
+
     # Регистрируем глобальный обработчик ошибок
     application.add_error_handler(error_handler)
 
     # Запуск бота
     logger.info("🤖 Budget Bot запущен с системой отладки!")
     logger.info(f"📂 Логи сохраняются в: logs/debug.log и logs/bugs.json")
-    application.run_polling(allowed_updates=Update.ALL_TYPES)
+    if config.WEBHOOK_URL:
+        # Без WEBHOOK_SECRET_TOKEN - новый секрет на каждый запуск
+        application.run_webhook(
+            listen=config.WEBHOOK_LISTEN,
+            port=config.WEBHOOK_PORT,
+            url_path=config.WEBHOOK_PATH,
+            webhook_url=config.WEBHOOK_URL.rstrip("/") + config.WEBHOOK_PATH,
+            secret_token=config.WEBHOOK_SECRET_TOKEN or secrets.token_urlsafe(32),
+            max_connections=config.WEBHOOK_MAX_CONNECTIONS,
+            allowed_updates=Update.ALL_TYPES
+        )
+    else:
+        application.run_polling(allowed_updates=Update.ALL_TYPES)
 
 
 if __name__ == "__main__":
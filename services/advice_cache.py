@@ -0,0 +1,146 @@
+"""
+Кэш ответов AI советника
+
+Ключ - хэш нормализованного контекста бюджета, вопроса, модели
+и версии промпта. Любая новая транзакция меняет цифры в контексте,
+а значит и ключ, поэтому устаревший совет не будет показан.
+Записи живут ADVICE_CACHE_TTL, их число ограничено (LRU), а сам кэш
+переживает перезапуск бота: изменения сохраняются на диск в фоне раз
+в ADVICE_CACHE_SAVE_INTERVAL и при остановке (flush), не блокируя
+цикл событий записью файла.
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import re
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional, Dict, Any, Sequence
+import config
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_text(text: str) -> str:
+    """Текст без различий в пробелах и регистре"""
+    return re.sub(r"\s+", " ", text or "").strip().lower()
+
+
+def advice_key(
+    context: str,
+    question: Optional[str],
+    model: str,
+    prompt_version: int,
+    history: Sequence[Dict[str, str]] = ()
+) -> str:
+    """Ключ кэша для запроса к советнику (с историей диалога, если она есть)"""
+    payload = json.dumps(
+        [
+            prompt_version, model, normalize_text(context), normalize_text(question or ""),
+            [[m["role"], normalize_text(m["content"])] for m in history]
+        ],
+        ensure_ascii=False
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class AdviceCache:
+    """LRU-кэш ответов с TTL и сохранением на диск"""
+
+    def __init__(
+        self,
+        path: Optional[str] = config.ADVICE_CACHE_PATH,
+        ttl: float = config.ADVICE_CACHE_TTL,
+        max_entries: int = config.ADVICE_CACHE_MAX_ENTRIES
+    ):
+        self.path = Path(path) if path else None
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._dirty = False  # Есть изменения, не записанные на диск
+        self._save_lock = asyncio.Lock()
+
+        self.hits = 0
+        self.misses = 0
+
+        self._load()
+
+    def get(self, key: str) -> Optional[str]:
+        """Сохранённый ответ или None"""
+        entry = self._entries.get(key)
+        if entry is None or time.time() - entry["created_at"] > self.ttl:
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry["answer"]
+
+    def put(self, key: str, answer: str):
+        """Сохранить ответ"""
+        if self.ttl <= 0:
+            return
+        self._entries[key] = {"answer": answer, "created_at": time.time()}
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        self._dirty = True
+
+    async def flush(self):
+        """Записать изменения на диск в потоке (снимок берётся в цикле событий)"""
+        if self.path is None:
+            return
+        async with self._save_lock:
+            if not self._dirty:
+                return
+            snapshot = dict(self._entries)
+            self._dirty = False
+            saved = await asyncio.get_running_loop().run_in_executor(None, self._save, snapshot)
+            if not saved:
+                self._dirty = True  # Повторим при следующем сохранении
+
+    def _load(self):
+        """Прочитать кэш с диска (просроченные записи отбрасываются)"""
+        if self.path is None or not self.path.exists():
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                entries = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Кэш советов не прочитан: {e}")
+            return
+
+        now = time.time()
+        for key, entry in sorted(entries.items(), key=lambda item: item[1]["created_at"]):
+            if now - entry["created_at"] <= self.ttl:
+                self._entries[key] = entry
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _save(self, entries: Dict[str, Dict[str, Any]]) -> bool:
+        """Записать снимок кэша на диск атомарно (выполняется в потоке)"""
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.path.with_suffix(".tmp")
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(entries, f, ensure_ascii=False)
+            os.replace(tmp_path, self.path)
+            return True
+        except OSError as e:
+            logger.warning(f"Кэш советов не сохранён: {e}")
+            return False
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Счётчики попаданий и промахов"""
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "entries": len(self._entries)
+        }
@@ -0,0 +1,114 @@
+"""
+Компактный контекст бюджета для AI советника
+
+Сводка передаётся таблицами "название|значения" вместо текста с эмодзи
+и укладывается в бюджет токенов ADVICE_CONTEXT_MAX_TOKENS. Категории
+идут по важности: превышение бюджета, близко к лимиту, затем по сумме
+трат. Что не поместилось, сворачивается в одну строку "ещё N".
+
+Токены оцениваются без токенизатора: около 4 байт UTF-8 на токен
+(латиница - ~4 символа, кириллица - ~2 символа на токен). Точное число
+токенов запроса приходит в ответе API (usage) и видно в /perf.
+"""
+import math
+from typing import Dict, Any, List, Tuple
+import config
+
+EXPENSE = "Расход"
+# Порог "близко к лимиту", как в get_monthly_summary
+NEAR_LIMIT = 0.8
+
+
+def estimate_tokens(text: str) -> int:
+    """Приблизительное число токенов текста"""
+    return math.ceil(len(text.encode("utf-8")) / 4)
+
+
+def _num(value: float) -> str:
+    """Число без лишних знаков: 120, 120.5, 120.49 (без хвостов вида 120.49999999)"""
+    return f"{value:.2f}".rstrip("0").rstrip(".")
+
+
+def rank_categories(categories: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Категории расходов по важности для совета
+
+    Сначала превышенные (по сумме превышения), затем близкие к лимиту
+    (по доле бюджета), затем остальные по сумме трат. Категории без
+    бюджета и без трат не нужны.
+    """
+    def rank(cat: Dict[str, Any]) -> Tuple[int, float]:
+        budget = cat["budget"]
+        if budget > 0 and cat["spent"] > budget:
+            return 0, -(cat["spent"] - budget)
+        if budget > 0 and cat["spent"] / budget >= NEAR_LIMIT:
+            return 1, -cat["spent"] / budget
+        return 2, -cat["spent"]
+
+    expenses = [
+        c for c in categories
+        if c["type"] == EXPENSE and (c["budget"] > 0 or c["spent"] > 0)
+    ]
+    return sorted(expenses, key=rank)
+
+
+def _category_row(cat: Dict[str, Any]) -> str:
+    """Строка таблицы категорий; "!" - бюджет превышен, "~" - близко к лимиту"""
+    budget = cat["budget"]
+    if budget <= 0:
+        return f"{cat['name']}|{_num(cat['spent'])}|-|-"
+    progress = cat["spent"] / budget
+    mark = "!" if progress > 1 else "~" if progress >= NEAR_LIMIT else ""
+    return f"{cat['name']}|{_num(cat['spent'])}|{_num(budget)}|{int(progress * 100)}{mark}"
+
+
+def build_budget_context(
+    data: Dict[str, Any],
+    max_tokens: int = config.ADVICE_CONTEXT_MAX_TOKENS
+) -> str:
+    """
+    Сводка бюджета для промпта в пределах max_tokens
+
+    Args:
+        data: Данные из get_monthly_summary()
+        max_tokens: Бюджет токенов (итоги выводятся всегда)
+    """
+    lines = [
+        f"Итоги месяца, BYN: доход {_num(data['total_income'])}, "
+        f"расход {_num(data['total_expense'])}, баланс {_num(data['balance'])}"
+    ]
+    used = estimate_tokens(lines[0])
+
+    def add_table(header: str, rows: List[str], rest: str) -> None:
+        """Добавить таблицу; строки, не поместившиеся в бюджет, сворачиваются"""
+        nonlocal used
+        if not rows:
+            return
+        cost = estimate_tokens(header) + 1
+        if used + cost > max_tokens:
+            return
+        lines.append(header)
+        used += cost
+        for shown, row in enumerate(rows):
+            cost = estimate_tokens(row) + 1
+            if used + cost > max_tokens:
+                lines.append(rest.format(count=len(rows) - shown))
+                return
+            lines.append(row)
+            used += cost
+
+    categories = rank_categories(data.get("categories", []))
+    add_table(
+        "Категории расходов (название|потрачено|бюджет|%; ! превышен, ~ близко к лимиту):",
+        [_category_row(c) for c in categories],
+        "...ещё категорий: {count}"
+    )
+
+    accounts = sorted(data.get("accounts", []), key=lambda a: -abs(a["current"]))
+    add_table(
+        "Счета (название|остаток|валюта):",
+        [f"{a['name']}|{_num(a['current'])}|{a['currency']}" for a in accounts],
+        "...ещё счетов: {count}"
+    )
+
+    return "\n".join(lines)
@@ -0,0 +1,221 @@
+"""
+Инкрементальные итоги по транзакциям
+
+Итоги по дням, категориям и счетам считаются один раз по листу
+Транзакции (через TransactionTable), а затем обновляются за O(1)
+при каждой записи и удалении, сделанных ботом. Сводка, балансы
+и доходы по дням берутся из них без чтения таблицы и без ожидания
+пересчёта формул.
+
+Формулы листов Категории и Счета могут считать иначе (например, если
+их поменяли вручную), поэтому при заполнении итоги сверяются
+со значениями формул. Если хоть одно значение не совпало, итоги
+для этого листа не используются и данные читаются из таблицы, как раньше.
+"""
+import threading
+import time
+from typing import Optional, Dict, List, Any, Iterable, Tuple
+from services.transaction_table import (
+    TransactionTable, INCOME, EXPENSE, TRANSFER, TIPS_CATEGORY, income_report
+)
+
+# Допустимое расхождение с формулами таблицы (округление до копеек)
+TOLERANCE = 0.01
+
+
+class AggregateEngine:
+    """Текущие итоги по дням, категориям и счетам"""
+
+    def __init__(self, first_row: int):
+        self.first_row = first_row
+        self._lock = threading.Lock()
+
+        self.table = TransactionTable()
+        self.category_totals: Dict[Tuple[str, str], float] = {}
+        self.day_totals: Dict[Tuple[str, int], float] = {}
+        self.account_totals: Dict[str, float] = {}
+        self.income_days: Dict[int, Dict[str, Any]] = {}
+
+        self.seeded_at: Optional[float] = None
+        self.stale = True
+        self.categories_consistent = False
+        self.accounts_consistent = False
+
+        self.seeds = 0
+        self.updates = 0
+        self.writes = 0  # Все записи ботом, включая пришедшие во время заполнения
+
+    @property
+    def ready(self) -> bool:
+        """Итоги заполнены и не требуют пересчёта"""
+        return self.seeded_at is not None and not self.stale
+
+    def age(self) -> float:
+        """Секунд с последнего заполнения"""
+        return time.monotonic() - self.seeded_at if self.seeded_at else float("inf")
+
+    # === Заполнение ===
+
+    def seed(
+        self,
+        rows: Iterable[List[Any]],
+        categories: List[Dict[str, Any]],
+        accounts: List[Dict[str, Any]],
+        writes_seen: int
+    ):
+        """
+        Посчитать итоги по всем строкам листа Транзакции
+
+        Args:
+            rows: Строки листа подряд, начиная с first_row
+            categories: Разобранный лист Категории, прочитанный вместе со строками
+            accounts: Разобранный лист Счета, прочитанный вместе со строками
+            writes_seen: Значение writes до чтения данных; если с тех пор
+                бот что-то записал, итоги сразу помечаются устаревшими
+        """
+        table = TransactionTable.from_rows(rows, self.first_row)
+        types = [value for value in table.strings.values if value]
+
+        category_totals = {
+            (trans_type, category): total
+            for trans_type in types
+            for category, total in table.sum_by_category(trans_type).items()
+        }
+        day_totals = {
+            (trans_type, day): total
+            for trans_type in types
+            for day, total in table.sum_by_day(trans_type).items()
+        }
+        account_totals = table.account_totals()
+
+        with self._lock:
+            self.table = table
+            self.category_totals = category_totals
+            self.day_totals = day_totals
+            self.account_totals = account_totals
+            self.income_days = table.income_days()
+
+            self.categories_consistent = all(
+                abs(c["spent"] - category_totals.get((c["type"], c["name"]), 0.0)) < TOLERANCE
+                and abs(c["remaining"] - (c["budget"] - c["spent"])) < TOLERANCE
+                and (c["budget"] <= 0 or abs(c["progress"] - c["spent"] / c["budget"]) < TOLERANCE)
+                for c in categories
+            )
+            self.accounts_consistent = all(
+                abs(a["current"] - a["initial"] - account_totals.get(a["name"], 0.0)) < TOLERANCE
+                for a in accounts
+            )
+
+            self.seeded_at = time.monotonic()
+            self.stale = self.writes != writes_seen
+            self.seeds += 1
+
+    # === Инкрементальные изменения ===
+
+    def add_rows(self, start_row: int, rows: List[List[Any]]):
+        """Учесть строки, добавленные ботом начиная с start_row"""
+        with self._lock:
+            self.writes += 1
+            if not self.ready:
+                return
+            table = self.table
+            if table.row_index and table.row_index[-1] >= start_row:
+                self.stale = True  # Строки легли не в конец - пересчитаем
+                return
+
+            for row_index, row in enumerate(rows, start=start_row):
+                if table.append(row, row_index):
+                    self._add(table.row(len(table) - 1), 1.0)
+            self.updates += 1
+
+    def delete_row(self, row_index: int):
+        """Учесть удаление строки (нижние строки сдвигаются вверх, как в таблице)"""
+        with self._lock:
+            self.writes += 1
+            if not self.ready:
+                return
+            # Итоги меняются за O(1); сдвиг номеров строк - проход по колонке
+            removed = self.table.remove(row_index)
+            if removed is not None:
+                self._add(removed, -1.0)
+            self.updates += 1
+
+    def _add(self, row: Tuple, sign: float):
+        """Изменить итоги на sign * сумму строки (вызывать под блокировкой)"""
+        day, trans_type, account, category, amount, to_account, hours, comment = row
+        signed = sign * amount
+
+        key = (trans_type, category)
+        self.category_totals[key] = self.category_totals.get(key, 0.0) + signed
+        key = (trans_type, day)
+        self.day_totals[key] = self.day_totals.get(key, 0.0) + signed
+
+        accounts = self.account_totals
+        if trans_type == INCOME:
+            accounts[account] = accounts.get(account, 0.0) + signed
+            self._add_income(row, sign)
+        elif trans_type in (EXPENSE, TRANSFER):
+            accounts[account] = accounts.get(account, 0.0) - signed
+            if trans_type == TRANSFER and to_account:
+                accounts[to_account] = accounts.get(to_account, 0.0) + signed
+
+    def _add_income(self, row: Tuple, sign: float):
+        """Изменить детализацию доходов за день"""
+        day, _, _, category, amount, _, hours, comment = row
+        day_data = self.income_days.get(day)
+        if day_data is None:
+            day_data = self.income_days[day] = {"total": 0, "tips": 0, "hours": 0, "other": 0, "entries": []}
+
+        day_data["total"] += sign * amount
+        if category == TIPS_CATEGORY:
+            day_data["tips"] += sign * amount
+            day_data["hours"] += sign * hours
+        else:
+            day_data["other"] += sign * amount
+
+        entry = {"amount": amount, "category": category, "comment": comment, "hours": hours}
+        if sign > 0:
+            day_data["entries"].append(entry)
+            return
+
+        entries = day_data["entries"]
+        if entry in entries:
+            entries.remove(entry)
+        if not entries:
+            del self.income_days[day]
+
+    # === Результаты ===
+
+    def apply_to_summary(self, categories: List[Dict[str, Any]], accounts: List[Dict[str, Any]]):
+        """Подставить текущие итоги в разобранные листы Категории и Счета"""
+        with self._lock:
+            if self.categories_consistent:
+                for c in categories:
+                    c["spent"] = self.category_totals.get((c["type"], c["name"]), 0.0)
+                    c["remaining"] = c["budget"] - c["spent"]
+                    if c["budget"] > 0:
+                        c["progress"] = c["spent"] / c["budget"]
+            if self.accounts_consistent:
+                for a in accounts:
+                    a["current"] = a["initial"] + self.account_totals.get(a["name"], 0.0)
+
+    def income_by_days(self) -> Dict[str, Any]:
+        """Доходы по дням с детализацией (формат get_income_by_days)"""
+        with self._lock:
+            days = {
+                day: {**data, "entries": list(data["entries"])}
+                for day, data in self.income_days.items()
+            }
+        return income_report(days)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Состояние итогов"""
+        return {
+            "ready": self.ready,
+            "rows": len(self.table),
+            "seeds": self.seeds,
+            "updates": self.updates,
+            "categories_consistent": self.categories_consistent,
+            "accounts_consistent": self.accounts_consistent,
+            "age": self.age() if self.seeded_at else None
+        }
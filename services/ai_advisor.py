@@ -1,42 +1,46 @@
 """
 AI Советник на базе DeepSeek
+
+Запросы идут через один долгоживущий httpx.AsyncClient: соединение
+с API переиспользуется (keep-alive, HTTP/2 при установленном h2),
+и DNS/TCP/TLS оплачиваются только при первом запросе.
+
+В потоковом режиме (SSE, "stream": true) текст приходит по частям
+и передаётся в колбэк on_text, чтобы бот показывал ответ по мере генерации.
 """
+import asyncio
+import heapq
+import itertools
+import json
+import logging
+import time
+from collections import deque
+from contextlib import asynccontextmanager
 import httpx
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional, Callable, Awaitable, AsyncIterator, Tuple
 import config
+from services.advice_cache import AdviceCache, advice_key
+from services.advice_context import build_budget_context, estimate_tokens
+from services.single_flight import SingleFlight
+from services.rate_limit import Priority, current_priority
 
-class AIAdvisor:
-    """AI советник для финансовых рекомендаций"""
-    
-    def __init__(self):
-        self.api_key = config.DEEPSEEK_API_KEY
-        self.api_url = config.DEEPSEEK_API_URL
-        self.user_name = config.USER_NAME
-        self.hd_context = config.HUMAN_DESIGN_CONTEXT
-    
-    async def get_advice(
-        self, 
-        budget_data: Dict[str, Any],
-        user_question: Optional[str] = None
-    ) -> str:
-        """
-        Получить совет от AI на основе данных бюджета
-        
-        Args:
-            budget_data: Данные из get_monthly_summary()
-            user_question: Опциональный вопрос пользователя
-        
-        Returns:
-            str: Совет от AI
-        """
-        
-        # Формируем контекст с данными бюджета
-        budget_context = self._format_budget_context(budget_data)
-        
-        # Системный промпт
-        system_prompt = f"""Ты - персональный финансовый AI-советник для {self.user_name}.
+logger = logging.getLogger(__name__)
 
-{self.hd_context}
+# Версия промптов: поменяй при изменении текста промпта, чтобы сбросить кэш ответов
+PROMPT_VERSION = 2
+
+
+def build_system_prompt(user_name: str, hd_context: str) -> str:
+    """
+    Системный промпт - один и тот же текст для всех запросов
+
+    Строится один раз: одинаковое начало запроса позволяет DeepSeek
+    брать его из кэша контекста (prompt_cache_hit_tokens в usage).
+    Всё, что меняется от запроса к запросу, идёт в сообщение пользователя.
+    """
+    return f"""Ты - персональный финансовый AI-советник для {user_name}.
+
+{hd_context}
 
 ## ПРАВИЛА ОБЩЕНИЯ
 - Без осуждения, с фокусом на решения
@@ -45,7 +49,7 @@ class AIAdvisor:
 - Напоминай о Human Design профиле при важных выборах
 
 ## КОНТЕКСТ МОТИВАЦИИ
-- Ценность {self.user_name} НЕ измеряется часами работы
+- Ценность {user_name} НЕ измеряется часами работы
 - Его талант: системное видение, объяснение сложного просто
 - Работа официантом — временный этап, не идентичность
 - Каждый сохранённый рубль = шаг к свободе и признанию
@@ -67,6 +71,396 @@ class AIAdvisor:
 
 ВАЖНО: Отвечай на русском языке!"""
 
+
+def is_error_reply(text: str) -> bool:
+    """Ответ get_advice - сообщение об ошибке запроса, а не совет"""
+    return text.startswith(("❌", "⏳", "🚦"))
+
+
+def _http2_available() -> bool:
+    """HTTP/2 включён в настройках и установлен пакет h2"""
+    if not config.DEEPSEEK_HTTP2:
+        return False
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        logger.info("Пакет h2 не установлен (pip install httpx[http2]) - DeepSeek через HTTP/1.1")
+        return False
+    return True
+
+
+class RequestTiming:
+    """Время этапов одного запроса к DeepSeek (по trace-событиям httpcore)"""
+
+    __slots__ = ("connect", "tls", "waiting", "first_text", "total", "reused", "http_version",
+                 "prompt_tokens", "cached_tokens", "completion_tokens", "opened", "_started")
+
+    def __init__(self):
+        self.connect = 0.0     # DNS + TCP
+        self.tls = 0.0         # TLS-рукопожатие
+        self.waiting = 0.0     # От отправки запроса до заголовков ответа (инференс)
+        self.first_text: Optional[float] = None  # До первого фрагмента текста (потоковый режим)
+        self.total = 0.0
+        self.opened = time.monotonic()
+        self.reused = True     # Соединение взято из пула
+        self.http_version = ""
+        self.prompt_tokens = 0      # Из usage ответа API
+        self.cached_tokens = 0      # Часть prompt_tokens, взятая из кэша контекста DeepSeek
+        self.completion_tokens = 0
+        self._started: Dict[str, float] = {}
+
+    @property
+    def handshake(self) -> float:
+        """Время установки соединения (0 при повторном использовании)"""
+        return self.connect + self.tls
+
+    async def trace(self, event_name: str, info: Dict[str, Any]):
+        """Обработчик расширения httpx "trace": connection.connect_tcp.started и т.п."""
+        now = time.monotonic()
+        step, _, stage = event_name.rpartition(".")
+        step = step.rpartition(".")[2]
+
+        if stage == "started":
+            self._started[step] = now
+        elif stage == "complete" and step in self._started:
+            elapsed = now - self._started[step]
+            if step == "connect_tcp":
+                self.connect = elapsed
+                self.reused = False
+            elif step == "start_tls":
+                self.tls = elapsed
+            elif step == "receive_response_headers":
+                self.waiting = now - self._started.get("send_request_headers", self._started[step])
+
+    def set_usage(self, usage: Optional[Dict[str, Any]]):
+        """Запомнить число токенов из поля usage ответа"""
+        if not usage:
+            return
+        self.prompt_tokens = usage.get("prompt_tokens", 0)
+        self.cached_tokens = usage.get("prompt_cache_hit_tokens", 0)
+        self.completion_tokens = usage.get("completion_tokens", 0)
+
+    def as_dict(self) -> Dict[str, Any]:
+        """Значения для статистики"""
+        return {
+            "handshake": self.handshake,
+            "connect": self.connect,
+            "tls": self.tls,
+            "waiting": self.waiting,
+            "first_text": self.first_text,
+            "total": self.total,
+            "prompt_tokens": self.prompt_tokens,
+            "cached_tokens": self.cached_tokens,
+            "completion_tokens": self.completion_tokens,
+            "reused": self.reused,
+            "http_version": self.http_version
+        }
+
+
+class LLMOverloadedError(Exception):
+    """Очередь запросов к DeepSeek заполнена - запрос отклонён сразу"""
+
+
+class LLMScheduler:
+    """
+    Ограничение одновременных запросов к DeepSeek
+
+    Не больше max_concurrent запросов выполняются одновременно, остальные
+    ждут в очереди: интерактивные раньше фоновых, внутри приоритета -
+    по порядку. Если очередь заполнена, запрос отклоняется сразу,
+    а не ждёт, пока истечёт его срок.
+    """
+
+    def __init__(
+        self,
+        max_concurrent: int = config.LLM_MAX_CONCURRENT,
+        max_queue: int = config.LLM_MAX_QUEUE
+    ):
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self._active = 0
+        self._queue: List[Tuple[Priority, int, asyncio.Future]] = []
+        self._seq = itertools.count()
+
+        self.admitted = 0
+        self.queued_total = 0
+        self.rejected = 0
+        self.expired = 0
+        self.max_depth = 0
+        self.wait_time = 0.0
+
+    @asynccontextmanager
+    async def slot(self, priority: Priority, deadline: float) -> AsyncIterator[None]:
+        """
+        Занять место для запроса на время блока
+
+        Args:
+            priority: Приоритет запроса
+            deadline: Момент (time.monotonic), после которого ждать бессмысленно
+
+        Raises:
+            LLMOverloadedError: Очередь заполнена
+            asyncio.TimeoutError: Место не освободилось до deadline
+        """
+        await self._acquire(priority, deadline)
+        try:
+            yield
+        finally:
+            self._release()
+
+    async def _acquire(self, priority: Priority, deadline: float):
+        """Дождаться свободного места"""
+        if self._active < self.max_concurrent and not self._queue:
+            self._active += 1
+            self.admitted += 1
+            return
+
+        if len(self._queue) >= self.max_queue:
+            self.rejected += 1
+            raise LLMOverloadedError("Очередь запросов к AI советнику заполнена")
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._queue, (priority, next(self._seq), future))
+        self.queued_total += 1
+        self.max_depth = max(self.max_depth, len(self._queue))
+
+        started = time.monotonic()
+        try:
+            await asyncio.wait_for(future, timeout=max(deadline - started, 0))
+        except asyncio.TimeoutError:
+            self.expired += 1
+            self._forget(future)
+            raise
+        except asyncio.CancelledError:
+            # Место могло быть передано нам одновременно с отменой - возвращаем его
+            if future.done() and not future.cancelled():
+                self._release()
+            self._forget(future)
+            raise
+        finally:
+            self.wait_time += time.monotonic() - started
+
+        self.admitted += 1
+
+    def _forget(self, future: asyncio.Future):
+        """Убрать из очереди ожидание, которое больше не нужно"""
+        self._queue = [item for item in self._queue if item[2] is not future]
+        heapq.heapify(self._queue)
+
+    def _release(self):
+        """Освободить место: передать его следующему в очереди"""
+        while self._queue:
+            _, _, future = heapq.heappop(self._queue)
+            if not future.done():
+                future.set_result(None)  # Место переходит без изменения _active
+                return
+        self._active -= 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Загрузка и очередь"""
+        by_priority = {p.name.lower(): 0 for p in Priority}
+        for priority, _, _ in self._queue:
+            by_priority[Priority(priority).name.lower()] += 1
+        return {
+            "active": self._active,
+            "limit": self.max_concurrent,
+            "queued": len(self._queue),
+            "queued_by_priority": by_priority,
+            "max_depth": self.max_depth,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "expired": self.expired,
+            "avg_wait": self.wait_time / self.queued_total if self.queued_total else 0.0
+        }
+
+
+class TextBroadcast:
+    """Текст потокового ответа для всех вызовов, ожидающих этот ответ"""
+
+    __slots__ = ("listeners", "text")
+
+    def __init__(self):
+        self.listeners = []
+        self.text = ""
+
+    async def subscribe(self, on_text: Callable[[str], Awaitable[None]]):
+        """Добавить получателя; подключившийся позже сразу получает уже пришедший текст"""
+        self.listeners.append(on_text)
+        if self.text:
+            await self._deliver(on_text, self.text)
+
+    async def publish(self, text: str):
+        """Передать накопленный текст всем получателям"""
+        self.text = text
+        for on_text in list(self.listeners):
+            await self._deliver(on_text, text)
+
+    @staticmethod
+    async def _deliver(on_text: Callable[[str], Awaitable[None]], text: str):
+        """Ошибка одного получателя (например, удалённое сообщение) не прерывает поток"""
+        try:
+            await on_text(text)
+        except Exception as e:
+            logger.warning(f"Промежуточный текст ответа не показан: {e}")
+
+
+class AIAdvisor:
+    """AI советник для финансовых рекомендаций"""
+    
+    def __init__(self):
+        self.api_key = config.DEEPSEEK_API_KEY
+        self.api_url = config.DEEPSEEK_API_URL
+        self.model = config.DEEPSEEK_MODEL
+        self.user_name = config.USER_NAME
+        self.hd_context = config.HUMAN_DESIGN_CONTEXT
+        self.system_prompt = build_system_prompt(self.user_name, self.hd_context)
+        self.context_tokens = 0  # Оценка токенов последнего контекста бюджета
+
+        self.http2 = _http2_available()
+        self._client: Optional[httpx.AsyncClient] = None
+        self.timings: deque = deque(maxlen=50)
+        self.cache = AdviceCache()
+        self.flight = SingleFlight("DeepSeek")
+        self.scheduler = LLMScheduler()
+        self._broadcasts: Dict[str, TextBroadcast] = {}
+
+    def _get_client(self) -> httpx.AsyncClient:
+        """Общий HTTP-клиент (создаётся при первом запросе внутри event loop)"""
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                http2=self.http2,
+                limits=httpx.Limits(
+                    max_connections=config.DEEPSEEK_MAX_CONNECTIONS,
+                    max_keepalive_connections=config.DEEPSEEK_MAX_KEEPALIVE,
+                    keepalive_expiry=config.DEEPSEEK_KEEPALIVE_EXPIRY
+                ),
+                timeout=httpx.Timeout(
+                    config.DEEPSEEK_READ_TIMEOUT,
+                    connect=config.DEEPSEEK_CONNECT_TIMEOUT
+                ),
+                headers={
+                    "Content-Type": "application/json",
+                    "Authorization": f"Bearer {self.api_key}"
+                }
+            )
+        return self._client
+
+    async def aclose(self):
+        """Закрыть соединения с API (при остановке бота)"""
+        if self._client is not None and not self._client.is_closed:
+            await self._client.aclose()
+        self._client = None
+
+    @asynccontextmanager
+    async def _request(self, payload: Dict[str, Any]) -> AsyncIterator[Tuple[httpx.Response, RequestTiming]]:
+        """POST к API (тело ответа читается внутри блока) с замером рукопожатия и ожидания"""
+        timing = RequestTiming()
+        try:
+            async with self._get_client().stream(
+                "POST",
+                self.api_url,
+                json=payload,
+                extensions={"trace": timing.trace}
+            ) as response:
+                timing.http_version = response.http_version
+                yield response, timing
+        finally:
+            timing.total = time.monotonic() - timing.opened
+            self.timings.append(timing)
+            first_text = f", первый текст {timing.first_text:.2f} с" if timing.first_text is not None else ""
+            logger.info(
+                f"DeepSeek: {timing.total:.2f} с (соединение "
+                f"{'из пула' if timing.reused else f'новое, {timing.handshake:.2f} с'}, "
+                f"ожидание ответа {timing.waiting:.2f} с{first_text}; токенов промпта "
+                f"{timing.prompt_tokens}, из кэша {timing.cached_tokens})"
+            )
+
+    async def _post(self, payload: Dict[str, Any]) -> httpx.Response:
+        """POST к API с полностью прочитанным ответом"""
+        async with self._request(payload) as (response, timing):
+            await response.aread()
+            if response.status_code == 200:
+                timing.set_usage(response.json().get("usage"))
+        return response
+
+    async def _stream(
+        self,
+        payload: Dict[str, Any],
+        on_text: Callable[[str], Awaitable[None]]
+    ) -> Tuple[int, str]:
+        """
+        Потоковый запрос (SSE)
+
+        Args:
+            payload: Тело запроса без "stream"
+            on_text: Вызывается с накопленным текстом после каждого фрагмента
+
+        Returns:
+            tuple: Код ответа и полный текст
+        """
+        parts = []
+        # include_usage: последним событием придёт usage с числом токенов
+        stream_payload = {**payload, "stream": True, "stream_options": {"include_usage": True}}
+        async with self._request(stream_payload) as (response, timing):
+            if response.status_code != 200:
+                await response.aread()
+                return response.status_code, ""
+
+            async for line in response.aiter_lines():
+                # Строки вида "data: {...}"; пустые строки и ": keep-alive" пропускаем
+                if not line.startswith("data:"):
+                    continue
+                data = line[5:].strip()
+                if data == "[DONE]":
+                    break
+
+                chunk = json.loads(data)
+                timing.set_usage(chunk.get("usage"))
+                choices = chunk.get("choices") or [{}]
+                delta = (choices[0].get("delta") or {}).get("content")
+                if not delta:
+                    continue
+                if not parts:
+                    timing.first_text = time.monotonic() - timing.opened
+                parts.append(delta)
+                await on_text("".join(parts))
+
+        return 200, "".join(parts)
+    
+    async def get_advice(
+        self, 
+        budget_data: Dict[str, Any],
+        user_question: Optional[str] = None,
+        on_text: Optional[Callable[[str], Awaitable[None]]] = None,
+        history: Optional[List[Dict[str, str]]] = None
+    ) -> str:
+        """
+        Получить совет от AI на основе данных бюджета
+        
+        Args:
+            budget_data: Данные из get_monthly_summary()
+            user_question: Опциональный вопрос пользователя
+            on_text: Если задан, ответ запрашивается потоком и колбэк
+                получает накопленный текст по мере генерации
+            history: Предыдущие сообщения диалога (ConversationStore.history);
+                идут после системного промпта, перед текущим вопросом
+        
+        Returns:
+            str: Совет от AI
+        """
+        
+        # Формируем контекст с данными бюджета
+        budget_context = build_budget_context(budget_data)
+        self.context_tokens = estimate_tokens(budget_context)
+
+        # Те же данные и вопрос - тот же ответ, без платного запроса
+        history = history or []
+        cache_key = advice_key(budget_context, user_question, self.model, PROMPT_VERSION, history)
+        cached = self.cache.get(cache_key)
+        if cached is not None:
+            return cached
+        
+
         # Пользовательский запрос
         if user_question:
             user_prompt = f"""Текущее состояние бюджета:
@@ -82,75 +476,117 @@ class AIAdvisor:
 Проанализируй ситуацию и дай краткий совет дня. 
 Если есть проблемы - укажи их. Если всё хорошо - похвали."""
 
+        payload = {
+            "model": self.model,
+            "messages": [
+                {"role": "system", "content": self.system_prompt},
+                *history,
+                {"role": "user", "content": user_prompt}
+            ],
+            "max_tokens": 500,
+            "temperature": 0.7
+        }
+
+        # Такой же запрос уже выполняется (двойное нажатие, второй пользователь) -
+        # ждём его ответ, а текст потока получаем вместе с первым вызовом.
+        # Приоритет входит в ключ: интерактивный вызов не ждёт в очереди
+        # со сроком фоновой рассылки
+        priority = current_priority()
+        flight_key = f"{cache_key}:{priority.name}"
+        if on_text is not None and not self.flight.in_flight(flight_key):
+            self._broadcasts[flight_key] = TextBroadcast()
+        # Трансляция есть, только если первый вызов запросил поток; иначе
+        # присоединившийся получает лишь готовый ответ
+        broadcast = self._broadcasts.get(flight_key)
+        if on_text is not None and broadcast is not None:
+            await broadcast.subscribe(on_text)
+
+        return await self.flight.run(
+            flight_key,
+            lambda: self._complete(
+                payload, cache_key, flight_key, priority,
+                broadcast.publish if broadcast is not None else None
+            )
+        )
+
+    async def _complete(
+        self,
+        payload: Dict[str, Any],
+        cache_key: str,
+        flight_key: str,
+        priority: Priority,
+        on_text: Optional[Callable[[str], Awaitable[None]]]
+    ) -> str:
+        """
+        Запрос к API через планировщик; успешный ответ сохраняется в кэш
+
+        Срок ответа (LLM_INTERACTIVE_DEADLINE или LLM_BACKGROUND_DEADLINE
+        для фоновых задач) включает ожидание в очереди.
+        """
+        if priority == Priority.INTERACTIVE:
+            deadline = time.monotonic() + config.LLM_INTERACTIVE_DEADLINE
+        else:
+            deadline = time.monotonic() + config.LLM_BACKGROUND_DEADLINE
+
         try:
-            async with httpx.AsyncClient(timeout=30.0) as client:
-                response = await client.post(
-                    self.api_url,
-                    headers={
-                        "Content-Type": "application/json",
-                        "Authorization": f"Bearer {self.api_key}"
-                    },
-                    json={
-                        "model": "deepseek-chat",
-                        "messages": [
-                            {"role": "system", "content": system_prompt},
-                            {"role": "user", "content": user_prompt}
-                        ],
-                        "max_tokens": 500,
-                        "temperature": 0.7
-                    }
+            async with self.scheduler.slot(priority, deadline):
+                status_code, advice = await asyncio.wait_for(
+                    self._send(payload, on_text),
+                    timeout=max(deadline - time.monotonic(), 0)
                 )
-                
-                if response.status_code == 200:
-                    data = response.json()
-                    return data["choices"][0]["message"]["content"]
-                else:
-                    return f"❌ Ошибка API: {response.status_code}"
-                    
-        except httpx.TimeoutException:
+
+            if status_code == 200:
+                self.cache.put(cache_key, advice)
+                return advice
+            else:
+                return f"❌ Ошибка API: {status_code}"
+
+        except LLMOverloadedError:
+            return "🚦 Сейчас к советнику много запросов. Попробуй через минуту."
+        except (httpx.TimeoutException, asyncio.TimeoutError):
             return "⏳ AI советник временно недоступен. Попробуй позже."
         except Exception as e:
             return f"❌ Ошибка: {str(e)}"
-    
-    def _format_budget_context(self, data: Dict[str, Any]) -> str:
-        """Форматировать данные бюджета для AI"""
-        
-        lines = [
-            f"📊 Доходы за месяц: {data['total_income']} BYN",
-            f"💸 Расходы за месяц: {data['total_expense']} BYN", 
-            f"📈 Баланс: {data['balance']} BYN",
-            ""
-        ]
-        
-        # Счета
-        lines.append("💳 Счета:")
-        for acc in data.get("accounts", []):
-            lines.append(f"  • {acc['name']}: {acc['current']} {acc['currency']}")
-        
-        # Категории расходов с бюджетами
-        lines.append("\n📁 Расходы по категориям:")
-        for cat in data.get("categories", []):
-            if cat["type"] == "Расход" and cat["budget"] > 0:
-                progress_pct = int(cat["progress"] * 100)
-                status = "⚠️" if progress_pct >= 80 else "✅"
-                lines.append(
-                    f"  {status} {cat['name']}: {cat['spent']}/{cat['budget']} BYN ({progress_pct}%)"
-                )
-        
-        # Предупреждения
-        if data.get("over_budget"):
-            lines.append("\n🚨 ПРЕВЫШЕНИЕ БЮДЖЕТА:")
-            for cat in data["over_budget"]:
-                over = cat["spent"] - cat["budget"]
-                lines.append(f"  • {cat['name']}: +{over} BYN сверх лимита!")
-        
-        if data.get("near_limit"):
-            lines.append("\n⚠️ Близко к лимиту:")
-            for cat in data["near_limit"]:
-                remaining = cat["remaining"]
-                lines.append(f"  • {cat['name']}: осталось {remaining} BYN")
-        
-        return "\n".join(lines)
+        finally:
+            self._broadcasts.pop(flight_key, None)
+
+    async def _send(
+        self,
+        payload: Dict[str, Any],
+        on_text: Optional[Callable[[str], Awaitable[None]]]
+    ) -> Tuple[int, str]:
+        """Отправить запрос (потоком, если задан on_text): код ответа и текст"""
+        if on_text is not None:
+            return await self._stream(payload, on_text)
+
+        response = await self._post(payload)
+        if response.status_code != 200:
+            return response.status_code, ""
+        return 200, response.json()["choices"][0]["message"]["content"]
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Статистика запросов к API: доля новых соединений, рукопожатие и ожидание"""
+        timings = list(self.timings)
+        fresh = [t for t in timings if not t.reused]
+        streamed = [t.first_text for t in timings if t.first_text is not None]
+        measured = [t for t in timings if t.prompt_tokens]
+        prompt_tokens = sum(t.prompt_tokens for t in measured)
+        return {
+            "requests": len(timings),
+            "new_connections": len(fresh),
+            "http2": self.http2,
+            "avg_handshake": sum(t.handshake for t in fresh) / len(fresh) if fresh else 0.0,
+            "avg_waiting": sum(t.waiting for t in timings) / len(timings) if timings else 0.0,
+            "avg_first_text": sum(streamed) / len(streamed) if streamed else None,
+            "avg_total": sum(t.total for t in timings) / len(timings) if timings else 0.0,
+            "avg_prompt_tokens": prompt_tokens / len(measured) if measured else 0.0,
+            "prompt_cache_rate": sum(t.cached_tokens for t in measured) / prompt_tokens if prompt_tokens else 0.0,
+            "context_tokens": self.context_tokens,
+            "last": timings[-1].as_dict() if timings else None,
+            "cache": self.cache.get_stats(),
+            "coalescing": self.flight.get_stats(),
+            "scheduler": self.scheduler.get_stats()
+        }
 
 
 # Создаем глобальный экземпляр
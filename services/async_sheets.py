@@ -0,0 +1,214 @@
+"""
+Асинхронная обёртка над GoogleSheetsService
+
+gspread работает синхронно, поэтому все вызовы выполняются
+в отдельном ограниченном пуле потоков и не блокируют event loop бота.
+"""
+import asyncio
+import contextvars
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Optional, Dict, List, Any, Callable, Tuple
+import config
+from services.sheets import get_sheets_service, get_connected_sheets_service, snapshot_cache
+from services.rate_limit import sheets_rate_limiter, set_call_deadline
+from services.single_flight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+# Запас ожидания сверх срока вызова: пул сам прекращает ожидание квоты и повторы
+# к сроку и возвращает точную ошибку раньше, чем сработает таймаут
+DEADLINE_GRACE = 0.5
+
+
+class SheetsTimeoutError(Exception):
+    """Google Sheets не ответил за отведённое время (запрос мог выполниться в фоне)"""
+
+
+class AsyncSheetsService:
+    """Неблокирующий фасад с тем же API, что и GoogleSheetsService"""
+
+    def __init__(
+        self,
+        max_workers: int = config.SHEETS_MAX_WORKERS,
+        timeout: float = config.SHEETS_CALL_TIMEOUT
+    ):
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers,
+            thread_name_prefix="sheets"
+        )
+        self.summary_flight = SingleFlight("Сводка")
+
+    async def _call(self, func: Callable, *args, timeout: Optional[float] = None, **kwargs) -> Any:
+        """
+        Выполнить синхронный вызов в пуле потоков
+
+        Если вызывающая корутина отменена или истёк таймаут, ещё не начатый
+        вызов снимается из очереди пула. Уже выполняющийся HTTP-запрос
+        gspread прервать нельзя - он завершится в фоне.
+
+        Вызов выполняется в копии контекста вызывающей корутины, чтобы
+        приоритет запроса (background_priority) дошёл до ограничителя.
+        Туда же передаётся срок вызова: ожидание квоты и повторы
+        ограничителя не продолжаются после таймаута.
+        """
+        loop = asyncio.get_running_loop()
+        timeout = self.timeout if timeout is None else timeout
+        context = contextvars.copy_context()
+        context.run(set_call_deadline, time.monotonic() + timeout)
+        future = loop.run_in_executor(
+            self._executor, partial(context.run, func, *args, **kwargs)
+        )
+
+        try:
+            return await asyncio.wait_for(future, timeout=timeout + DEADLINE_GRACE)
+        except asyncio.TimeoutError:
+            logger.warning(f"Google Sheets: {func.__name__} не ответил за {timeout:g} с")
+            raise SheetsTimeoutError(
+                f"Google Sheets не ответил за {timeout:g} с"
+            ) from None
+
+    async def _service_call(self, method: str, *args, **kwargs) -> Any:
+        """Вызвать метод GoogleSheetsService в пуле потоков"""
+
+        def run():
+            # Сервис создаётся внутри пула: подключение тоже не блокирует loop
+            return getattr(get_sheets_service(), method)(*args, **kwargs)
+
+        run.__name__ = method
+        return await self._call(run)
+
+    async def connect(self):
+        """Подключиться к таблице и загрузить метаданные листов"""
+        await self._service_call("load_metadata")
+
+    async def get_ranges(
+        self,
+        ranges: List[Tuple[str, Optional[str]]]
+    ) -> List[List[List[str]]]:
+        """Прочитать несколько листов/диапазонов одним запросом batchGet"""
+        return await self._service_call("get_ranges", ranges)
+
+    async def get_references(self) -> Dict[str, List[str]]:
+        """Получить справочники (типы, счета, категории)"""
+        return await self._service_call("get_references")
+
+    async def get_accounts_balance(self) -> List[Dict[str, Any]]:
+        """Получить балансы всех счетов"""
+        return await self._service_call("get_accounts_balance")
+
+    async def get_categories_budget(self) -> List[Dict[str, Any]]:
+        """Получить бюджеты и расходы по категориям"""
+        return await self._service_call("get_categories_budget")
+
+    async def get_current_month_settings(self) -> Dict[str, int]:
+        """Получить текущий месяц и год из настроек таблицы"""
+        return await self._service_call("get_current_month_settings")
+
+    async def add_transaction(
+        self,
+        day: int,
+        trans_type: str,
+        account: str,
+        category: Optional[str],
+        amount: float,
+        to_account: Optional[str] = None,
+        comment: Optional[str] = None,
+        hours: Optional[float] = None
+    ) -> bool:
+        """Добавить транзакцию в таблицу"""
+        return await self._service_call(
+            "add_transaction",
+            day=day,
+            trans_type=trans_type,
+            account=account,
+            category=category,
+            amount=amount,
+            to_account=to_account,
+            comment=comment,
+            hours=hours
+        )
+
+    async def add_transaction_rows(self, rows: List[List[Any]]) -> Dict[str, Any]:
+        """Добавить несколько строк транзакций одним запросом"""
+        return await self._service_call("add_transaction_rows", rows)
+
+    async def get_monthly_summary(self) -> Dict[str, Any]:
+        """
+        Получить сводку за текущий месяц
+
+        Одновременные вызовы делят один запрос. Ключ - версия данных:
+        после записи ботом новый вызов не присоединится к чтению,
+        начатому до неё. Результат общий - его нельзя изменять.
+        """
+        return await self.summary_flight.run(
+            ("get_monthly_summary", snapshot_cache.version()),
+            partial(self._service_call, "get_monthly_summary")
+        )
+
+    async def get_recent_transactions(self, limit: int = 10) -> List[Dict[str, Any]]:
+        """Получить последние транзакции"""
+        return await self._service_call("get_recent_transactions", limit)
+
+    async def get_transactions_page(
+        self,
+        limit: int = 10,
+        before_row: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """Получить страницу транзакций, от новых к старым"""
+        return await self._service_call("get_transactions_page", limit, before_row)
+
+    async def delete_transaction(self, row_index: int, fingerprint: str) -> bool:
+        """Удалить транзакцию из таблицы, если в строке всё ещё она"""
+        return await self._service_call("delete_transaction", row_index, fingerprint)
+
+    async def get_income_by_days(self) -> Dict[str, Any]:
+        """Получить доходы по дням с детализацией"""
+        return await self._service_call("get_income_by_days")
+
+    async def sync_mirror(self, full: bool = False) -> Dict[str, Any]:
+        """Синхронизировать локальное зеркало с таблицей"""
+        return await self._service_call("sync_mirror", full)
+
+    async def seed_aggregates(self):
+        """Посчитать итоги по листу Транзакции"""
+        await self._service_call("seed_aggregates")
+
+    def get_data_version(self) -> int:
+        """Версия данных бюджета (без обращения к таблице)"""
+        return snapshot_cache.version()
+
+    def get_cache_stats(self) -> Dict[str, Any]:
+        """Статистика кэша снимков листов"""
+        return snapshot_cache.get_stats()
+
+    def get_coalescing_stats(self) -> Dict[str, Any]:
+        """Статистика объединения одновременных запросов сводки"""
+        return self.summary_flight.get_stats()
+
+    def get_rate_limit_stats(self) -> Dict[str, Any]:
+        """Статистика ограничения частоты запросов и повторов"""
+        return sheets_rate_limiter.get_stats()
+
+    def get_aggregate_stats(self) -> Optional[Dict[str, Any]]:
+        """Состояние инкрементальных итогов (None, если сервис ещё не подключён)"""
+        service = get_connected_sheets_service()
+        return service.aggregates.get_stats() if service is not None else None
+
+    def shutdown(self):
+        """Остановить пул потоков, отменив ещё не начатые вызовы"""
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+# Создаем глобальный экземпляр
+async_sheets_service = None
+
+def get_async_sheets_service() -> AsyncSheetsService:
+    """Получить экземпляр асинхронного сервиса (singleton)"""
+    global async_sheets_service
+    if async_sheets_service is None:
+        async_sheets_service = AsyncSheetsService()
+    return async_sheets_service
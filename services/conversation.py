@@ -0,0 +1,168 @@
+"""
+Память диалога с AI советником
+
+Для каждого пользователя хранятся последние CONVERSATION_WINDOW обменов
+дословно и сжатое содержание более ранних. Вопрос-ответ, выпавший из
+окна, сворачивается в строку "вопрос → первая фраза ответа" без
+отдельного запроса к модели; старые строки содержания отбрасываются.
+История в промпте не превышает CONVERSATION_MAX_TOKENS независимо
+от длины разговора.
+
+Сессии без активности дольше CONVERSATION_IDLE_TIMEOUT удаляются,
+а число хранимых сессий ограничено CONVERSATION_MAX_USERS (вытесняются
+давно неактивные).
+"""
+import re
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Dict, Any, List, Optional
+import config
+from services.advice_context import estimate_tokens
+
+# Ограничения на одну реплику в памяти
+MAX_QUESTION_CHARS = 300
+MAX_ANSWER_CHARS = 1200
+# Одна строка содержания
+MAX_SUMMARY_QUESTION_CHARS = 100
+MAX_SUMMARY_ANSWER_CHARS = 160
+
+
+def _clip(text: str, limit: int) -> str:
+    """Обрезать текст до limit символов"""
+    text = text.strip()
+    return text if len(text) <= limit else text[:limit - 1].rstrip() + "…"
+
+
+def _first_sentence(text: str) -> str:
+    """Первая содержательная фраза ответа (без строк из одних эмодзи)"""
+    for line in text.splitlines():
+        line = line.strip()
+        if re.search(r"\w", line):
+            return re.split(r"(?<=[.!?])\s", line, maxsplit=1)[0]
+    return ""
+
+
+class ConversationMemory:
+    """Окно последних обменов и содержание более ранних"""
+
+    __slots__ = ("turns", "summary", "last_active")
+
+    def __init__(self):
+        self.turns: deque = deque()        # (вопрос, ответ)
+        self.summary: deque = deque()      # Строки содержания, от старых к новым
+        self.last_active = time.monotonic()
+
+    def add(self, question: str, answer: str, window: int, max_tokens: int, summary_tokens: int):
+        """Запомнить обмен и ужать историю до лимитов"""
+        self.turns.append((_clip(question, MAX_QUESTION_CHARS), _clip(answer, MAX_ANSWER_CHARS)))
+        self.last_active = time.monotonic()
+
+        while len(self.turns) > window or (len(self.turns) > 1 and self.tokens() > max_tokens):
+            old_question, old_answer = self.turns.popleft()
+            self.summary.append(
+                f"- {_clip(old_question, MAX_SUMMARY_QUESTION_CHARS)} → "
+                f"{_clip(_first_sentence(old_answer), MAX_SUMMARY_ANSWER_CHARS)}"
+            )
+            while self.summary and estimate_tokens("\n".join(self.summary)) > summary_tokens:
+                self.summary.popleft()
+
+    def tokens(self) -> int:
+        """Оценка токенов истории в промпте"""
+        return sum(estimate_tokens(m["content"]) for m in self.messages())
+
+    def messages(self) -> List[Dict[str, str]]:
+        """История в формате messages chat completions"""
+        messages = []
+        if self.summary:
+            messages.append({
+                "role": "system",
+                "content": "Ранее в этом разговоре:\n" + "\n".join(self.summary)
+            })
+        for question, answer in self.turns:
+            messages.append({"role": "user", "content": question})
+            messages.append({"role": "assistant", "content": answer})
+        return messages
+
+
+class ConversationStore:
+    """Сессии диалогов всех пользователей с вытеснением неактивных"""
+
+    def __init__(
+        self,
+        window: int = config.CONVERSATION_WINDOW,
+        max_tokens: int = config.CONVERSATION_MAX_TOKENS,
+        summary_tokens: int = config.CONVERSATION_SUMMARY_TOKENS,
+        idle_timeout: float = config.CONVERSATION_IDLE_TIMEOUT,
+        max_users: int = config.CONVERSATION_MAX_USERS
+    ):
+        self.window = window
+        self.max_tokens = max_tokens
+        self.summary_tokens = summary_tokens
+        self.idle_timeout = idle_timeout
+        self.max_users = max_users
+        self._sessions: "OrderedDict[int, ConversationMemory]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.evicted_idle = 0
+        self.evicted_lru = 0
+
+    def history(self, user_id: int) -> List[Dict[str, str]]:
+        """История диалога пользователя (пустая, если сессии нет или она истекла)"""
+        with self._lock:
+            self._evict_idle()
+            memory = self._sessions.get(user_id)
+            return memory.messages() if memory is not None else []
+
+    def record(self, user_id: int, question: str, answer: str):
+        """Добавить обмен в сессию пользователя"""
+        with self._lock:
+            self._evict_idle()
+            memory = self._sessions.get(user_id)
+            if memory is None:
+                memory = self._sessions[user_id] = ConversationMemory()
+            memory.add(question, answer, self.window, self.max_tokens, self.summary_tokens)
+            self._sessions.move_to_end(user_id)
+
+            while len(self._sessions) > self.max_users:
+                self._sessions.popitem(last=False)
+                self.evicted_lru += 1
+
+    def end(self, user_id: int):
+        """Завершить диалог пользователя"""
+        with self._lock:
+            self._sessions.pop(user_id, None)
+
+    def _evict_idle(self):
+        """Удалить неактивные сессии (вызывать под блокировкой; старые - в начале)"""
+        deadline = time.monotonic() - self.idle_timeout
+        while self._sessions:
+            user_id, memory = next(iter(self._sessions.items()))
+            if memory.last_active > deadline:
+                break
+            del self._sessions[user_id]
+            self.evicted_idle += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Число сессий и размер истории"""
+        with self._lock:
+            self._evict_idle()
+            tokens = [memory.tokens() for memory in self._sessions.values()]
+        return {
+            "sessions": len(tokens),
+            "max_tokens": max(tokens, default=0),
+            "avg_tokens": sum(tokens) / len(tokens) if tokens else 0.0,
+            "evicted_idle": self.evicted_idle,
+            "evicted_lru": self.evicted_lru
+        }
+
+
+# Создаем глобальный экземпляр
+_conversations: Optional[ConversationStore] = None
+
+def get_conversations() -> ConversationStore:
+    """Получить хранилище диалогов (singleton)"""
+    global _conversations
+    if _conversations is None:
+        _conversations = ConversationStore()
+    return _conversations
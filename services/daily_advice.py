@@ -0,0 +1,136 @@
+"""
+Совет дня, подготовленный заранее
+
+Задача в JobQueue запрашивает совет у DeepSeek в заданное время
+(DAILY_ADVICE_TIME) и после заметных изменений бюджета, а /advisor
+показывает готовый текст без ожидания модели.
+
+Сохранённый совет устаревает, если наступил новый день или бюджет
+заметно изменился: доходы или расходы сдвинулись больше чем на
+DAILY_ADVICE_CHANGE_THRESHOLD или поменялся список превышенных
+и близких к лимиту категорий. Мелкие траты совет не сбрасывают.
+Таблица одна на всех пользователей бота, поэтому и совет дня общий.
+"""
+import logging
+import time
+from datetime import datetime, date
+from typing import Optional, Dict, Any, Callable, Awaitable
+import pytz
+import config
+from services.ai_advisor import get_advisor, is_error_reply
+
+logger = logging.getLogger(__name__)
+
+
+def budget_digest(budget_data: Dict[str, Any]) -> Dict[str, Any]:
+    """Показатели сводки, по которым определяется заметное изменение"""
+    return {
+        "income": round(budget_data["total_income"], 2),
+        "expense": round(budget_data["total_expense"], 2),
+        "over_budget": sorted(c["name"] for c in budget_data.get("over_budget", [])),
+        "near_limit": sorted(c["name"] for c in budget_data.get("near_limit", []))
+    }
+
+
+def is_significant_change(
+    old: Dict[str, Any],
+    new: Dict[str, Any],
+    threshold: float = config.DAILY_ADVICE_CHANGE_THRESHOLD
+) -> bool:
+    """Бюджет изменился настолько, что совет стоит пересчитать"""
+    if old["over_budget"] != new["over_budget"] or old["near_limit"] != new["near_limit"]:
+        return True
+    for field in ("income", "expense"):
+        base = max(abs(old[field]), 1.0)
+        if abs(new[field] - old[field]) / base > threshold:
+            return True
+    return False
+
+
+def today() -> date:
+    """Текущая дата в часовом поясе пользователя"""
+    return datetime.now(pytz.timezone(config.USER_TIMEZONE)).date()
+
+
+class DailyAdvice:
+    """Сохранённый совет дня и сводка, по которой он составлен"""
+
+    __slots__ = ("text", "version", "digest", "day", "created_at")
+
+    def __init__(self, text: str, version: int, digest: Dict[str, Any]):
+        self.text = text
+        self.version = version      # Версия данных таблицы на момент расчёта
+        self.digest = digest
+        self.day = today()
+        self.created_at = time.time()
+
+
+class DailyAdviceService:
+    """Подготовка совета дня и выдача сохранённой копии"""
+
+    def __init__(self):
+        self.current: Optional[DailyAdvice] = None
+
+        self.served = 0       # Показан готовый совет
+        self.generated = 0    # Совет запрошен у модели
+        self.skipped = 0      # Плановый перерасчёт не понадобился
+
+    def is_fresh(self, version: int, budget_data: Optional[Dict[str, Any]] = None) -> bool:
+        """
+        Сохранённый совет ещё актуален
+
+        Args:
+            version: Текущая версия данных таблицы
+            budget_data: Текущая сводка; без неё актуален только совет
+                с той же версией данных
+        """
+        advice = self.current
+        if advice is None or advice.day != today():
+            return False
+        if advice.version == version:
+            return True
+        return budget_data is not None and not is_significant_change(
+            advice.digest, budget_digest(budget_data)
+        )
+
+    def get(self, budget_data: Dict[str, Any], version: int) -> Optional[str]:
+        """Готовый совет для этой сводки или None, если его нужно составить заново"""
+        if not self.is_fresh(version, budget_data):
+            return None
+        self.served += 1
+        return self.current.text
+
+    async def generate(
+        self,
+        budget_data: Dict[str, Any],
+        version: int,
+        on_text: Optional[Callable[[str], Awaitable[None]]] = None
+    ) -> str:
+        """Запросить совет у модели и сохранить его (ошибки API не сохраняются)"""
+        self.generated += 1
+        text = await get_advisor().get_advice(budget_data, on_text=on_text)
+        if not is_error_reply(text):
+            self.current = DailyAdvice(text, version, budget_digest(budget_data))
+        return text
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Состояние совета дня"""
+        advice = self.current
+        return {
+            "served": self.served,
+            "generated": self.generated,
+            "skipped": self.skipped,
+            "age": time.time() - advice.created_at if advice else None,
+            "version": advice.version if advice else None
+        }
+
+
+# Создаем глобальный экземпляр
+_daily_advice = None
+
+def get_daily_advice() -> DailyAdviceService:
+    """Получить сервис совета дня (singleton)"""
+    global _daily_advice
+    if _daily_advice is None:
+        _daily_advice = DailyAdviceService()
+    return _daily_advice
@@ -0,0 +1,125 @@
+"""
+Локальный советник по правилам
+
+Составляет короткий совет по данным get_monthly_summary без обращения
+к модели: превышенные и близкие к лимиту категории, баланс месяца
+и темп трат (прогноз расходов к концу месяца и дневной лимит, чтобы
+уложиться в бюджет). Работает за миллисекунды и показывается, когда
+DeepSeek не успел ответить или недоступен.
+"""
+import calendar
+from datetime import date, MINYEAR, MAXYEAR
+from typing import Dict, Any, Optional, List
+from utils.formatters import format_money
+from services.daily_advice import today
+
+EXPENSE = "Расход"
+
+
+def month_progress(budget_data: Dict[str, Any], on: date) -> Dict[str, int]:
+    """
+    Прошедшие и все дни месяца сводки (прошлый месяц - целиком)
+
+    Пустые или неверные месяц и год в таблице заменяются текущими.
+    """
+    try:
+        year = int(budget_data.get("year") or on.year)
+    except (TypeError, ValueError):
+        year = on.year
+    try:
+        month = int(budget_data.get("month") or on.month)
+    except (TypeError, ValueError):
+        month = on.month
+    if not MINYEAR <= year <= MAXYEAR:
+        year = on.year
+    if not 1 <= month <= 12:
+        month = on.month
+    days_in_month = calendar.monthrange(year, month)[1]
+
+    if (year, month) == (on.year, on.month):
+        elapsed = on.day
+    elif (year, month) < (on.year, on.month):
+        elapsed = days_in_month
+    else:
+        elapsed = 1
+    return {"elapsed": elapsed, "total": days_in_month}
+
+
+def local_advice(budget_data: Dict[str, Any], on: Optional[date] = None) -> str:
+    """
+    Совет по правилам в формате ответа AI советника
+
+    Args:
+        budget_data: Данные из get_monthly_summary()
+        on: Дата, на которую считается темп трат (по умолчанию сегодня)
+    """
+    days = month_progress(budget_data, on or today())
+    income = budget_data["total_income"]
+    expense = budget_data["total_expense"]
+
+    budgets = [
+        c for c in budget_data.get("categories", [])
+        if c["type"] == EXPENSE and c["budget"] > 0
+    ]
+    total_budget = sum(c["budget"] for c in budgets)
+    budgeted_spent = sum(c["spent"] for c in budgets)
+
+    # Темп трат и прогноз на конец месяца
+    daily_rate = expense / days["elapsed"]
+    forecast = daily_rate * days["total"]
+    days_left = days["total"] - days["elapsed"]
+
+    lines: List[str] = []
+    summary = f"📊 Расходы {format_money(expense)} за {days['elapsed']} из {days['total']} дн."
+    if total_budget > 0:
+        summary += f", бюджет категорий использован на {budgeted_spent / total_budget:.0%}"
+    lines.append(summary + ".")
+    lines.append(
+        f"Темп: {format_money(daily_rate)} в день, к концу месяца ~{format_money(forecast)}."
+    )
+
+    over_budget = sorted(
+        budget_data.get("over_budget", []),
+        key=lambda c: c["spent"] - c["budget"],
+        reverse=True
+    )
+    if over_budget:
+        worst = ", ".join(
+            f"{c['name']} +{format_money(c['spent'] - c['budget'])}" for c in over_budget[:3]
+        )
+        lines.append(f"🚨 Превышен бюджет: {worst}.")
+
+    near_limit = sorted(budget_data.get("near_limit", []), key=lambda c: c["remaining"])
+    if near_limit:
+        close = ", ".join(
+            f"{c['name']} (осталось {format_money(c['remaining'])})" for c in near_limit[:3]
+        )
+        lines.append(f"⚠️ Близко к лимиту: {close}.")
+
+    # Одно практическое действие - по самой острой проблеме
+    remaining_budget = total_budget - budgeted_spent
+    if over_budget:
+        lines.append(
+            f"💡 Заморозь траты в категории «{over_budget[0]['name']}» до конца месяца "
+            f"и проверь, какие из них были ХОЧУ, а не ДОЛЖЕН."
+        )
+    elif total_budget > 0 and days_left > 0 and remaining_budget > 0:
+        lines.append(
+            f"💡 Чтобы уложиться в бюджет, трать не больше "
+            f"{format_money(remaining_budget / days_left)} в день ({days_left} дн. осталось)."
+        )
+    elif forecast > income > 0:
+        lines.append(f"💡 При таком темпе расходы обгонят доходы ({format_money(income)}) - притормози.")
+    else:
+        lines.append("💡 Продолжай записывать траты - так проще держать темп.")
+
+    balance = income - expense
+    if balance >= 0:
+        lines.append(f"🎯 Месяц в плюсе на {format_money(balance)} - это шаг к цели.")
+    else:
+        lines.append(f"🎯 Расходы превышают доходы на {format_money(-balance)} - без паники, это поправимо.")
+
+    if not over_budget and not near_limit and balance >= 0:
+        lines.append("✨ Все категории в рамках бюджета!")
+
+    return "\n".join(lines)
@@ -0,0 +1,230 @@
+"""
+Локальное зеркало таблицы бюджета в SQLite
+
+Хранит строки листа Транзакции и снимки небольших листов (Счета,
+Категории, настройки месяца). Таблица Google Sheets остаётся основным
+источником данных: зеркало синхронизируется в фоне и обновляется
+собственными записями бота, а методы чтения GoogleSheetsService
+обслуживаются из него без сетевых запросов.
+"""
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Optional, Dict, List, Any, Iterable, Tuple, Set
+import config
+
+# Колонки листа Транзакции A..J
+TRANSACTION_FIELDS = (
+    "day", "type", "account", "category", "amount",
+    "to_account", "comment", "full_date", "hours", "hours_pay"
+)
+
+SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS transactions (
+    row_index INTEGER PRIMARY KEY,
+    {", ".join(f"{field} TEXT NOT NULL DEFAULT ''" for field in TRANSACTION_FIELDS)}
+);
+CREATE INDEX IF NOT EXISTS transactions_type ON transactions (type);
+CREATE TABLE IF NOT EXISTS ranges (
+    sheet TEXT NOT NULL,
+    cell_range TEXT NOT NULL,
+    sheet_values TEXT NOT NULL,
+    synced_at REAL NOT NULL,
+    PRIMARY KEY (sheet, cell_range)
+);
+"""
+
+
+class SheetMirror:
+    """Зеркало листов бюджета в SQLite"""
+
+    def __init__(
+        self,
+        path: str = config.MIRROR_DB_PATH,
+        max_age: float = config.MIRROR_MAX_AGE
+    ):
+        if path != ":memory:":
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+
+        self.max_age = max_age
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.executescript(SCHEMA)
+        self._lock = threading.Lock()
+
+        # Строки транзакций считаются актуальными только после
+        # первой синхронизации в текущем процессе
+        self.transactions_ready = False
+        # Строки, записанные ботом без формул H и J: перечитываются при синхронизации
+        self._written: Set[int] = set()
+        self.last_sync: Optional[float] = None
+        self.syncs = 0
+        self.full_syncs = 0
+        self.reads = 0
+
+    # === Снимки небольших листов ===
+
+    def get_range(self, sheet_name: str, cell_range: Optional[str]) -> Optional[List[List[str]]]:
+        """Снимок листа/диапазона или None, если его нет или он устарел"""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT sheet_values, synced_at FROM ranges WHERE sheet = ? AND cell_range = ?",
+                (sheet_name, cell_range or "")
+            ).fetchone()
+
+        if row is None or time.time() - row[1] > self.max_age:
+            return None
+        self.reads += 1
+        return json.loads(row[0])
+
+    def store_range(self, sheet_name: str, cell_range: Optional[str], values: List[List[str]]):
+        """Сохранить свежий снимок листа/диапазона"""
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT OR REPLACE INTO ranges VALUES (?, ?, ?, ?)",
+                (sheet_name, cell_range or "", json.dumps(values, ensure_ascii=False), time.time())
+            )
+
+    def invalidate_ranges(self, *sheet_names: str):
+        """Пометить снимки листов устаревшими (после записи ботом)"""
+        with self._lock, self._db:
+            self._db.executemany(
+                "DELETE FROM ranges WHERE sheet = ?",
+                [(name,) for name in sheet_names]
+            )
+
+    # === Строки листа Транзакции ===
+
+    def last_row(self) -> int:
+        """Номер последней строки в зеркале (0 - пусто)"""
+        with self._lock:
+            return self._db.execute("SELECT MAX(row_index) FROM transactions").fetchone()[0] or 0
+
+    def replace_transactions(self, first_row: int, rows: Iterable[List[str]]):
+        """Полностью заменить строки транзакций"""
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM transactions")
+            self._insert(first_row, rows)
+            self._written.clear()
+        self.transactions_ready = True
+
+    def append_transactions(self, first_row: int, rows: Iterable[List[Any]]):
+        """Добавить строки, начиная с first_row (существующие перезаписываются)"""
+        with self._lock, self._db:
+            self._insert(first_row, rows)
+
+    def add_written_transactions(self, first_row: int, rows: List[List[Any]]):
+        """Строки, записанные ботом: в зеркало сразу, формулы - со следующей синхронизацией"""
+        with self._lock, self._db:
+            self._insert(first_row, rows)
+            self._written.update(range(first_row, first_row + len(rows)))
+
+    def refresh_from(self, default: int) -> int:
+        """Первая строка, которую нужно перечитать (default, если таких нет)"""
+        with self._lock:
+            return min(self._written, default=default)
+
+    def delete_transaction(self, row_index: int):
+        """Удалить строку и сдвинуть нижние строки вверх, как это делает таблица"""
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM transactions WHERE row_index = ?", (row_index,))
+            # Двухшаговый сдвиг, чтобы не нарушать уникальность row_index
+            self._db.execute(
+                "UPDATE transactions SET row_index = -(row_index - 1) WHERE row_index > ?",
+                (row_index,)
+            )
+            self._db.execute("UPDATE transactions SET row_index = -row_index WHERE row_index < 0")
+            self._written = {row - 1 if row > row_index else row for row in self._written if row != row_index}
+
+    def get_transactions(
+        self,
+        limit: int,
+        before_row: Optional[int] = None
+    ) -> List[Tuple[int, List[str]]]:
+        """Последние непустые строки (номер строки, значения), от новых к старым"""
+        with self._lock:
+            rows = self._db.execute(
+                f"SELECT row_index, {', '.join(TRANSACTION_FIELDS)} FROM transactions "
+                "WHERE row_index < ? AND TRIM(day) != '' ORDER BY row_index DESC LIMIT ?",
+                (before_row or 2 ** 62, limit)
+            ).fetchall()
+        self.reads += 1
+        return [(row[0], list(row[1:])) for row in rows]
+
+    def get_transaction_rows(self, trans_type: Optional[str] = None) -> List[List[str]]:
+        """Все строки транзакций (опционально только указанного типа)"""
+        query = f"SELECT {', '.join(TRANSACTION_FIELDS)} FROM transactions"
+        params: Tuple = ()
+        if trans_type is not None:
+            query += " WHERE type = ?"
+            params = (trans_type,)
+
+        with self._lock:
+            rows = self._db.execute(query + " ORDER BY row_index", params).fetchall()
+        self.reads += 1
+        return [list(row) for row in rows]
+
+    def _insert(self, first_row: int, rows: Iterable[List[Any]]):
+        """Вставить строки (вызывать под блокировкой и в транзакции)"""
+        width = len(TRANSACTION_FIELDS)
+        self._db.executemany(
+            f"INSERT OR REPLACE INTO transactions VALUES ({', '.join('?' * (width + 1))})",
+            [
+                (row_index, *[_cell_text(value) for value in (list(row) + [""] * width)[:width]])
+                for row_index, row in enumerate(rows, start=first_row)
+            ]
+        )
+
+    def mark_synced(self, full: bool, last_row: int):
+        """Отметить завершение синхронизации строк до last_row включительно"""
+        with self._lock:
+            # Строки, записанные во время синхронизации, ждут следующей
+            self._written = {row for row in self._written if row > last_row}
+        self.last_sync = time.time()
+        self.syncs += 1
+        if full:
+            self.full_syncs += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Состояние зеркала"""
+        with self._lock:
+            rows = self._db.execute("SELECT COUNT(*) FROM transactions").fetchone()[0]
+        return {
+            "ready": self.transactions_ready,
+            "rows": rows,
+            "syncs": self.syncs,
+            "full_syncs": self.full_syncs,
+            "reads": self.reads,
+            "last_sync_age": time.time() - self.last_sync if self.last_sync else None
+        }
+
+    def close(self):
+        """Закрыть базу"""
+        with self._lock:
+            self._db.close()
+
+
+def _cell_text(value: Any) -> str:
+    """Значение ячейки в том виде, в каком его вернёт таблица"""
+    if value is None:
+        return ""
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
+# Создаем глобальный экземпляр
+_mirror = None
+_mirror_lock = threading.Lock()
+
+def get_mirror() -> Optional[SheetMirror]:
+    """Получить зеркало (singleton); None, если зеркало выключено"""
+    global _mirror
+    if not config.MIRROR_ENABLED:
+        return None
+    if _mirror is None:
+        with _mirror_lock:
+            if _mirror is None:
+                _mirror = SheetMirror()
+    return _mirror
@@ -0,0 +1,267 @@
+"""
+Ограничение частоты запросов к Google Sheets и повторы при ошибках
+
+Google Sheets ограничивает число запросов чтения и записи в минуту.
+Каждый HTTP-запрос сервиса проходит через token bucket своего типа
+(чтение/запись), а ответы 429 и 5xx повторяются с экспоненциальной
+задержкой со случайным разбросом. Запись (append, удаление строк)
+не идемпотентна, поэтому она повторяется только после 429, когда
+запрос гарантированно не был выполнен. Интерактивные запросы пользователей
+обслуживаются раньше фоновых задач.
+
+Ожидание квоты и повторы укладываются в срок вызова (set_call_deadline):
+после него запрос не отправляется и не повторяется, чтобы вызывающий
+получил ошибку, а не таймаут при запросе, выполненном позже в фоне.
+"""
+import contextvars
+import logging
+import random
+import threading
+import time
+from contextlib import contextmanager
+from enum import IntEnum
+from typing import Dict, Any, Callable, Optional
+import gspread
+import requests
+import config
+
+logger = logging.getLogger(__name__)
+
+# Коды ответа, при которых запрос имеет смысл повторить
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+
+class Priority(IntEnum):
+    """Приоритет запроса (меньше - важнее)"""
+    INTERACTIVE = 0  # Команды и кнопки пользователя
+    BACKGROUND = 1   # Синхронизация зеркала, прогрев, предрасчёты
+
+
+_priority: contextvars.ContextVar = contextvars.ContextVar(
+    "sheets_priority", default=Priority.INTERACTIVE
+)
+
+# Момент time.monotonic(), после которого запросы не отправляются (None - без срока)
+_deadline: contextvars.ContextVar = contextvars.ContextVar("sheets_deadline", default=None)
+
+
+class QuotaTimeoutError(Exception):
+    """Срок вызова истёк до отправки запроса (квота или повторы) - запрос не выполнялся"""
+
+
+@contextmanager
+def background_priority():
+    """Выполнять запросы к таблице внутри блока с фоновым приоритетом"""
+    token = _priority.set(Priority.BACKGROUND)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+def current_priority() -> Priority:
+    """Приоритет текущего контекста (фоновый внутри background_priority)"""
+    return _priority.get()
+
+
+def set_call_deadline(deadline: Optional[float]):
+    """Задать срок (time.monotonic()) для запросов текущего контекста"""
+    _deadline.set(deadline)
+
+
+def current_deadline() -> Optional[float]:
+    """Срок запросов текущего контекста"""
+    return _deadline.get()
+
+
+class TokenBucket:
+    """Потокобезопасный token bucket с приоритетом ожидающих"""
+
+    def __init__(self, per_minute: float, burst: Optional[float] = None):
+        self.rate = per_minute / 60.0  # токенов в секунду; 0 - без ограничения
+        self.capacity = burst if burst is not None else max(per_minute, 1)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._waiting: Dict[Priority, int] = {p: 0 for p in Priority}
+        self._cond = threading.Condition()
+
+        self.acquired = 0
+        self.throttled = 0
+        self.expired = 0
+        self.wait_time = 0.0
+
+    def acquire(self, priority: Priority = Priority.INTERACTIVE, deadline: Optional[float] = None) -> float:
+        """
+        Получить токен, при необходимости подождав
+
+        Пока есть ожидающие запросы с более высоким приоритетом,
+        менее важные запросы не получают токены.
+
+        Returns:
+            float: Время ожидания в секундах
+
+        Raises:
+            QuotaTimeoutError: Токен не получен до deadline
+        """
+        if deadline is not None and time.monotonic() >= deadline:
+            with self._cond:
+                self.expired += 1
+            raise QuotaTimeoutError("Срок запроса к Google Sheets истёк в очереди")
+
+        if self.rate <= 0:
+            with self._cond:
+                self.acquired += 1
+            return 0.0
+
+        started = time.monotonic()
+        with self._cond:
+            self._waiting[priority] += 1
+            try:
+                while True:
+                    self._refill()
+                    blocked = any(self._waiting[p] for p in Priority if p < priority)
+                    if self._tokens >= 1 and not blocked:
+                        self._tokens -= 1
+                        break
+                    wait = max(1 - self._tokens, 0.05) / self.rate
+                    if deadline is not None:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            self.expired += 1
+                            raise QuotaTimeoutError("Квота запросов к Google Sheets не освободилась до срока")
+                        wait = min(wait, remaining)
+                    self._cond.wait(wait)
+            finally:
+                self._waiting[priority] -= 1
+                self._cond.notify_all()
+
+            waited = time.monotonic() - started
+            self.acquired += 1
+            if waited > 0.001:
+                self.throttled += 1
+                self.wait_time += waited
+            return waited
+
+    def _refill(self):
+        """Пополнить токены (вызывать под блокировкой)"""
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Статистика ожидания"""
+        with self._cond:
+            return {
+                "acquired": self.acquired,
+                "throttled": self.throttled,
+                "wait_time": self.wait_time,
+                "expired": self.expired,
+                "queued": sum(self._waiting.values())
+            }
+
+
+class SheetsRateLimiter:
+    """Ограничитель запросов с отдельными квотами чтения и записи и повторами"""
+
+    def __init__(
+        self,
+        read_per_minute: float = config.SHEETS_READ_PER_MINUTE,
+        write_per_minute: float = config.SHEETS_WRITE_PER_MINUTE,
+        max_retries: int = config.SHEETS_MAX_RETRIES,
+        base_delay: float = config.SHEETS_RETRY_BASE_DELAY,
+        max_delay: float = config.SHEETS_RETRY_MAX_DELAY
+    ):
+        self.buckets = {
+            "read": TokenBucket(read_per_minute),
+            "write": TokenBucket(write_per_minute)
+        }
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+        self.retries = 0
+        self.failures = 0
+        self._stats_lock = threading.Lock()
+
+    def call(self, kind: str, func: Callable, *args, **kwargs) -> Any:
+        """
+        Выполнить HTTP-запрос к таблице с учётом квоты и повторами
+
+        Ожидание токена и повторы ограничены сроком текущего контекста
+        (set_call_deadline): повтор, который не успеет до срока, не выполняется.
+
+        Args:
+            kind: "read" или "write"
+            func: Функция gspread, выполняющая запрос
+
+        Raises:
+            QuotaTimeoutError: Срок истёк до отправки запроса
+            Исключение последней попытки, если повторы не помогли
+        """
+        bucket = self.buckets[kind]
+        deadline = current_deadline()
+        attempt = 0
+
+        while True:
+            bucket.acquire(current_priority(), deadline)
+            try:
+                return func(*args, **kwargs)
+            except Exception as e:
+                status = _retryable_status(e)
+                if kind == "write" and status != 429:
+                    status = None
+                if status is None or attempt >= self.max_retries:
+                    if status is not None:
+                        with self._stats_lock:
+                            self.failures += 1
+                    raise
+
+                # Экспоненциальная задержка с полным случайным разбросом
+                delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+                delay = max(delay, _retry_after(e))
+                if deadline is not None and time.monotonic() + delay >= deadline:
+                    logger.warning(f"Google Sheets ответил {status}, повтор не успеет до срока вызова")
+                    with self._stats_lock:
+                        self.failures += 1
+                    raise
+                attempt += 1
+                with self._stats_lock:
+                    self.retries += 1
+
+                logger.warning(
+                    f"Google Sheets ответил {status}, повтор {attempt}/{self.max_retries} "
+                    f"через {delay:.1f} с"
+                )
+                time.sleep(delay)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Статистика ограничения и повторов"""
+        return {
+            "read": self.buckets["read"].get_stats(),
+            "write": self.buckets["write"].get_stats(),
+            "retries": self.retries,
+            "failures": self.failures
+        }
+
+
+def _retryable_status(error: Exception) -> Optional[int]:
+    """Код ошибки, если запрос стоит повторить, иначе None"""
+    if isinstance(error, gspread.exceptions.APIError):
+        status = error.response.status_code
+        return status if status in RETRYABLE_STATUS else None
+    if isinstance(error, (requests.exceptions.ConnectionError, requests.exceptions.Timeout)):
+        return 0  # Сетевая ошибка без ответа
+    return None
+
+
+def _retry_after(error: Exception) -> float:
+    """Задержка из заголовка Retry-After (если сервер его прислал)"""
+    response = getattr(error, "response", None)
+    try:
+        return float(response.headers.get("Retry-After", 0))
+    except (AttributeError, TypeError, ValueError):
+        return 0.0
+
+
+# Общий ограничитель для всех экземпляров сервиса
+sheets_rate_limiter = SheetsRateLimiter()
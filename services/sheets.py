@@ -1,50 +1,217 @@
 """
 Сервис для работы с Google Sheets
 """
+import logging
+import re
+import threading
+import time
+import zlib
+from collections import OrderedDict
 import gspread
+from gspread.utils import absolute_range_name, fill_gaps
 from oauth2client.service_account import ServiceAccountCredentials
 from datetime import datetime
-from typing import Optional, Dict, List, Any
+from typing import Optional, Dict, List, Any, Tuple
 import config
+from services.mirror import SheetMirror, get_mirror
+from services.rate_limit import SheetsRateLimiter, sheets_rate_limiter
+from services.aggregates import AggregateEngine
+from utils.formatters import safe_float, safe_int
 
+logger = logging.getLogger(__name__)
 
-def safe_float(value, default=0.0) -> float:
+# Ячейки настроек месяца на листе Транзакции: C1 = месяц, E1 = год
+MONTH_SETTINGS_RANGE = "A1:E1"
+
+# Первая строка с транзакциями (строки 1-3 - настройки и заголовки)
+FIRST_TRANSACTION_ROW = 4
+TRANSACTION_COLUMNS = 10  # A..J
+HISTORY_MIN_WINDOW = 10   # Минимум строк в одном запросе хвоста
+
+# Строки из ответа append: 'Транзакции'!A120:J122 -> 120, 122
+_UPDATED_RANGE_ROWS = re.compile(r"!\$?[A-Z]+\$?(\d+)(?::\$?[A-Z]+\$?(\d+))?$")
+
+
+class TransactionChangedError(Exception):
+    """Строка в таблице уже не та транзакция, которую видел пользователь"""
+
+
+def transaction_fingerprint(row: List[Any]) -> str:
     """
-    Безопасное преобразование строки в float.
-    Обрабатывает европейский формат с запятой (140,82)
+    Отпечаток введённых полей строки Транзакции (A-G, без формул H и J)
+
+    Сумма сравнивается числом: таблица показывает её в своём формате,
+    а бот записывает float.
     """
-    if value is None or value == "" or value == "-":
-        return default
-    
-    if isinstance(value, (int, float)):
-        return float(value)
-    
-    try:
-        # Убираем пробелы и заменяем запятую на точку
-        cleaned = str(value).strip().replace(" ", "").replace(",", ".")
-        return float(cleaned)
-    except (ValueError, TypeError):
-        return default
-
-
-def safe_int(value, default=0) -> int:
-    """Безопасное преобразование в int"""
-    if value is None or value == "":
-        return default
-    
-    try:
-        # Сначала преобразуем в float (на случай "1,0"), потом в int
-        return int(safe_float(value, default))
-    except (ValueError, TypeError):
-        return default
+    row = list(row) + [""] * TRANSACTION_COLUMNS
+    fields = [str(row[idx]).strip() for idx in (0, 1, 2, 3, 5, 6)]
+    fields.append(f"{safe_float(row[4]):.2f}")
+    return f"{zlib.crc32(chr(31).join(fields).encode('utf-8')):08x}"
+
+
+# Листы, содержимое которых меняется при записи транзакции
+# (Категории и Счета считаются формулами от листа Транзакции)
+TRANSACTION_DEPENDENT_SHEETS = (
+    config.SHEET_TRANSACTIONS,
+    config.SHEET_CATEGORIES,
+    config.SHEET_ACCOUNTS
+)
+
+
+class SheetSnapshotCache:
+    """
+    Кэш снимков листов и диапазонов
+
+    Ключ - пара (лист, диапазон); диапазон None означает весь лист.
+    Записи хранятся с TTL и LRU-вытеснением по числу записей и суммарному
+    числу ячеек. У каждого листа есть версия, которая растёт при
+    инвалидации и при изменении уже читанного содержимого.
+    """
+
+    def __init__(
+        self,
+        ttl: float = config.SHEETS_CACHE_TTL,
+        max_entries: int = config.SHEETS_CACHE_MAX_ENTRIES,
+        max_cells: int = config.SHEETS_CACHE_MAX_CELLS
+    ):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_cells = max_cells
+        self._entries: "OrderedDict[Tuple[str, Optional[str]], Dict[str, Any]]" = OrderedDict()
+        self._versions: Dict[str, int] = {}
+        self._fingerprints: Dict[Tuple[str, Optional[str]], int] = {}
+        self._cells = 0
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.evictions = 0
+
+    def get(self, sheet_name: str, cell_range: Optional[str] = None) -> Optional[List[List[str]]]:
+        """Получить снимок или None, если его нет или он устарел"""
+        key = (sheet_name, cell_range)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry["expires_at"] <= time.monotonic():
+                if entry is not None:
+                    self._drop(key)
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry["values"]
+
+    def put(self, sheet_name: str, values: List[List[str]], cell_range: Optional[str] = None):
+        """Сохранить снимок листа или диапазона"""
+        cells = sum(len(row) for row in values)
+        if self.ttl <= 0 or cells > self.max_cells:
+            return
+
+        key = (sheet_name, cell_range)
+        fingerprint = hash(tuple(tuple(row) for row in values))
+
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+
+            # Данные изменились вне бота. Первое чтение диапазона (новая страница
+            # истории, проба столбца) версию не поднимает: сравнивать не с чем,
+            # а запись ботом поднимает её в invalidate
+            previous = self._fingerprints.get(key)
+            self._fingerprints[key] = fingerprint
+            if previous is not None and previous != fingerprint:
+                self._versions[sheet_name] = self._versions.get(sheet_name, 0) + 1
+
+            self._entries[key] = {
+                "values": values,
+                "cells": cells,
+                "expires_at": time.monotonic() + self.ttl
+            }
+            self._cells += cells
+
+            while self._entries and (
+                len(self._entries) > self.max_entries or self._cells > self.max_cells
+            ):
+                oldest = next(iter(self._entries))
+                self._drop(oldest)
+                self.evictions += 1
+
+    def invalidate(self, *sheet_names: str):
+        """Сбросить снимки листов (со всеми диапазонами) и поднять их версии"""
+        with self._lock:
+            for sheet_name in sheet_names:
+                for key in [k for k in self._entries if k[0] == sheet_name]:
+                    self._drop(key)
+                for key in [k for k in self._fingerprints if k[0] == sheet_name]:
+                    del self._fingerprints[key]
+                self._versions[sheet_name] = self._versions.get(sheet_name, 0) + 1
+                self.invalidations += 1
+
+    def version(self, *sheet_names: str) -> int:
+        """Версия данных: сумма версий указанных листов (или всех)"""
+        with self._lock:
+            if not sheet_names:
+                return sum(self._versions.values())
+            return sum(self._versions.get(name, 0) for name in sheet_names)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Счётчики попаданий и промахов"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+                "invalidations": self.invalidations,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "cells": self._cells,
+                "versions": dict(self._versions)
+            }
+
+    def _drop(self, key: Tuple[str, Optional[str]]):
+        """Удалить запись (вызывать под блокировкой)"""
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._cells -= entry["cells"]
+
+
+# Общий кэш снимков (доступен и до подключения к таблице)
+snapshot_cache = SheetSnapshotCache()
+
 
 class GoogleSheetsService:
     """Сервис для работы с Google Sheets таблицей бюджета"""
     
-    def __init__(self):
+    def __init__(
+        self,
+        spreadsheet=None,
+        cache: Optional[SheetSnapshotCache] = None,
+        mirror: Optional[SheetMirror] = None,
+        limiter: Optional[SheetsRateLimiter] = None
+    ):
         self.client = None
-        self.spreadsheet = None
-        self._connect()
+        self.spreadsheet = spreadsheet
+        self.cache = cache or snapshot_cache
+        self.mirror = mirror
+        self.limiter = limiter or sheets_rate_limiter
+
+        # Итоги по транзакциям, обновляемые при записи ботом
+        self.aggregates = AggregateEngine(FIRST_TRANSACTION_ROW)
+
+        # Объекты листов и их sheetId, загружаются одним запросом метаданных
+        self._worksheets: Dict[str, Any] = {}
+        self._sheet_ids: Dict[str, int] = {}
+        self._worksheets_lock = threading.Lock()
+
+        # Последняя заполненная строка листа Транзакции (по колонке A)
+        self._last_row: Optional[int] = None
+        self._last_row_checked = 0.0
+
+        if self.spreadsheet is None:
+            self._connect()
     
     def _connect(self):
         """Подключение к Google Sheets"""
@@ -58,12 +225,130 @@ class GoogleSheetsService:
             config.GOOGLE_CREDENTIALS_FILE, scope
         )
         self.client = gspread.authorize(creds)
-        self.spreadsheet = self.client.open_by_key(config.GOOGLE_SHEETS_ID)
+        self.spreadsheet = self.limiter.call(
+            "read", self.client.open_by_key, config.GOOGLE_SHEETS_ID
+        )
+
+    def _load_worksheets(self):
+        """Загрузить все листы таблицы одним запросом метаданных"""
+        worksheets = self.limiter.call("read", self.spreadsheet.worksheets)
+        with self._worksheets_lock:
+            self._worksheets = {ws.title: ws for ws in worksheets}
+            self._sheet_ids = {ws.title: ws.id for ws in worksheets}
+
+    def load_metadata(self):
+        """Загрузить метаданные листов заранее (прогрев при запуске)"""
+        if not self._worksheets:
+            self._load_worksheets()
+
+    def _worksheet(self, sheet_name: str):
+        """Получить объект листа (из кэша, без запроса метаданных)"""
+        ws = self._worksheets.get(sheet_name)
+        if ws is None:
+            self._load_worksheets()
+            ws = self._worksheets.get(sheet_name)
+            if ws is None:
+                raise gspread.exceptions.WorksheetNotFound(sheet_name)
+        return ws
+
+    def get_sheet_id(self, sheet_name: str) -> int:
+        """Получить sheetId листа"""
+        self._worksheet(sheet_name)
+        return self._sheet_ids[sheet_name]
+
+    def _with_worksheet(self, sheet_name: str, action, kind: str = "write"):
+        """
+        Выполнить действие над листом из кэша (через ограничитель запросов)
+
+        Если лист переименовали или удалили, закэшированный объект
+        становится недействительным (API отвечает 400/404). В этом случае
+        метаданные перечитываются и действие повторяется один раз.
+        """
+        ws = self._worksheet(sheet_name)
+        try:
+            return self.limiter.call(kind, action, ws)
+        except gspread.exceptions.APIError as e:
+            if e.response.status_code not in (400, 404):
+                raise
+            self._load_worksheets()
+            fresh = self._worksheets.get(sheet_name)
+            if fresh is None:
+                raise gspread.exceptions.WorksheetNotFound(sheet_name) from e
+            if fresh.id == ws.id and fresh.title == ws.title:
+                raise  # Лист на месте - ошибка не связана с кэшем
+            return self.limiter.call(kind, action, fresh)
+
+    def get_ranges(
+        self,
+        ranges: List[Tuple[str, Optional[str]]],
+        fresh: bool = False
+    ) -> List[List[List[str]]]:
+        """
+        Прочитать несколько листов/диапазонов одним запросом values:batchGet
+
+        Args:
+            ranges: Пары (лист, диапазон A1); диапазон None - весь лист
+            fresh: Не использовать кэш и зеркало, читать из таблицы
+
+        Returns:
+            list: Значения в том же порядке, строки дополнены до одной длины
+        """
+        results: List[Optional[List[List[str]]]] = []
+        missing = []
+
+        for idx, (sheet_name, cell_range) in enumerate(ranges):
+            data = None
+            if not fresh:
+                data = self.cache.get(sheet_name, cell_range)
+                if data is None and self._mirrors_range(sheet_name, cell_range):
+                    data = self.mirror.get_range(sheet_name, cell_range)
+                    if data is not None:
+                        self.cache.put(sheet_name, data, cell_range)
+            results.append(data)
+            if data is None:
+                missing.append(idx)
+
+        if missing:
+            labels = [absolute_range_name(*ranges[idx]) for idx in missing]
+            try:
+                response = self.limiter.call("read", self.spreadsheet.values_batch_get, labels)
+            except gspread.exceptions.APIError as e:
+                # Лист переименован или удалён - сообщаем понятной ошибкой
+                if e.response.status_code == 400:
+                    self._load_worksheets()
+                    for idx in missing:
+                        if ranges[idx][0] not in self._worksheets:
+                            raise gspread.exceptions.WorksheetNotFound(ranges[idx][0]) from e
+                raise
+
+            for idx, value_range in zip(missing, response.get("valueRanges", [])):
+                data = fill_gaps(value_range.get("values", []))
+                sheet_name, cell_range = ranges[idx]
+                self.cache.put(sheet_name, data, cell_range)
+                if self._mirrors_range(sheet_name, cell_range):
+                    self.mirror.store_range(sheet_name, cell_range, data)
+                results[idx] = data
+
+        return results
+
+    def _mirrors_range(self, sheet_name: str, cell_range: Optional[str]) -> bool:
+        """Хранится ли лист/диапазон в зеркале как снимок"""
+        if self.mirror is None:
+            return False
+        # Строки транзакций зеркалируются построчно, снимком - только настройки
+        return sheet_name != config.SHEET_TRANSACTIONS or cell_range == MONTH_SETTINGS_RANGE
+
+    def _get_sheet_values(self, sheet_name: str, cell_range: Optional[str] = None) -> List[List[str]]:
+        """Получить значения листа или диапазона (через кэш снимков)"""
+        return self.get_ranges([(sheet_name, cell_range)])[0]
+
+    def get_data_version(self) -> int:
+        """Версия данных бюджета (меняется при любой записи или правке таблицы)"""
+        return self.cache.version()
     
     def get_references(self) -> Dict[str, List[str]]:
         """Получить справочники (типы, счета, категории)"""
-        sheet = self.spreadsheet.worksheet(config.SHEET_REFERENCES)
-        data = sheet.get_all_values()
+        data = self._get_sheet_values(config.SHEET_REFERENCES)
         
         # Парсим данные начиная с 4-й строки (индекс 3)
         types = []
@@ -86,9 +371,15 @@ class GoogleSheetsService:
     
     def get_accounts_balance(self) -> List[Dict[str, Any]]:
         """Получить балансы всех счетов"""
-        sheet = self.spreadsheet.worksheet(config.SHEET_ACCOUNTS)
-        data = sheet.get_all_values()
-        
+        aggregates = self._current_aggregates()
+        accounts = self._parse_accounts(self._get_sheet_values(config.SHEET_ACCOUNTS))
+        if aggregates is not None:
+            aggregates.apply_to_summary([], accounts)
+        return accounts
+
+    @staticmethod
+    def _parse_accounts(data: List[List[str]]) -> List[Dict[str, Any]]:
+        """Разобрать лист Счета"""
         accounts = []
         for row in data[3:]:  # Пропускаем заголовки
             if row[0] and row[0].strip():
@@ -103,9 +394,15 @@ class GoogleSheetsService:
     
     def get_categories_budget(self) -> List[Dict[str, Any]]:
         """Получить бюджеты и расходы по категориям"""
-        sheet = self.spreadsheet.worksheet(config.SHEET_CATEGORIES)
-        data = sheet.get_all_values()
-        
+        aggregates = self._current_aggregates()
+        categories = self._parse_categories(self._get_sheet_values(config.SHEET_CATEGORIES))
+        if aggregates is not None:
+            aggregates.apply_to_summary(categories, [])
+        return categories
+
+    @staticmethod
+    def _parse_categories(data: List[List[str]]) -> List[Dict[str, Any]]:
+        """Разобрать лист Категории"""
         categories = []
         for row in data[1:]:  # Пропускаем заголовок
             if row[1] and row[1].strip():
@@ -122,15 +419,47 @@ class GoogleSheetsService:
     
     def get_current_month_settings(self) -> Dict[str, int]:
         """Получить текущий месяц и год из настроек таблицы"""
-        sheet = self.spreadsheet.worksheet(config.SHEET_TRANSACTIONS)
-        data = sheet.get_all_values()
-        
+        return self._parse_month_settings(
+            self._get_sheet_values(config.SHEET_TRANSACTIONS, MONTH_SETTINGS_RANGE)
+        )
+
+    @staticmethod
+    def _parse_month_settings(data: List[List[str]]) -> Dict[str, int]:
+        """Разобрать ячейки настроек месяца"""
         # Настройки в первой строке: C1 = месяц, E1 = год
-        month = safe_int(data[0][2], datetime.now().month)
-        year = safe_int(data[0][4], datetime.now().year)
+        header = (data[0] if data else []) + [""] * 5
+        month = safe_int(header[2], datetime.now().month)
+        year = safe_int(header[4], datetime.now().year)
         
         return {"month": month, "year": year}
     
+    @staticmethod
+    def build_transaction_row(
+        day: int,
+        trans_type: str,
+        account: str,
+        category: Optional[str],
+        amount: float,
+        to_account: Optional[str] = None,
+        comment: Optional[str] = None,
+        hours: Optional[float] = None
+    ) -> List[Any]:
+        """Сформировать строку листа Транзакции"""
+        # A: Дата, B: Тип, C: Счёт, D: Категория, E: Сумма, 
+        # F: Счёт Куда, G: Комментарий, H: (формула), I: Часы
+        return [
+            day,                           # A: Дата (день)
+            trans_type,                    # B: Тип
+            account,                       # C: Счёт
+            category or "",                # D: Категория
+            amount,                        # E: Сумма
+            to_account or "",              # F: Счёт Куда
+            comment or "",                 # G: Комментарий
+            "",                            # H: Полная дата (формула в таблице)
+            hours if hours else "",        # I: Часы
+            ""                             # J: Часы×6.5 (формула)
+        ]
+
     def add_transaction(
         self,
         day: int,
@@ -159,37 +488,149 @@ class GoogleSheetsService:
             bool: Успех операции
         """
         try:
-            sheet = self.spreadsheet.worksheet(config.SHEET_TRANSACTIONS)
-            
-            # Формируем строку данных
-            # A: Дата, B: Тип, C: Счёт, D: Категория, E: Сумма, 
-            # F: Счёт Куда, G: Комментарий, H: (формула), I: Часы
-            row_data = [
-                day,                           # A: Дата (день)
-                trans_type,                    # B: Тип
-                account,                       # C: Счёт
-                category or "",                # D: Категория
-                amount,                        # E: Сумма
-                to_account or "",              # F: Счёт Куда
-                comment or "",                 # G: Комментарий
-                "",                            # H: Полная дата (формула в таблице)
-                hours if hours else "",        # I: Часы
-                ""                             # J: Часы×6.5 (формула)
-            ]
-            
-            # Добавляем в конец таблицы
-            sheet.append_row(row_data, value_input_option='USER_ENTERED')
-            
+            row_data = self.build_transaction_row(
+                day, trans_type, account, category, amount, to_account, comment, hours
+            )
+            self.add_transaction_rows([row_data])
             return True
             
         except Exception as e:
-            print(f"Ошибка записи в Google Sheets: {e}")
+            logger.warning(f"Ошибка записи в Google Sheets: {e}")
             return False
+
+    def add_transaction_rows(self, rows: List[List[Any]]) -> Dict[str, Any]:
+        """
+        Добавить несколько строк транзакций одним запросом append
+
+        Args:
+            rows: Строки, сформированные build_transaction_row
+
+        Returns:
+            dict: Ответ API (updates.updatedRange и т.д.)
+
+        Raises:
+            Исключения gspread пробрасываются вызывающему коду
+        """
+        response = self._with_worksheet(
+            config.SHEET_TRANSACTIONS,
+            lambda ws: ws.append_rows(rows, value_input_option='USER_ENTERED')
+        )
+        # Сначала итоги: если строки легли не туда, куда ждали, итоги
+        # станут устаревшими, и сброс заденет Категории и Счета
+        self._track_appended_rows(response, rows)
+        self._invalidate_after_write()
+        return response
+
+    def _track_appended_rows(self, response: Dict[str, Any], rows: List[List[Any]]):
+        """Обновить номер последней строки и зеркало по ответу append"""
+        updated_range = (response or {}).get("updates", {}).get("updatedRange", "")
+        match = _UPDATED_RANGE_ROWS.search(updated_range)
+
+        if not match:
+            self._last_row = None  # Перепроверим при следующем чтении
+            self.aggregates.stale = True
+            if self.mirror is not None:
+                self.mirror.transactions_ready = False
+            return
+
+        start_row = int(match.group(1))
+        end_row = int(match.group(2) or match.group(1))
+        self._last_row = max(self._last_row or 0, end_row)
+        self._last_row_checked = time.monotonic()
+
+        self.aggregates.add_rows(start_row, rows)
+        if self.mirror is not None and self.mirror.transactions_ready:
+            # Без формул H и J - строки перечитаются при следующей синхронизации
+            self.mirror.add_written_transactions(start_row, rows)
+
+    def _get_last_row(self) -> int:
+        """
+        Номер последней строки с транзакцией
+
+        Берётся из ответов append; если он неизвестен или устарел
+        (строки могли добавить вручную), читается только колонка A.
+        """
+        fresh = time.monotonic() - self._last_row_checked < config.SHEETS_CACHE_TTL
+        if self._last_row is None or not fresh:
+            column = self._get_sheet_values(config.SHEET_TRANSACTIONS, "A:A")
+            self._last_row = len(column)
+            self._last_row_checked = time.monotonic()
+        return self._last_row
     
+    def _invalidate_after_write(self):
+        """
+        Сбросить снимки, изменившиеся после записи транзакции
+
+        Если итоги сверены с формулами, значения Категорий и Счетов
+        подставляются из них, и перечитывать эти листы не нужно.
+        """
+        aggregates = self.aggregates
+        if aggregates.ready and aggregates.categories_consistent and aggregates.accounts_consistent:
+            self.cache.invalidate(config.SHEET_TRANSACTIONS)
+            return
+
+        self.cache.invalidate(*TRANSACTION_DEPENDENT_SHEETS)
+        if self.mirror is not None:
+            self.mirror.invalidate_ranges(config.SHEET_CATEGORIES, config.SHEET_ACCOUNTS)
+
+    def _current_aggregates(self) -> Optional[AggregateEngine]:
+        """
+        Актуальные итоги или None (без пересчёта)
+
+        Итоги старше SHEETS_CACHE_TTL могли разойтись с ручными правками
+        таблицы: они помечаются устаревшими, а снимки Категорий и Счетов
+        сбрасываются, чтобы следующее чтение взяло свежие формулы.
+        """
+        aggregates = self.aggregates
+        if not aggregates.ready:
+            return None
+        if aggregates.age() >= config.SHEETS_CACHE_TTL:
+            aggregates.stale = True
+            self.cache.invalidate(config.SHEET_CATEGORIES, config.SHEET_ACCOUNTS)
+            if self.mirror is not None:
+                self.mirror.invalidate_ranges(config.SHEET_CATEGORIES, config.SHEET_ACCOUNTS)
+            return None
+        return aggregates
+
+    def seed_aggregates(self) -> AggregateEngine:
+        """
+        Посчитать итоги по листу Транзакции (строки - из зеркала, если оно готово)
+
+        Категории и Счета читаются свежими вместе со строками,
+        чтобы сверка итогов с формулами была честной.
+        """
+        writes_seen = self.aggregates.writes
+        ranges = [(config.SHEET_CATEGORIES, None), (config.SHEET_ACCOUNTS, None)]
+        if self.mirror is not None and self.mirror.transactions_ready:
+            categories_data, accounts_data = self.get_ranges(ranges, fresh=True)
+            rows = self.mirror.get_transaction_rows()
+        else:
+            categories_data, accounts_data, data = self.get_ranges(
+                ranges + [(config.SHEET_TRANSACTIONS, None)], fresh=True
+            )
+            rows = data[FIRST_TRANSACTION_ROW - 1:]
+
+        self.aggregates.seed(
+            rows,
+            self._parse_categories(categories_data),
+            self._parse_accounts(accounts_data),
+            writes_seen
+        )
+        return self.aggregates
+
     def get_monthly_summary(self) -> Dict[str, Any]:
-        """Получить сводку за текущий месяц"""
-        categories = self.get_categories_budget()
-        accounts = self.get_accounts_balance()
+        """Получить сводку за текущий месяц (один запрос batchGet)"""
+        aggregates = self._current_aggregates()
+        categories_data, accounts_data, settings_data = self.get_ranges([
+            (config.SHEET_CATEGORIES, None),
+            (config.SHEET_ACCOUNTS, None),
+            (config.SHEET_TRANSACTIONS, MONTH_SETTINGS_RANGE)
+        ])
+        categories = self._parse_categories(categories_data)
+        accounts = self._parse_accounts(accounts_data)
+        settings = self._parse_month_settings(settings_data)
+        if aggregates is not None:
+            aggregates.apply_to_summary(categories, accounts)
         
         total_income = sum(c["spent"] for c in categories if c["type"] == "Доход")
         total_expense = sum(c["spent"] for c in categories if c["type"] == "Расход")
@@ -216,111 +657,228 @@ class GoogleSheetsService:
             "accounts": accounts,
             "categories": categories,
             "over_budget": over_budget,
-            "near_limit": near_limit
+            "near_limit": near_limit,
+            "month": settings["month"],
+            "year": settings["year"]
         }
     
+    @staticmethod
+    def _parse_transaction_row(row_index: int, row: List[str]) -> Optional[Dict[str, Any]]:
+        """Разобрать строку листа Транзакции (None для пустой строки)"""
+        if not row or not row[0] or not row[0].strip():
+            return None
+
+        row = row + [""] * (TRANSACTION_COLUMNS - len(row))
+        return {
+            "row_index": row_index,  # Номер строки в таблице (1-based)
+            "day": row[0],
+            "type": row[1],
+            "account": row[2],
+            "category": row[3],
+            "amount": row[4],
+            "to_account": row[5],
+            "comment": row[6],
+            "full_date": row[7],
+            "hours": row[8],
+            "fingerprint": transaction_fingerprint(row)
+        }
+
     def get_recent_transactions(self, limit: int = 10) -> List[Dict[str, Any]]:
         """Получить последние транзакции"""
-        sheet = self.spreadsheet.worksheet(config.SHEET_TRANSACTIONS)
-        data = sheet.get_all_values()
+        return self.get_transactions_page(limit)["transactions"]
 
-        transactions = []
-        for idx, row in enumerate(data[3:], start=4):  # Пропускаем настройки и заголовки, начинаем с 4-й строки
-            if row[0] and row[0].strip():
-                transactions.append({
-                    "row_index": idx,  # Номер строки в таблице (1-based)
-                    "day": row[0],
-                    "type": row[1],
-                    "account": row[2],
-                    "category": row[3],
-                    "amount": row[4],
-                    "to_account": row[5],
-                    "comment": row[6],
-                    "full_date": row[7] if len(row) > 7 else "",
-                    "hours": row[8] if len(row) > 8 else ""
-                })
+    def get_transactions_page(
+        self,
+        limit: int = 10,
+        before_row: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """
+        Получить страницу транзакций, от новых к старым
+
+        Читается только хвостовой диапазон листа, а не весь лист.
 
-        return transactions[-limit:][::-1]  # Последние N, в обратном порядке
+        Args:
+            limit: Размер страницы
+            before_row: Курсор - вернуть транзакции выше этой строки
+                        (None - самые последние)
 
-    def delete_transaction(self, row_index: int) -> bool:
+        Returns:
+            dict: transactions - список транзакций (новые первыми),
+                  next_cursor - курсор следующей (более старой) страницы или None
+        """
+        if self.mirror is not None and self.mirror.transactions_ready:
+            return self._get_mirror_transactions_page(limit, before_row)
+
+        end = (before_row - 1) if before_row else self._get_last_row()
+        transactions: List[Dict[str, Any]] = []
+
+        # Пустые строки внутри листа пропускаются, поэтому читаем окнами,
+        # пока не наберётся limit транзакций
+        while end >= FIRST_TRANSACTION_ROW and len(transactions) < limit:
+            window_size = max(limit - len(transactions), HISTORY_MIN_WINDOW)
+            start = max(FIRST_TRANSACTION_ROW, end - window_size + 1)
+            data = self._get_sheet_values(config.SHEET_TRANSACTIONS, f"A{start}:J{end}")
+
+            window = []
+            for idx, row in enumerate(data, start=start):
+                parsed = self._parse_transaction_row(idx, row)
+                if parsed:
+                    window.append(parsed)
+
+            transactions.extend(reversed(window))
+            end = start - 1
+
+        transactions = transactions[:limit]
+        next_cursor = None
+        if transactions and transactions[-1]["row_index"] > FIRST_TRANSACTION_ROW:
+            next_cursor = transactions[-1]["row_index"]
+
+        return {"transactions": transactions, "next_cursor": next_cursor}
+
+    def _get_mirror_transactions_page(
+        self,
+        limit: int,
+        before_row: Optional[int]
+    ) -> Dict[str, Any]:
+        """Страница транзакций из локального зеркала"""
+        # Берём на одну строку больше, чтобы знать, есть ли следующая страница
+        rows = self.mirror.get_transactions(limit + 1, before_row)
+        transactions = [self._parse_transaction_row(idx, row) for idx, row in rows[:limit]]
+        next_cursor = transactions[-1]["row_index"] if len(rows) > limit else None
+        return {"transactions": transactions, "next_cursor": next_cursor}
+
+    def delete_transaction(self, row_index: int, fingerprint: str) -> bool:
         """
         Удалить транзакцию из таблицы
 
+        Перед удалением строка перечитывается из таблицы: номер мог
+        устареть, если строки вставляли или удаляли вручную.
+
         Args:
             row_index: Номер строки в таблице (1-based)
+            fingerprint: transaction_fingerprint транзакции, которую видел пользователь
 
         Returns:
             bool: Успех операции
+
+        Raises:
+            TransactionChangedError: В строке другая транзакция - удаление отменено,
+                                     история перечитана
         """
         try:
-            sheet = self.spreadsheet.worksheet(config.SHEET_TRANSACTIONS)
-            sheet.delete_rows(row_index)
+            current = self.get_ranges(
+                [(config.SHEET_TRANSACTIONS, f"A{row_index}:J{row_index}")], fresh=True
+            )[0]
+            if not current or transaction_fingerprint(current[0]) != fingerprint:
+                self._resync_after_mismatch(row_index)
+                raise TransactionChangedError(
+                    "Таблица изменилась с момента показа истории - удаление отменено"
+                )
+
+            self._with_worksheet(
+                config.SHEET_TRANSACTIONS,
+                lambda ws: ws.delete_rows(row_index)
+            )
+            self._invalidate_after_write()
+            self.aggregates.delete_row(row_index)
+            if self._last_row is not None and row_index <= self._last_row:
+                self._last_row -= 1
+            if self.mirror is not None:
+                self.mirror.delete_transaction(row_index)
             return True
 
+        except TransactionChangedError:
+            raise
         except Exception as e:
-            print(f"Ошибка удаления транзакции: {e}")
+            logger.warning(f"Ошибка удаления транзакции: {e}")
             return False
 
+    def _resync_after_mismatch(self, row_index: int):
+        """Номер строки устарел: перечитать транзакции (зеркало - полностью)"""
+        logger.warning(f"Строка {row_index} не совпадает с показанной транзакцией - перечитываю")
+        self._last_row = None
+        # Поднимает версию: экраны истории строятся заново
+        self.cache.invalidate(config.SHEET_TRANSACTIONS)
+        if self.mirror is not None:
+            self.sync_mirror(full=True)
+
+    def sync_mirror(self, full: bool = False) -> Dict[str, Any]:
+        """
+        Синхронизировать локальное зеркало с таблицей
+
+        Небольшие листы и длина колонки A читаются одним batchGet.
+        Строки транзакций догружаются только новые (и записанные ботом -
+        их формулы известны только таблице); полная перезагрузка
+        выполняется по запросу, при первом запуске и если строк в таблице
+        стало меньше, чем в зеркале (удаление вручную).
+
+        Returns:
+            dict: full - была ли полная синхронизация, rows - сколько строк загружено
+        """
+        if self.mirror is None:
+            return {"full": False, "rows": 0}
+
+        writes_seen = self.aggregates.writes
+        categories_data, accounts_data, _, _, column = self.get_ranges([
+            (config.SHEET_CATEGORIES, None),
+            (config.SHEET_ACCOUNTS, None),
+            (config.SHEET_REFERENCES, None),
+            (config.SHEET_TRANSACTIONS, MONTH_SETTINGS_RANGE),
+            (config.SHEET_TRANSACTIONS, "A:A")
+        ], fresh=True)
+
+        sheet_last = len(column)
+        self._last_row = sheet_last
+        self._last_row_checked = time.monotonic()
+
+        mirror_last = self.mirror.last_row()
+        full = full or not self.mirror.transactions_ready or sheet_last < mirror_last
+        # Строки, записанные ботом, перечитываются ради формул H и J
+        start = FIRST_TRANSACTION_ROW if full else min(mirror_last + 1, self.mirror.refresh_from(mirror_last + 1))
+
+        rows: List[List[str]] = []
+        if sheet_last >= start:
+            rows = self.get_ranges(
+                [(config.SHEET_TRANSACTIONS, f"A{start}:J{sheet_last}")], fresh=True
+            )[0]
+
+        if full:
+            self.mirror.replace_transactions(start, rows)
+        elif rows:
+            self.mirror.append_transactions(start, rows)
+
+        self.mirror.mark_synced(full, sheet_last)
+
+        # Итоги пересчитываются по зеркалу (локально) вместе со свежими
+        # Категориями и Счетами, прочитанными в том же запросе
+        self.aggregates.seed(
+            self.mirror.get_transaction_rows(),
+            self._parse_categories(categories_data),
+            self._parse_accounts(accounts_data),
+            writes_seen
+        )
+        return {"full": full, "rows": len(rows)}
+
     def get_income_by_days(self) -> Dict[str, Any]:
         """Получить доходы по дням с детализацией"""
-        sheet = self.spreadsheet.worksheet(config.SHEET_TRANSACTIONS)
-        data = sheet.get_all_values()
-
-        # Группируем доходы по дням
-        income_by_day = {}
-
-        for row in data[3:]:  # Пропускаем настройки и заголовки
-            if row[0] and row[0].strip() and len(row) > 1:
-                if row[1] == "Доход":  # Только доходы
-                    day = row[0]
-                    amount = safe_float(row[4])
-                    category = row[3] if len(row) > 3 else ""
-                    comment = row[6] if len(row) > 6 else ""
-                    hours = safe_float(row[8]) if len(row) > 8 else 0
-
-                    if day not in income_by_day:
-                        income_by_day[day] = {
-                            "total": 0,
-                            "tips": 0,
-                            "hours": 0,
-                            "other": 0,
-                            "entries": []
-                        }
-
-                    income_by_day[day]["total"] += amount
-
-                    # Разделяем на чаевые и другое
-                    if category == "Зарплата/Чаевые":
-                        income_by_day[day]["tips"] += amount
-                        income_by_day[day]["hours"] += hours
-                    else:
-                        income_by_day[day]["other"] += amount
-
-                    income_by_day[day]["entries"].append({
-                        "amount": amount,
-                        "category": category,
-                        "comment": comment,
-                        "hours": hours
-                    })
-
-        # Сортируем по дням
-        sorted_days = sorted(income_by_day.keys(), key=lambda x: int(x) if x.isdigit() else 0)
-
-        return {
-            "by_day": income_by_day,
-            "sorted_days": sorted_days,
-            "total_income": sum(d["total"] for d in income_by_day.values()),
-            "total_tips": sum(d["tips"] for d in income_by_day.values()),
-            "total_hours": sum(d["hours"] for d in income_by_day.values())
-        }
+        aggregates = self._current_aggregates() or self.seed_aggregates()
+        return aggregates.income_by_days()
 
 
 # Создаем глобальный экземпляр
 sheets_service = None
+_sheets_service_lock = threading.Lock()
 
 def get_sheets_service() -> GoogleSheetsService:
-    """Получить экземпляр сервиса (singleton)"""
+    """Получить экземпляр сервиса (singleton, потокобезопасно)"""
     global sheets_service
     if sheets_service is None:
-        sheets_service = GoogleSheetsService()
+        with _sheets_service_lock:
+            if sheets_service is None:
+                sheets_service = GoogleSheetsService(mirror=get_mirror())
+    return sheets_service
+
+
+def get_connected_sheets_service() -> Optional[GoogleSheetsService]:
+    """Сервис, если он уже подключён (без подключения)"""
     return sheets_service
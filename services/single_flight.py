@@ -0,0 +1,68 @@
+"""
+Объединение одинаковых одновременных запросов (single-flight)
+
+Если запрос с тем же ключом уже выполняется, новый вызов не запускает
+его повторно, а ждёт тот же результат. Двойное нажатие кнопки или
+несколько пользователей, открывших /stats одновременно, дают один
+запрос к таблице и один запрос к DeepSeek.
+"""
+import asyncio
+import logging
+from typing import Dict, Any, Callable, Awaitable, Hashable, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class SingleFlight:
+    """Общий результат для одинаковых запросов, выполняющихся одновременно"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
+
+        self.calls = 0
+        self.executions = 0
+
+    async def run(self, key: Hashable, func: Callable[[], Awaitable[T]]) -> T:
+        """
+        Выполнить func() или дождаться уже запущенного вызова с тем же ключом
+
+        Вызов выполняется отдельной задачей: отмена одного из ожидающих
+        не отменяет запрос для остальных.
+        """
+        self.calls += 1
+        task = self._inflight.get(key)
+        if task is None:
+            self.executions += 1
+            task = asyncio.ensure_future(func())
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._finished(key, done))
+        else:
+            logger.debug(f"{self.name}: запрос {key!r} уже выполняется - ждём его результат")
+
+        return await asyncio.shield(task)
+
+    def _finished(self, key: Hashable, task: asyncio.Task):
+        """Убрать завершённый вызов из выполняющихся"""
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        # Ошибка уже передана ожидающим; если их не осталось, не пишем "never retrieved"
+        if not task.cancelled():
+            task.exception()
+
+    def in_flight(self, key: Hashable) -> bool:
+        """Запрос с этим ключом сейчас выполняется"""
+        return key in self._inflight
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Сколько вызовов обслужено чужим результатом"""
+        coalesced = self.calls - self.executions
+        return {
+            "calls": self.calls,
+            "executions": self.executions,
+            "coalesced": coalesced,
+            "coalesced_rate": coalesced / self.calls if self.calls else 0.0,
+            "in_flight": len(self._inflight)
+        }
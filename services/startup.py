@@ -0,0 +1,100 @@
+"""
+Фоновый прогрев при запуске бота
+
+Подключение к Google Sheets (OAuth + метаданные таблицы), загрузка
+справочников и подсчёт итогов выполняются в фоне сразу после старта,
+а не при первом обращении пользователя. Время каждого этапа
+отсчитывается от запуска процесса и доступно в /perf.
+"""
+import asyncio
+import logging
+import time
+from typing import Optional, Dict, Any
+from services.async_sheets import get_async_sheets_service
+from services.rate_limit import background_priority
+
+logger = logging.getLogger(__name__)
+
+# Момент импорта модуля - практически момент запуска процесса
+PROCESS_STARTED = time.monotonic()
+
+
+class StartupTracker:
+    """Готовность бота и длительность этапов запуска"""
+
+    def __init__(self, started: float = PROCESS_STARTED):
+        self.started = started
+        self.phases: Dict[str, float] = {}  # этап -> секунд от запуска
+        self.error: Optional[str] = None
+        self.ready = False  # Прогрев завершён (успешно или с ошибкой)
+        self._task: Optional[asyncio.Task] = None
+
+    def mark(self, phase: str) -> float:
+        """Отметить завершение этапа"""
+        elapsed = time.monotonic() - self.started
+        self.phases[phase] = elapsed
+        logger.info(f"Запуск: {phase} через {elapsed:.2f} с")
+        return elapsed
+
+    def start(self):
+        """Запустить прогрев в фоне (не блокирует запуск polling)"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._warm_up())
+
+    async def _warm_up(self):
+        """Подключиться к таблице и заполнить кэш справочников и сводки"""
+        sheets = get_async_sheets_service()
+        try:
+            # Прогрев уступает квоту запросам пользователей, пришедшим раньше
+            with background_priority():
+                await sheets.connect()
+                self.mark("sheets_connected")
+
+                await sheets.get_references()
+                self.mark("references_loaded")
+
+                # Итоги по транзакциям для /income, /stats и советника
+                await sheets.seed_aggregates()
+                self.mark("aggregates_seeded")
+
+                # Сводку читают /stats и советник
+                await sheets.get_monthly_summary()
+                self.mark("summary_loaded")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            # Не фатально: сервис подключится при первом запросе пользователя
+            self.error = str(e)
+            logger.warning(f"Прогрев не удался: {e}")
+        finally:
+            self.mark("ready")
+            self.ready = True
+
+    async def stop(self):
+        """Отменить незавершённый прогрев при остановке бота"""
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Состояние прогрева"""
+        return {
+            "ready": self.ready,
+            "phases": dict(self.phases),
+            "error": self.error,
+            "uptime": time.monotonic() - self.started
+        }
+
+
+# Создаем глобальный экземпляр
+_startup_tracker = None
+
+def get_startup_tracker() -> StartupTracker:
+    """Получить трекер запуска (singleton)"""
+    global _startup_tracker
+    if _startup_tracker is None:
+        _startup_tracker = StartupTracker()
+    return _startup_tracker
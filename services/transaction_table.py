@@ -0,0 +1,261 @@
+"""
+Колоночное хранилище транзакций для агрегаций
+
+Строки листа Транзакции разбираются один раз в типизированные массивы
+(array): день, сумма и часы хранятся числами, а тип, счёт и категория -
+кодами в общем пуле интернированных строк. Группировки проходят по
+колонкам без создания словаря на каждую строку.
+"""
+import sys
+from array import array
+from bisect import bisect_left
+from itertools import compress
+from typing import Dict, List, Any, Iterable, Optional, Tuple
+from utils.formatters import safe_float
+
+INCOME = "Доход"
+EXPENSE = "Расход"
+TRANSFER = "Перевод"
+TIPS_CATEGORY = "Зарплата/Чаевые"
+
+
+def parse_number(value: str) -> float:
+    """Быстрый разбор числа; сложные случаи (запятая, пробелы) - через safe_float"""
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return safe_float(value)
+
+
+def cell_text(row: List[Any], idx: int) -> str:
+    """Текст ячейки строки (короткие строки дополняются пустыми)"""
+    if len(row) > idx and row[idx] is not None:
+        return str(row[idx])
+    return ""
+
+
+class StringPool:
+    """Пул интернированных строк: строка <-> целочисленный код"""
+
+    __slots__ = ("values", "_codes")
+
+    def __init__(self):
+        self.values: List[str] = [""]
+        self._codes: Dict[str, int] = {"": 0}
+
+    def code(self, value: str) -> int:
+        """Код строки (новые строки добавляются в пул)"""
+        code = self._codes.get(value)
+        if code is None:
+            value = sys.intern(value)
+            code = len(self.values)
+            self.values.append(value)
+            self._codes[value] = code
+        return code
+
+    def find(self, value: str) -> Optional[int]:
+        """Код строки или None, если её нет в пуле"""
+        return self._codes.get(value)
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+
+class TransactionTable:
+    """Транзакции в колонках с типизированными значениями"""
+
+    def __init__(self):
+        self.strings = StringPool()
+        self.row_index = array("I")  # Номер строки в таблице (по возрастанию)
+        self.day = array("B")
+        self.type = array("I")
+        self.account = array("I")
+        self.category = array("I")
+        self.to_account = array("I")
+        self.amount = array("d")
+        self.hours = array("d")
+        self.comment: List[str] = []  # Комментарии почти уникальны - не интернируются
+
+    @classmethod
+    def from_rows(cls, rows: Iterable[List[str]], first_row: int = 1) -> "TransactionTable":
+        """
+        Построить таблицу из строк листа Транзакции (без шапки)
+
+        Строки без даты пропускаются, как и при обычном разборе листа.
+
+        Args:
+            rows: Строки листа подряд
+            first_row: Номер в таблице первой из строк
+        """
+        table = cls()
+        for row_index, row in enumerate(rows, start=first_row):
+            table.append(row, row_index)
+        return table
+
+    def append(self, row: List[Any], row_index: int = 0) -> bool:
+        """
+        Добавить строку листа (колонки A..J) в конец таблицы
+
+        Returns:
+            bool: False, если строка пустая и пропущена
+        """
+        if not row or len(row) < 2 or not str(row[0]).strip():
+            return False
+
+        code = self.strings.code
+        self.row_index.append(row_index)
+        day = int(parse_number(row[0]))
+        self.day.append(day if 0 <= day <= 255 else 0)
+        self.type.append(code(cell_text(row, 1)))
+        self.account.append(code(cell_text(row, 2)))
+        self.category.append(code(cell_text(row, 3)))
+        self.amount.append(parse_number(cell_text(row, 4)))
+        self.to_account.append(code(cell_text(row, 5)))
+        self.comment.append(cell_text(row, 6))
+        self.hours.append(parse_number(cell_text(row, 8)))
+        return True
+
+    def __len__(self) -> int:
+        return len(self.amount)
+
+    def _columns(self) -> Tuple[Any, ...]:
+        """Все колонки таблицы"""
+        return (self.row_index, self.day, self.type, self.account, self.category,
+                self.to_account, self.amount, self.hours, self.comment)
+
+    def nbytes(self) -> int:
+        """Приблизительный объём памяти колонок (без строк пула)"""
+        *arrays, comments = self._columns()
+        return sum(col.itemsize * len(col) for col in arrays) + sys.getsizeof(comments)
+
+    def find(self, row_index: int) -> Optional[int]:
+        """Позиция строки таблицы по её номеру или None"""
+        position = bisect_left(self.row_index, row_index)
+        if position < len(self.row_index) and self.row_index[position] == row_index:
+            return position
+        return None
+
+    def row(self, position: int) -> Tuple[int, str, str, str, float, str, float, str]:
+        """Значения строки: день, тип, счёт, категория, сумма, счёт куда, часы, комментарий"""
+        values = self.strings.values
+        return (
+            self.day[position], values[self.type[position]], values[self.account[position]],
+            values[self.category[position]], self.amount[position],
+            values[self.to_account[position]], self.hours[position], self.comment[position]
+        )
+
+    def remove(self, row_index: int) -> Optional[Tuple]:
+        """
+        Удалить строку по номеру; номера нижних строк уменьшаются на 1,
+        как при удалении строки в таблице
+
+        Returns:
+            tuple: Значения удалённой строки (см. row) или None, если строки не было
+        """
+        position = bisect_left(self.row_index, row_index)
+        removed = None
+        if position < len(self.row_index) and self.row_index[position] == row_index:
+            removed = self.row(position)
+            for column in self._columns():
+                del column[position]
+
+        tail = self.row_index[position:]
+        self.row_index[position:] = array("I", (value - 1 for value in tail))
+        return removed
+
+    # === Агрегации ===
+
+    def _selector(self, trans_type: Optional[str]) -> Optional[Iterable[bool]]:
+        """Маска строк нужного типа (None - все строки)"""
+        if trans_type is None:
+            return None
+        code = self.strings.find(trans_type)
+        return map((-1 if code is None else code).__eq__, self.type)
+
+    def _sum_by(self, keys: array, values: array, trans_type: Optional[str]) -> Dict[int, float]:
+        """Суммы values по кодам keys для строк типа trans_type"""
+        pairs = zip(keys, values)
+        selector = self._selector(trans_type)
+        if selector is not None:
+            pairs = compress(pairs, selector)
+
+        totals: Dict[int, float] = {}
+        get = totals.get
+        for key, value in pairs:
+            totals[key] = get(key, 0.0) + value
+        return totals
+
+    def sum_by_day(self, trans_type: Optional[str] = None, column: str = "amount") -> Dict[int, float]:
+        """Сумма по дням месяца"""
+        return self._sum_by(self.day, getattr(self, column), trans_type)
+
+    def sum_by_category(self, trans_type: Optional[str] = None) -> Dict[str, float]:
+        """Сумма по категориям"""
+        totals = self._sum_by(self.category, self.amount, trans_type)
+        return {self.strings.values[code]: total for code, total in totals.items()}
+
+    def account_totals(self) -> Dict[str, float]:
+        """
+        Изменение баланса каждого счёта за месяц
+
+        Доход прибавляется к счёту, расход вычитается, перевод
+        списывается со счёта-источника и зачисляется на счёт назначения.
+        """
+        values = self.strings.values
+        totals: Dict[str, float] = {}
+
+        for trans_type, sign in ((INCOME, 1.0), (EXPENSE, -1.0), (TRANSFER, -1.0)):
+            for code, total in self._sum_by(self.account, self.amount, trans_type).items():
+                totals[values[code]] = totals.get(values[code], 0.0) + sign * total
+
+        for code, total in self._sum_by(self.to_account, self.amount, TRANSFER).items():
+            if code:
+                totals[values[code]] = totals.get(values[code], 0.0) + total
+        return totals
+
+    def income_by_days(self) -> Dict[str, Any]:
+        """Доходы по дням с детализацией (формат get_income_by_days)"""
+        return income_report(self.income_days())
+
+    def income_days(self) -> Dict[int, Dict[str, Any]]:
+        """Доходы по номеру дня: total, tips, hours, other и записи"""
+        tips = self.strings.find(TIPS_CATEGORY)
+        categories = self.strings.values
+        by_day: Dict[int, Dict[str, Any]] = {}
+
+        rows = compress(
+            zip(self.day, self.category, self.amount, self.hours, self.comment),
+            self._selector(INCOME)
+        )
+        for day, category, amount, hours, comment in rows:
+            day_data = by_day.get(day)
+            if day_data is None:
+                day_data = by_day[day] = {"total": 0, "tips": 0, "hours": 0, "other": 0, "entries": []}
+
+            day_data["total"] += amount
+            if category == tips:
+                day_data["tips"] += amount
+                day_data["hours"] += hours
+            else:
+                day_data["other"] += amount
+
+            day_data["entries"].append({
+                "amount": amount,
+                "category": categories[category],
+                "comment": comment,
+                "hours": hours
+            })
+
+        return by_day
+
+
+def income_report(by_day: Dict[int, Dict[str, Any]]) -> Dict[str, Any]:
+    """Доходы по дням в формате get_income_by_days (ключи - строки, дни по порядку)"""
+    sorted_days = sorted(by_day)
+    return {
+        "by_day": {str(day): by_day[day] for day in sorted_days},
+        "sorted_days": [str(day) for day in sorted_days],
+        "total_income": sum(d["total"] for d in by_day.values()),
+        "total_tips": sum(d["tips"] for d in by_day.values()),
+        "total_hours": sum(d["hours"] for d in by_day.values())
+    }
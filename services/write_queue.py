@@ -0,0 +1,175 @@
+"""
+Отложенная пакетная запись транзакций в Google Sheets
+
+Транзакции, введённые в течение короткого окна, объединяются
+в один запрос append_rows. Пользователь получает подтверждение сразу,
+а об ошибке записи бот сообщает в исходный чат. Если таблица не ответила
+вовремя, запрос мог выполниться - тогда бот просит проверить /history,
+а не вводить транзакции заново.
+"""
+import asyncio
+import logging
+from typing import Optional, Dict, List, Any
+import config
+from services.async_sheets import get_async_sheets_service, SheetsTimeoutError
+from services.sheets import GoogleSheetsService
+from utils.formatters import format_money
+
+logger = logging.getLogger(__name__)
+
+
+class PendingTransaction:
+    """Транзакция, ожидающая записи"""
+
+    __slots__ = ("row", "chat_id", "bot", "summary")
+
+    def __init__(self, row: List[Any], chat_id: Optional[int], bot, summary: str):
+        self.row = row
+        self.chat_id = chat_id
+        self.bot = bot
+        self.summary = summary
+
+
+class TransactionWriteQueue:
+    """Очередь записи с объединением строк в пакеты"""
+
+    def __init__(
+        self,
+        window: float = config.SHEETS_WRITE_BATCH_WINDOW,
+        max_batch: int = config.SHEETS_WRITE_BATCH_MAX
+    ):
+        self.window = window
+        self.max_batch = max_batch
+        self._pending: List[PendingTransaction] = []
+        self._timer: Optional[asyncio.Task] = None
+        self._flush_lock: Optional[asyncio.Lock] = None
+        self._closed = False
+
+        self.rows_written = 0
+        self.rows_failed = 0
+        self.rows_unknown = 0
+        self.api_calls = 0
+
+    async def submit(
+        self,
+        bot,
+        chat_id: Optional[int],
+        day: int,
+        trans_type: str,
+        account: str,
+        category: Optional[str],
+        amount: float,
+        to_account: Optional[str] = None,
+        comment: Optional[str] = None,
+        hours: Optional[float] = None
+    ):
+        """
+        Поставить транзакцию в очередь записи
+
+        Возвращается сразу; строка будет записана в течение окна
+        SHEETS_WRITE_BATCH_WINDOW вместе с другими накопленными строками.
+        """
+        row = GoogleSheetsService.build_transaction_row(
+            day, trans_type, account, category, amount, to_account, comment, hours
+        )
+        summary = f"{trans_type} {format_money(amount)}"
+        if category:
+            summary += f" ({category})"
+
+        self._pending.append(PendingTransaction(row, chat_id, bot, summary))
+
+        if self._closed or len(self._pending) >= self.max_batch:
+            await self.flush()
+        elif self._timer is None or self._timer.done():
+            self._timer = asyncio.create_task(self._flush_later())
+
+    async def _flush_later(self):
+        """Записать накопленное по истечении окна"""
+        await asyncio.sleep(self.window)
+        # Строки, пришедшие во время записи, заводят новый таймер
+        if self._timer is asyncio.current_task():
+            self._timer = None
+        # shield: отмена таймера при close() не должна прерывать запись
+        await asyncio.shield(self.flush())
+
+    async def flush(self):
+        """Записать все накопленные транзакции одним запросом"""
+        if self._flush_lock is None:
+            self._flush_lock = asyncio.Lock()
+
+        async with self._flush_lock:
+            batch, self._pending = self._pending, []
+            if not batch:
+                return
+
+            self.api_calls += 1
+            try:
+                sheets = get_async_sheets_service()
+                await sheets.add_transaction_rows([item.row for item in batch])
+                self.rows_written += len(batch)
+                logger.info(f"Записано транзакций одним запросом: {len(batch)}")
+            except SheetsTimeoutError as e:
+                # Запрос ушёл и мог выполниться - повторный ввод дал бы дубли
+                self.rows_unknown += len(batch)
+                logger.error(f"Нет ответа на пакетную запись ({len(batch)} строк): {e}")
+                await self._report_failure(batch, e, unknown=True)
+            except Exception as e:
+                self.rows_failed += len(batch)
+                logger.error(f"Ошибка пакетной записи ({len(batch)} строк): {e}")
+                await self._report_failure(batch, e)
+
+    async def _report_failure(self, batch: List[PendingTransaction], error: Exception, unknown: bool = False):
+        """
+        Сообщить в исходные чаты, какие транзакции не записались
+
+        Args:
+            unknown: Ответа нет - запись могла пройти
+        """
+        by_chat: Dict[int, List[PendingTransaction]] = {}
+        for item in batch:
+            if item.chat_id is not None and item.bot is not None:
+                by_chat.setdefault(item.chat_id, []).append(item)
+
+        for chat_id, items in by_chat.items():
+            if unknown:
+                lines = ["⚠️ Таблица не подтвердила запись:"]
+                lines += [f"• {item.summary}" for item in items]
+                lines.append(f"\n{error}\nЗапись могла пройти - проверь /history, прежде чем вводить их снова.")
+            else:
+                lines = ["❌ Не удалось записать в таблицу:"]
+                lines += [f"• {item.summary}" for item in items]
+                lines.append(f"\nОшибка: {error}\nВведи эти транзакции ещё раз.")
+            try:
+                await items[0].bot.send_message(chat_id=chat_id, text="\n".join(lines))
+            except Exception as e:
+                logger.error(f"Не удалось уведомить чат {chat_id}: {e}")
+
+    async def close(self):
+        """Записать всё накопленное перед остановкой бота"""
+        self._closed = True
+        if self._timer is not None and not self._timer.done():
+            self._timer.cancel()
+        await self.flush()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Статистика пакетной записи"""
+        return {
+            "rows_written": self.rows_written,
+            "rows_failed": self.rows_failed,
+            "rows_unknown": self.rows_unknown,
+            "api_calls": self.api_calls,
+            "rows_per_call": (self.rows_written + self.rows_failed + self.rows_unknown) / self.api_calls
+            if self.api_calls else 0.0,
+            "pending": len(self._pending)
+        }
+
+
+# Создаем глобальный экземпляр
+_write_queue = None
+
+def get_write_queue() -> TransactionWriteQueue:
+    """Получить очередь записи (singleton)"""
+    global _write_queue
+    if _write_queue is None:
+        _write_queue = TransactionWriteQueue()
+    return _write_queue
@@ -1,10 +1,41 @@
 """
-Утилиты для форматирования сообщений
+Утилиты для форматирования сообщений и разбора чисел из таблицы
 """
 from datetime import datetime
 from typing import Dict, Any, List, Optional
 import re
 
+def safe_float(value, default=0.0) -> float:
+    """
+    Безопасное преобразование строки в float.
+    Обрабатывает европейский формат с запятой (140,82)
+    """
+    if value is None or value == "" or value == "-":
+        return default
+    
+    if isinstance(value, (int, float)):
+        return float(value)
+    
+    try:
+        # Убираем пробелы и заменяем запятую на точку
+        cleaned = str(value).strip().replace(" ", "").replace(",", ".")
+        return float(cleaned)
+    except (ValueError, TypeError):
+        return default
+
+
+def safe_int(value, default=0) -> int:
+    """Безопасное преобразование в int"""
+    if value is None or value == "":
+        return default
+    
+    try:
+        # Сначала преобразуем в float (на случай "1,0"), потом в int
+        return int(safe_float(value, default))
+    except (ValueError, TypeError):
+        return default
+
+
 def format_money(amount: float, currency: str = "BYN") -> str:
     """Форматировать денежную сумму"""
     if amount >= 0:
@@ -281,12 +312,13 @@ def parse_quick_input(text: str) -> Optional[Dict[str, Any]]:
     return result
 
 
-def format_history(transactions: List[Dict[str, Any]]) -> str:
+def format_history(transactions: List[Dict[str, Any]], older: bool = False) -> str:
     """Форматировать историю транзакций"""
     if not transactions:
         return "📜 История пуста"
 
-    lines = ["📜 **ПОСЛЕДНИЕ ТРАНЗАКЦИИ**\n"]
+    title = "БОЛЕЕ РАННИЕ ТРАНЗАКЦИИ" if older else "ПОСЛЕДНИЕ ТРАНЗАКЦИИ"
+    lines = [f"📜 **{title}**\n"]
 
     for t in transactions:
         emoji = {"Доход": "💰", "Расход": "💸", "Перевод": "🔄"}.get(t["type"], "📝")